@@ -0,0 +1,236 @@
+"""
+Semantic answer cache in front of the adaptive graph.
+
+Near-duplicate questions ("万达智慧商业平台的核心功能" / "核心功能有哪些") each ran the whole
+graph. Here every answered question is kept with its bge vector; a new question is
+embedded and compared (dot product of normalized vectors) against the past ones, and
+the stored answer + citations are returned when
+    - cosine similarity >= ANSWER_CACHE_THRESHOLD, and
+    - the collection version behind the alias is the one the answer was built from, and
+    - the retrieval params that shape the answer (expr, strategy, k, multi_query, ...)
+      hash to the same key (params_key(); shard_timeout only bounds latency).
+A reindex (alias switch, documents/collection_versions.py) therefore invalidates the
+cache without any explicit purge. An exact repeat of a question skips the embedding too.
+
+The index is an in-memory float32 matrix (a few thousand rows: a brute-force matmul
+is well under a millisecond) persisted in SQLite, so it survives restarts.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from My_RAG_Project.utils.env_utils import (
+    COLLECTION_NAME,
+    ANSWER_CACHE_PATH,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_SECONDS,
+)
+from My_RAG_Project.utils.log_utils import log
+from My_RAG_Project.adaptive_rag.graph_state2 import default_retrieval_params
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    question    TEXT NOT NULL,
+    vector      BLOB NOT NULL,
+    version     TEXT NOT NULL,
+    params      TEXT NOT NULL DEFAULT '',
+    answer      TEXT NOT NULL,
+    citations   TEXT NOT NULL,
+    created     REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits        INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Re-resolve the alias at most this often (one Milvus round trip per window, not per question)
+VERSION_CHECK_SECONDS = 5.0
+
+# Retrieval params that bound latency only; they never change which answer is right
+_LATENCY_ONLY_PARAMS = ("shard_timeout",)
+
+
+def _normalize_question(q: str) -> str:
+    return " ".join(q.strip().lower().split()).rstrip("?？。.!！")
+
+
+def params_key(params: Optional[Dict[str, Any]] = None) -> str:
+    """Canonical hash of the retrieval params an answer was built with (defaults filled in)."""
+    merged = {**default_retrieval_params(), **(params or {})}
+    for name in _LATENCY_ONLY_PARAMS:
+        merged.pop(name, None)
+    canonical = json.dumps(merged, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.md5(canonical.encode("utf-8")).hexdigest()
+
+
+def collection_version(collections: Optional[Sequence[str]] = None) -> str:
+    """Physical collection(s) currently behind the searched alias(es), e.g. "wanda_commerce__v20250101120000"."""
+    from My_RAG_Project.documents.collection_versions import resolve_alias
+    from My_RAG_Project.tools.search_tools import _get_client
+
+    client = _get_client()
+    names = list(collections) if collections else [COLLECTION_NAME]
+    return "|".join(resolve_alias(client, n) or n for n in names)
+
+
+class SemanticAnswerCache:
+    """Question-embedding index of past answers, keyed by collection version and retrieval params."""
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+                 embedding=None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._embedding = embedding
+        self._lock = threading.Lock()
+        self._version_cache: Dict[str, Any] = {}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {r[1] for r in self._conn.execute("PRAGMA table_info(answers)")}
+        if "params" not in columns:  # caches written before params_key(): their rows never match
+            self._conn.execute("ALTER TABLE answers ADD COLUMN params TEXT NOT NULL DEFAULT ''")
+        self._load()
+
+    # ---------- Index ----------
+
+    def _load(self):
+        if self.ttl > 0:
+            self._conn.execute("DELETE FROM answers WHERE created < ?", (time.time() - self.ttl,))
+        rows = self._conn.execute(
+            "SELECT id, question, vector, version, created, params FROM answers ORDER BY id").fetchall()
+        self._ids: List[int] = [r[0] for r in rows]
+        self._questions: List[str] = [_normalize_question(r[1]) for r in rows]
+        self._versions: List[str] = [r[3] for r in rows]
+        self._created: List[float] = [r[4] for r in rows]
+        self._params: List[str] = [r[5] for r in rows]
+        self._matrix = (np.stack([np.frombuffer(r[2], dtype=np.float32) for r in rows])
+                        if rows else np.zeros((0, 0), dtype=np.float32))
+        log.info(f"💾 Answer cache: {len(rows)} entries loaded")
+
+    def _embed(self, text: str) -> np.ndarray:
+        if self._embedding is None:
+            from My_RAG_Project.llm_models.embeddings_model import get_bge_embedding
+
+            self._embedding = get_bge_embedding()
+        vec = np.asarray(self._embedding.embed_query(text), dtype=np.float32)
+        return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+    def _version(self, collections: Optional[Sequence[str]]) -> str:
+        key = "|".join(collections or [])
+        cached = self._version_cache.get(key)
+        now = time.monotonic()
+        if cached is None or now - cached[1] > VERSION_CHECK_SECONDS:
+            cached = (collection_version(collections), now)
+            self._version_cache[key] = cached
+        return cached[0]
+
+    def _fresh(self, i: int, version: str, key: str, now: float) -> bool:
+        return (self._versions[i] == version and self._params[i] == key
+                and (self.ttl <= 0 or now - self._created[i] <= self.ttl))
+
+    # ---------- API ----------
+
+    def lookup(self, question: str, collections: Optional[Sequence[str]] = None,
+               key: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Stored {"answer", "citations", "similarity", "cached_question"} for a near-duplicate, else None.
+        `key`: params_key() of the request's retrieval params.
+        """
+        version = self._version(collections)
+        now = time.time()
+        norm = _normalize_question(question)
+
+        # The row id is resolved in the same critical section as the match: a concurrent
+        # store() may _evict() and rebuild the index, which renumbers the positions.
+        with self._lock:
+            exact = [i for i, q in enumerate(self._questions) if q == norm and self._fresh(i, version, key, now)]
+            if exact:
+                row_id, sim = self._ids[exact[-1]], 1.0
+        if not exact:
+            vec = self._embed(question)
+            with self._lock:
+                if not len(self._ids):
+                    return None
+                sims = self._matrix @ vec
+                stale = [i for i in range(len(self._ids)) if not self._fresh(i, version, key, now)]
+                sims[stale] = -1.0
+                best = int(np.argmax(sims))
+                row_id, sim = self._ids[best], float(sims[best])
+            if sim < self.threshold:
+                return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT question, answer, citations FROM answers WHERE id = ?", (row_id,)).fetchone()
+            if row is None:  # evicted meanwhile
+                return None
+            self._conn.execute("UPDATE answers SET hits = hits + 1, last_access = ? WHERE id = ?", (now, row_id))
+        return {"answer": row[1], "citations": json.loads(row[2]), "similarity": sim, "cached_question": row[0]}
+
+    def store(self, question: str, answer: str, citations: List[Dict[str, Any]],
+              collections: Optional[Sequence[str]] = None, key: str = ""):
+        version = self._version(collections)
+        vec = self._embed(question)
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO answers (question, vector, version, params, answer, citations, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (question, vec.tobytes(), version, key, answer, json.dumps(citations, ensure_ascii=False, default=str),
+                 now, now),
+            )
+            self._ids.append(cur.lastrowid)
+            self._questions.append(_normalize_question(question))
+            self._versions.append(version)
+            self._created.append(now)
+            self._params.append(key)
+            self._matrix = vec[None, :] if not self._matrix.size else np.vstack([self._matrix, vec])
+            if len(self._ids) > self.max_entries:
+                self._evict(version)
+
+    def _evict(self, version: str):
+        """Drop entries of other versions first, then the least recently used (lock held)."""
+        self._conn.execute("DELETE FROM answers WHERE version != ?", (version,))
+        overflow = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_access LIMIT ?)", (overflow,))
+        self._load()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._load()
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """Process-wide answer cache, or None when disabled (ANSWER_CACHE_MAX_ENTRIES <= 0)."""
+    if ANSWER_CACHE_MAX_ENTRIES <= 0:
+        return None
+    return SemanticAnswerCache()
+
+
+def cacheable(state: Dict[str, Any]) -> bool:
+    """Only grounded answers that passed the graders are reused (no web results, no refusals)."""
+    quality = state.get("quality") or {}
+    return bool(
+        state.get("answer")
+        and state.get("citations")
+        and not state.get("needs_web")
+        and quality.get("answer_sufficient", True)
+        and quality.get("answer_relevance", 1.0) >= 0.5
+        and not quality.get("hallucination")
+    )
@@ -3,20 +3,12 @@ from langchain_core.documents import Document
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
-from My_RAG_Project.llm_models.embeddings_model import llm
+from My_RAG_Project.llm_models.embeddings_model import get_llm
+from My_RAG_Project.llm_models.llm_cache import llm_cache_scope
+from My_RAG_Project.utils.stream_utils import ANSWER_STREAM_TAG
+from My_RAG_Project.tools.context_packer import pack_documents
 from My_RAG_Project.utils.log_utils import log
-
-
-def _context_from_docs(docs: List[Document]) -> str:
-    parts = []
-    for d in docs:
-        meta = d.metadata or {}
-        page = meta.get("page_number", "")
-        src = meta.get("source", "")
-        kw = meta.get("keywords", "")
-        sc = meta.get("_score", "")
-        parts.append(f"[p{page} | score={sc} | kw={kw} | src={src}]\n{d.page_content}")
-    return "\n\n---\n\n".join(parts)
+from My_RAG_Project.utils.async_utils import run_blocking, llm_slot
 
 
 def _citations(docs: List[Document]) -> List[Dict[str, Any]]:
@@ -33,6 +25,26 @@ def _citations(docs: List[Document]) -> List[Dict[str, Any]]:
     return cites
 
 
+_NO_CONTEXT_ANSWER = "抱歉，未检索到足够的上下文来回答该问题。"
+
+_PROMPT = PromptTemplate(
+    template=(
+        "You are a helpful Chinese assistant. Answer the question ONLY using the given context.\n"
+        "If the context is insufficient, say you don't know.\n\n"
+        "Question:\n{question}\n\n"
+        "Context:\n{context}\n\n"
+        "Answer in Chinese:"
+    ),
+    input_variables=["question", "context"],
+)
+
+
+def _chain():
+    # Tagged: its tokens are streamed to the caller (utils/stream_utils.py)
+    return (_PROMPT | get_llm() | StrOutputParser()).with_config(tags=[ANSWER_STREAM_TAG])
+
+
+@llm_cache_scope("generate")
 def generate_node2(state):
     """
     Generate final answer strictly from filtered_docs.
@@ -42,24 +54,29 @@ def generate_node2(state):
     question: str = state.get("query") or state.get("user_input") or ""
 
     if not docs:
-        state["answer"] = "抱歉，未检索到足够的上下文来回答该问题。"
+        state["answer"] = _NO_CONTEXT_ANSWER
         state["citations"] = []
         return {"answer": state["answer"], "citations": []}
 
-    context = _context_from_docs(docs)
-    prompt = PromptTemplate(
-        template=(
-            "You are a helpful Chinese assistant. Answer the question ONLY using the given context.\n"
-            "If the context is insufficient, say you don't know.\n\n"
-            "Question:\n{question}\n\n"
-            "Context:\n{context}\n\n"
-            "Answer in Chinese:"
-        ),
-        input_variables=["question", "context"],
-    )
-    chain = prompt | llm | StrOutputParser()
-    ans = chain.invoke({"question": question, "context": context})
+    context = pack_documents(docs, question)
+    ans = _chain().invoke({"question": question, "context": context})
 
     state["answer"] = ans
     state["citations"] = _citations(docs)
     return {"answer": ans, "citations": state["citations"]}
+
+
+@llm_cache_scope("generate")
+async def agenerate_node2(state):
+    """Async generate_node2: packing (embeddings) on the I/O pool, the LLM awaited."""
+    log.info("[Adaptive] agenerate_node2")
+    docs: List[Document] = state.get("filtered_docs", [])
+    question: str = state.get("query") or state.get("user_input") or ""
+
+    if not docs:
+        return {"answer": _NO_CONTEXT_ANSWER, "citations": []}
+
+    context = await run_blocking(pack_documents, docs, question)
+    async with llm_slot():
+        ans = await _chain().ainvoke({"question": question, "context": context})
+    return {"answer": ans, "citations": _citations(docs)}
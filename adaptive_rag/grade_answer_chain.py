@@ -1,5 +1,8 @@
 from My_RAG_Project.utils.log_utils import log
-from My_RAG_Project.llm_models.embeddings_model import llm
+from My_RAG_Project.utils.async_utils import run_blocking, llm_slot
+from My_RAG_Project.llm_models.embeddings_model import get_llm
+from My_RAG_Project.llm_models.llm_cache import llm_cache_scope
+from My_RAG_Project.tools.context_packer import pack_documents
 from langchain_core.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 
@@ -10,34 +13,57 @@ class AnswerQuality(BaseModel):
     sufficient: bool = Field(description="Is the answer sufficient to address the user question?")
 
 
+_PROMPT = PromptTemplate.from_template(
+    "Question:\n{q}\n\nContext Preview:\n{c}\n\nAnswer:\n{a}\n\n"
+    "Evaluate:\n"
+    "- relevance (0~1)\n"
+    "- uses_citations (true/false)\n"
+    "- sufficient (true/false)\n"
+    "Return JSON with keys: relevance, uses_citations, sufficient"
+)
+
+
+def _preview(state) -> str:
+    docs = state.get("filtered_docs", [])
+    question = state.get("query") or state.get("user_input") or ""
+    return pack_documents(docs, question, budget=400, doc_budget=80, header=None)
+
+
+def _prompt(state, context_preview: str) -> str:
+    question = state.get("query") or state.get("user_input") or ""
+    return _PROMPT.format(q=question, c=context_preview, a=state.get("answer", ""))
+
+
+def _result(quality: AnswerQuality):
+    # Runs in parallel with grade_hallucinations_chain: return only our own keys
+    # (AdaptiveState.quality merges them).
+    scores = {
+        "answer_relevance": quality.relevance,
+        "answer_uses_citations": quality.uses_citations,
+        "answer_sufficient": quality.sufficient,
+    }
+    retry = (quality.relevance < 0.5) or (not quality.sufficient)
+    return {"quality": scores, "need_retry_answer": retry}
+
+
+@llm_cache_scope("grade_answer")
 def grade_answer_chain(state):
     """
     Grade final answer quality using LLM. You can replace with rules if needed.
     If quality is low, signal a retry.
     """
     log.info("[Adaptive] grade_answer_chain")
-    answer = state.get("answer", "")
-    docs = state.get("filtered_docs", [])
-    question = state.get("query") or state.get("user_input") or ""
-
-    context_preview = "\n\n---\n\n".join([d.page_content[:150] for d in docs])
+    structured = get_llm().with_structured_output(AnswerQuality)
+    quality = structured.invoke(_prompt(state, _preview(state)))
+    return _result(quality)
 
-    prompt = PromptTemplate.from_template(
-        "Question:\n{q}\n\nContext Preview:\n{c}\n\nAnswer:\n{a}\n\n"
-        "Evaluate:\n"
-        "- relevance (0~1)\n"
-        "- uses_citations (true/false)\n"
-        "- sufficient (true/false)\n"
-        "Return JSON with keys: relevance, uses_citations, sufficient"
-    )
-    structured = llm.with_structured_output(AnswerQuality)
-    quality = structured.invoke(prompt.format(q=question, c=context_preview, a=answer))
 
-    state.setdefault("quality", {})
-    state["quality"]["answer_relevance"] = quality.relevance
-    state["quality"]["answer_uses_citations"] = quality.uses_citations
-    state["quality"]["answer_sufficient"] = quality.sufficient
-
-    retry = (quality.relevance < 0.5) or (not quality.sufficient)
-    state["need_retry_answer"] = retry
-    return {"quality": state["quality"], "need_retry_answer": retry}
+@llm_cache_scope("grade_answer")
+async def agrade_answer_chain(state):
+    """Async grade_answer_chain."""
+    log.info("[Adaptive] agrade_answer_chain")
+    preview = await run_blocking(_preview, state)
+    structured = get_llm().with_structured_output(AnswerQuality)
+    async with llm_slot():
+        quality = await structured.ainvoke(_prompt(state, preview))
+    return _result(quality)
@@ -1,7 +1,25 @@
+import hashlib
 from typing import List, Dict, Any
 from langchain_core.documents import Document
 from My_RAG_Project.utils.log_utils import log
-from My_RAG_Project.adaptive_rag.grader_chain import simple_relevance_score, filter_low_score
+from My_RAG_Project.adaptive_rag.grader_chain import simple_relevance_score, select_graded
+
+
+MIN_SCORE = 0.2
+
+
+def _doc_key(doc: Document) -> str:
+    pk = doc.metadata.get("pk")
+    if pk is not None:
+        return f"pk:{pk}"
+    digest = hashlib.md5(doc.page_content.encode("utf-8")).hexdigest()
+    return f"{doc.metadata.get('source', '')}:{digest}"
+
+
+def _graded(doc: Document) -> Document:
+    """Copy of `doc` carrying its verdict (the incoming Document is left untouched)."""
+    grade = "keep" if float(doc.metadata.get("_score", 0.0)) >= MIN_SCORE else "drop"
+    return Document(page_content=doc.page_content, metadata={**doc.metadata, "_grade": grade})
 
 
 def grade_documents_node(state):
@@ -9,17 +27,29 @@ def grade_documents_node(state):
     Grade and filter retrieved documents.
     - Use the numeric score (metadata['_score']) to compute an average relevance.
     - Filter low-score docs; return need_more_docs if coverage seems insufficient.
+    - Incremental across iterations: only documents not graded before are graded
+      (verdict in metadata['_grade']); they join state['graded_docs'], and the
+      filtered set is chosen from the stored verdicts of everything graded so far.
     """
     log.info("[Adaptive] grade_documents_node")
     docs: List[Document] = state.get("docs", [])
-    avg = simple_relevance_score(docs)
-    filtered = filter_low_score(docs, min_score=0.2, min_keep=3)
+    pool: List[Document] = list(state.get("graded_docs") or [])
+    known = {_doc_key(d) for d in pool}
+    new = [_graded(d) for d in docs if _doc_key(d) not in known]
+    pool.extend(new)
+
+    filtered = select_graded(pool, min_keep=3)
+    avg = simple_relevance_score(filtered)
 
     need_more_docs = (len(filtered) < 2) or (avg < 0.15)
     quality: Dict[str, Any] = state.get("quality", {})
-    quality.update({"relevancy_avg": avg, "kept": len(filtered), "total": len(docs)})
+    quality.update({"relevancy_avg": avg, "kept": len(filtered), "total": len(pool), "new": len(new)})
 
     state["filtered_docs"] = filtered
+    state["graded_docs"] = pool
     state["quality"] = quality
     state["need_more_docs"] = need_more_docs
-    return {"filtered_docs": filtered, "quality": quality, "need_more_docs": need_more_docs}
+    update = {"filtered_docs": filtered, "graded_docs": pool, "quality": quality, "need_more_docs": need_more_docs}
+    if need_more_docs:
+        update["iterations"] = state.get("iterations", 0) + 1  # routing functions cannot write state
+    return update
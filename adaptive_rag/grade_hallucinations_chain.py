@@ -1,5 +1,8 @@
 from My_RAG_Project.utils.log_utils import log
-from My_RAG_Project.llm_models.embeddings_model import llm
+from My_RAG_Project.utils.async_utils import run_blocking, llm_slot
+from My_RAG_Project.llm_models.embeddings_model import get_llm
+from My_RAG_Project.llm_models.llm_cache import llm_cache_scope
+from My_RAG_Project.tools.context_packer import pack_documents
 from langchain_core.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 
@@ -8,23 +11,39 @@ class HalluCheck(BaseModel):
     hallucination: bool = Field(description="true if the answer includes claims not supported by context")
 
 
+_PROMPT = PromptTemplate.from_template(
+    "Given the context and the answer, determine if the answer contains unsupported claims.\n\n"
+    "Context:\n{c}\n\nAnswer:\n{a}\n\n"
+    "Return JSON: {{\"hallucination\": true/false}}"
+)
+
+
+def _context(state) -> str:
+    docs = state.get("filtered_docs", [])
+    question = state.get("query") or state.get("user_input") or ""
+    # Same packing as generate_node2, so the check sees exactly the generator's context
+    return pack_documents(docs, question)
+
+
+@llm_cache_scope("grade_hallucinations")
 def grade_hallucinations_chain(state):
     """
     Check whether the answer includes hallucinated claims.
     """
     log.info("[Adaptive] grade_hallucinations_chain")
-    answer = state.get("answer", "")
-    docs = state.get("filtered_docs", [])
-    context = "\n\n---\n\n".join([d.page_content for d in docs])
-
-    prompt = PromptTemplate.from_template(
-        "Given the context and the answer, determine if the answer contains unsupported claims.\n\n"
-        "Context:\n{c}\n\nAnswer:\n{a}\n\n"
-        "Return JSON: {{\"hallucination\": true/false}}"
-    )
-    structured = llm.with_structured_output(HalluCheck)
-    res = structured.invoke(prompt.format(c=context, a=answer))
-
-    state.setdefault("quality", {})
-    state["quality"]["hallucination"] = res.hallucination
-    return {"quality": state["quality"]}
+    structured = get_llm().with_structured_output(HalluCheck)
+    res = structured.invoke(_PROMPT.format(c=_context(state), a=state.get("answer", "")))
+
+    # Runs in parallel with grade_answer_chain; AdaptiveState.quality merges the results.
+    return {"quality": {"hallucination": res.hallucination}}
+
+
+@llm_cache_scope("grade_hallucinations")
+async def agrade_hallucinations_chain(state):
+    """Async grade_hallucinations_chain."""
+    log.info("[Adaptive] agrade_hallucinations_chain")
+    context = await run_blocking(_context, state)
+    structured = get_llm().with_structured_output(HalluCheck)
+    async with llm_slot():
+        res = await structured.ainvoke(_PROMPT.format(c=context, a=state.get("answer", "")))
+    return {"quality": {"hallucination": res.hallucination}}
@@ -23,3 +23,13 @@ def filter_low_score(docs: List[Document], min_score: float = 0.2, min_keep: int
     if kept:
         return kept[:max(min_keep, len(kept))]
     return docs_sorted[:min_keep]
+
+
+def select_graded(docs: List[Document], min_keep: int = 3) -> List[Document]:
+    """
+    Documents graded "keep" (metadata['_grade']), best score first; the top `min_keep`
+    by score if none is.
+    """
+    docs_sorted = sorted(docs, key=lambda d: float(d.metadata.get("_score", 0.0)), reverse=True)
+    kept = [d for d in docs_sorted if d.metadata.get("_grade") == "keep"]
+    return kept or docs_sorted[:min_keep]
@@ -1,18 +1,28 @@
+import asyncio
+import time
 import uuid
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
 from langgraph.graph import StateGraph
 from langgraph.constants import START, END
-from langgraph.checkpoint.memory import MemorySaver
 
 from My_RAG_Project.utils.log_utils import log
-from My_RAG_Project.adaptive_rag.graph_state2 import AdaptiveState, default_retrieval_params, inc_iterations
-from My_RAG_Project.adaptive_rag.transform_query_node import transform_query_node
+from My_RAG_Project.utils.stream_utils import stream_answer_tokens, astream_answer_tokens
+from My_RAG_Project.utils.async_utils import run_blocking, session_slot
+from My_RAG_Project.utils.checkpointer import get_checkpointer
+from My_RAG_Project.utils.tracing import start_trace, span, traced_node, current_request_id
+from My_RAG_Project.llm_models.llm_cache import get_llm_cache
+from My_RAG_Project.adaptive_rag.answer_cache import get_answer_cache, cacheable, params_key
+from My_RAG_Project.adaptive_rag.graph_state2 import AdaptiveState, default_retrieval_params, iterations_exhausted
+from My_RAG_Project.adaptive_rag.transform_query_node import transform_query_node, atransform_query_node
 from My_RAG_Project.adaptive_rag.query_route_chain import query_route_chain
-from My_RAG_Project.adaptive_rag.retriever_node import retriever_node
+from My_RAG_Project.adaptive_rag.retriever_node import retriever_node, aretriever_node
 from My_RAG_Project.adaptive_rag.grade_documents_node import grade_documents_node
-from My_RAG_Project.adaptive_rag.web_search_node import web_search_node
-from My_RAG_Project.adaptive_rag.generate_node2 import generate_node2
-from My_RAG_Project.adaptive_rag.grade_answer_chain import grade_answer_chain
-from My_RAG_Project.adaptive_rag.grade_hallucinations_chain import grade_hallucinations_chain
+from My_RAG_Project.adaptive_rag.web_search_node import web_search_node, aweb_search_node
+from My_RAG_Project.adaptive_rag.generate_node2 import generate_node2, agenerate_node2
+from My_RAG_Project.adaptive_rag.grade_answer_chain import grade_answer_chain, agrade_answer_chain
+from My_RAG_Project.adaptive_rag.grade_hallucinations_chain import grade_hallucinations_chain, agrade_hallucinations_chain
 
 
 def _route_after_docs(state: AdaptiveState):
@@ -23,7 +33,7 @@ def _route_after_docs(state: AdaptiveState):
     """
     if state.get("need_more_docs"):
         # Stop if reached iteration limit
-        if inc_iterations(state, max_iters=3):
+        if iterations_exhausted(state, max_iters=3):
             return "generate"
         if state.get("needs_web"):
             return "web_search"
@@ -33,27 +43,47 @@ def _route_after_docs(state: AdaptiveState):
 
 def _route_after_answer(state: AdaptiveState):
     """
-    If answer failed quality check, try another retrieval round.
+    Joined decision after both answer graders: if the answer failed the quality
+    check, try another retrieval round.
     """
     if state.get("need_retry_answer"):
-        if inc_iterations(state, max_iters=3):
+        if iterations_exhausted(state, max_iters=3):
             return END
         return "transform_query"
-    return "hallucination_check"
+    return END
 
 
-def build_graph():
+def answer_join(state: AdaptiveState):
+    """
+    Barrier for the parallel answer/hallucination graders (their updates are already merged).
+    Counts the retry round here: routing functions cannot write state.
+    """
+    if state.get("need_retry_answer"):
+        return {"iterations": state.get("iterations", 0) + 1}
+    return {}
+
+
+def build_graph(use_async: bool = False):
+    """
+    Compile the adaptive graph. With use_async=True the I/O nodes are the async variants
+    (awaited LLM calls, Milvus/embedding work on the I/O pool); run it with
+    ainvoke/astream. Cheap CPU-only nodes are shared by both builds.
+    """
     g = StateGraph(AdaptiveState)
 
+    def add_node(name, fn):
+        g.add_node(name, traced_node(name, fn))  # one "node" span per run (utils/tracing.py)
+
     # Nodes
-    g.add_node("transform_query", transform_query_node)
-    g.add_node("query_route", query_route_chain)
-    g.add_node("retriever", retriever_node)
-    g.add_node("grade_docs", grade_documents_node)
-    g.add_node("web_search", web_search_node)
-    g.add_node("generate", generate_node2)
-    g.add_node("answer_grade", grade_answer_chain)
-    g.add_node("hallucination_check", grade_hallucinations_chain)
+    add_node("transform_query", atransform_query_node if use_async else transform_query_node)
+    add_node("query_route", query_route_chain)
+    add_node("retriever", aretriever_node if use_async else retriever_node)
+    add_node("grade_docs", grade_documents_node)
+    add_node("web_search", aweb_search_node if use_async else web_search_node)
+    add_node("generate", agenerate_node2 if use_async else generate_node2)
+    add_node("answer_grade", agrade_answer_chain if use_async else grade_answer_chain)
+    add_node("hallucination_check", agrade_hallucinations_chain if use_async else grade_hallucinations_chain)
+    add_node("answer_join", answer_join)
 
     # Edges
     g.add_edge(START, "transform_query")
@@ -65,45 +95,247 @@ def build_graph():
                              "web_search": "web_search",
                              "generate": "generate"})
     g.add_edge("web_search", "grade_docs")
+    # Both graders read the same answer/context: run them as parallel branches
+    # and join into one routing decision (saves a full LLM round trip).
     g.add_edge("generate", "answer_grade")
-    g.add_conditional_edges("answer_grade", _route_after_answer,
+    g.add_edge("generate", "hallucination_check")
+    g.add_edge(["answer_grade", "hallucination_check"], "answer_join")
+    g.add_conditional_edges("answer_join", _route_after_answer,
                             {"transform_query": "transform_query",
-                             "hallucination_check": "hallucination_check",
                              END: END})
-    g.add_edge("hallucination_check", END)
 
-    memory = MemorySaver()
-    return g.compile(checkpointer=memory)
+    # Bounded SQLite checkpointer shared by the sync and async builds (utils/checkpointer.py)
+    return g.compile(checkpointer=get_checkpointer("adaptive"))
+
+
+@lru_cache(maxsize=1)
+def get_graph():
+    """Compiled adaptive graph, built on first use and shared by the process."""
+    return build_graph()
+
+
+@lru_cache(maxsize=1)
+def get_async_graph():
+    """Compiled adaptive graph with async nodes (for ainvoke / astream)."""
+    return build_graph(use_async=True)
+
+
+def initial_state(question: str, retrieval_params: Optional[Dict[str, Any]] = None) -> AdaptiveState:
+    return {
+        "messages": [],
+        "user_input": question,
+        "query": question,
+        "queries": [],
+        "retrieval_params": retrieval_params or default_retrieval_params(),
+        "docs": [],
+        "seen_ids": [],
+        "graded_docs": [],
+        "filtered_docs": [],
+        "answer": "",
+        "citations": [],
+        "needs_web": False,
+        "quality": {},
+        "iterations": 0,
+    }
+
+
+def _cache_scope(params: Dict[str, Any]) -> Tuple[Any, str]:
+    """(collections, params_key) of a request; taken before the run (query_route_chain edits the params)."""
+    return params.get("collections"), params_key(params)
+
+
+def _cached_answer(question: str, scope: Tuple[Any, str]) -> Optional[Dict[str, Any]]:
+    cache = get_answer_cache()
+    with span("answer_cache_lookup", "cache") as attrs:
+        hit = cache.lookup(question, *scope) if cache is not None else None
+        attrs["hit"] = hit is not None
+    if hit is not None:
+        log.info(f"[Adaptive] answer cache hit (sim={hit['similarity']:.3f}): {hit['cached_question']}")
+    return hit
+
+
+def _remember_answer(question: str, state: Dict[str, Any], scope: Tuple[Any, str]):
+    cache = get_answer_cache()
+    if cache is not None and cacheable(state):
+        cache.store(question, state["answer"], state["citations"], *scope)
+
+
+def answer_question(question: str, config: Optional[Dict[str, Any]] = None,
+                    retrieval_params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Answer through the semantic answer cache, running the graph only on a miss.
+    Returns the final state values (plus "cached": bool and, on a hit, "similarity").
+    """
+    params = retrieval_params or default_retrieval_params()
+    scope = _cache_scope(params)
+    with start_trace(route="adaptive"):
+        hit = _cached_answer(question, scope)
+        if hit is not None:
+            return {"user_input": question, "answer": hit["answer"], "citations": hit["citations"],
+                    "cached": True, "similarity": hit["similarity"]}
+
+        config = config or {"configurable": {"thread_id": str(uuid.uuid4())}}
+        state = get_graph().invoke(initial_state(question, params), config=config)
+        _remember_answer(question, state, scope)
+    return {**state, "cached": False}
+
+
+class _AnswerStream:
+    """Builds the stream_answer / astream_answer events from token-stream items."""
+
+    def __init__(self, question: str, scope: Tuple[Any, str]):
+        self.t0 = time.perf_counter()
+        self.question = question
+        self.scope = scope
+        self.ttft_ms: Optional[float] = None
+        self.state: Dict[str, Any] = {}
+
+    def cached(self, hit: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        ms = (time.perf_counter() - self.t0) * 1000
+        yield {"type": "token", "text": hit["answer"]}
+        yield {"type": "final", "answer": hit["answer"], "citations": hit["citations"], "quality": {},
+               "cached": True, "ttft_ms": ms, "total_ms": ms, "request_id": current_request_id()}
+
+    def feed(self, kind: str, payload: Any) -> Optional[Dict[str, Any]]:
+        if kind == "token":
+            if self.ttft_ms is None:
+                self.ttft_ms = (time.perf_counter() - self.t0) * 1000
+            return {"type": "token", "text": payload}
+        if kind == "reset":
+            return {"type": "retract", "reason": "answer failed grading; regenerating"}
+        self.state = payload
+        return None
+
+    def finish(self) -> Iterator[Dict[str, Any]]:
+        quality = self.state.get("quality") or {}
+        if quality.get("hallucination"):
+            yield {"type": "annotate", "level": "warning", "message": "答案中可能包含上下文不支持的内容，请核对引用。"}
+        if self.state.get("need_retry_answer"):
+            yield {"type": "annotate", "level": "warning", "message": "答案未通过质量评估（已达最大重试次数）。"}
+
+        total_ms = (time.perf_counter() - self.t0) * 1000
+        ttft_ms = self.ttft_ms if self.ttft_ms is not None else total_ms
+        log.info(f"[Adaptive] ttft={ttft_ms:.0f}ms total={total_ms:.0f}ms")
+        yield {"type": "final", "answer": self.state.get("answer", ""), "citations": self.state.get("citations", []),
+               "quality": quality, "cached": False, "ttft_ms": ttft_ms, "total_ms": total_ms,
+               "request_id": current_request_id()}
+
+
+def stream_answer(question: str, config: Optional[Dict[str, Any]] = None,
+                  retrieval_params: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Like answer_question(), but yields events while the answer is generated:
+        {"type": "token", "text": str}          answer text as the LLM produces it
+        {"type": "retract", "reason": str}      discard the text streamed so far (graph retried)
+        {"type": "annotate", "level": str, "message": str}
+                                                grader verdict on the streamed answer
+        {"type": "final", "answer", "citations", "quality", "cached", "ttft_ms", "total_ms", "request_id"}
+    Graders run after the answer has been streamed, so their verdict arrives as
+    annotate events instead of delaying the first token.
+    """
+    params = retrieval_params or default_retrieval_params()
+    scope = _cache_scope(params)
+    with start_trace(route="adaptive"):
+        out = _AnswerStream(question, scope)
+
+        hit = _cached_answer(question, scope)
+        if hit is not None:
+            yield from out.cached(hit)
+            return
+
+        config = config or {"configurable": {"thread_id": str(uuid.uuid4())}}
+        for kind, payload in stream_answer_tokens(get_graph(), initial_state(question, params), config):
+            event = out.feed(kind, payload)
+            if event is not None:
+                yield event
+        _remember_answer(question, out.state, scope)
+        yield from out.finish()
+
+
+async def aanswer_question(question: str, config: Optional[Dict[str, Any]] = None,
+                           retrieval_params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Async answer_question() on the async graph, bounded by MAX_CONCURRENT_SESSIONS."""
+    params = retrieval_params or default_retrieval_params()
+    scope = _cache_scope(params)
+    async with session_slot():
+        with start_trace(route="adaptive"):
+            hit = await run_blocking(_cached_answer, question, scope)
+            if hit is not None:
+                return {"user_input": question, "answer": hit["answer"], "citations": hit["citations"],
+                        "cached": True, "similarity": hit["similarity"]}
+
+            config = config or {"configurable": {"thread_id": str(uuid.uuid4())}}
+            state = await get_async_graph().ainvoke(initial_state(question, params), config=config)
+            await run_blocking(_remember_answer, question, state, scope)
+    return {**state, "cached": False}
+
+
+async def astream_answer(question: str, config: Optional[Dict[str, Any]] = None,
+                         retrieval_params: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Async stream_answer() on the async graph (same events), bounded by MAX_CONCURRENT_SESSIONS."""
+    params = retrieval_params or default_retrieval_params()
+    scope = _cache_scope(params)
+    async with session_slot():
+        with start_trace(route="adaptive"):
+            out = _AnswerStream(question, scope)
+            hit = await run_blocking(_cached_answer, question, scope)
+            if hit is not None:
+                for event in out.cached(hit):
+                    yield event
+                return
+
+            config = config or {"configurable": {"thread_id": str(uuid.uuid4())}}
+            async for kind, payload in astream_answer_tokens(get_async_graph(), initial_state(question, params),
+                                                             config):
+                event = out.feed(kind, payload)
+                if event is not None:
+                    yield event
+            await run_blocking(_remember_answer, question, out.state, scope)
+            for event in out.finish():
+                yield event
+
+
+async def _answer_many(questions):
+    """Answer several questions concurrently on one event loop (CLI --concurrent smoke test)."""
+    results = await asyncio.gather(*(aanswer_question(q) for q in questions), return_exceptions=True)
+    for q, r in zip(questions, results):
+        print(f"\n=== {q} ===")
+        print(r if isinstance(r, Exception) else r["answer"])
 
 
 if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 2 and sys.argv[1] == "--concurrent":
+        # python -m My_RAG_Project.adaptive_rag.graph_2 --concurrent "问题1" "问题2" ...
+        asyncio.run(_answer_many(sys.argv[2:]))
+        sys.exit(0)
+
     log.info("[Adaptive] Graph v2 starting...")
-    graph = build_graph()
+    graph = get_graph()
     config = {"configurable": {"thread_id": str(uuid.uuid4())}}
 
     while True:
         q = input("用户> ").strip()
         if q.lower() in {"q", "quit", "exit"}:
             break
-        state = {
-            "messages": [],
-            "user_input": q,
-            "query": q,
-            "retrieval_params": default_retrieval_params(),
-            "docs": [],
-            "filtered_docs": [],
-            "answer": "",
-            "citations": [],
-            "needs_web": False,
-            "quality": {},
-            "iterations": 0,
-        }
-        for ev in graph.stream(state, config=config, stream_mode="values"):
-            pass
 
         print("\n=== Answer ===")
-        print(graph.get_state(config)["answer"])
+        result: Dict[str, Any] = {}
+        for ev in stream_answer(q, config=config):
+            if ev["type"] == "token":
+                print(ev["text"], end="", flush=True)
+            elif ev["type"] == "retract":
+                print(f"\n[{ev['reason']}]\n")
+            elif ev["type"] == "annotate":
+                print(f"\n⚠️ {ev['message']}")
+            else:
+                result = ev
+        print(f"\n({'cached, ' if result['cached'] else ''}first token {result['ttft_ms']:.0f}ms, "
+              f"total {result['total_ms']:.0f}ms)")
         print("\n=== Citations (top) ===")
-        for c in graph.get_state(config).get("citations", [])[:5]:
+        for c in result.get("citations", [])[:5]:
             print(f"- p{c['page_number']} | score={c['score']} | {c['source']} | {c['snippet'][:80]}...")
         print()
+        if get_llm_cache() is not None:
+            log.info(f"LLM cache per chain: {get_llm_cache().stats()}")
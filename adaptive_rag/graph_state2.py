@@ -3,6 +3,13 @@ from langchain_core.documents import Document
 from langgraph.graph import add_messages
 from langchain_core.messages import BaseMessage
 
+from My_RAG_Project.utils.env_utils import MULTI_QUERY_COUNT
+
+
+def merge_quality(left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Reducer for `quality`: parallel graders each contribute their own keys."""
+    return {**(left or {}), **(right or {})}
+
 
 class AdaptiveState(TypedDict, total=False):
     """
@@ -11,25 +18,41 @@ class AdaptiveState(TypedDict, total=False):
     messages: dialog/tool messages accumulated by the graph.
     user_input: the original user query.
     query: query used for retrieval after transform.
-    retrieval_params: parameters for retrieval (strategy/k/expr/rrf_k).
-    docs: raw retrieved documents.
+    queries: multi-query mode only: the question plus its generated sub-queries /
+        paraphrases, searched together in one batch and fused.
+    retrieval_params: parameters for retrieval (strategy/k/expr/rrf_k; optional
+        collections/shard_timeout to fan out over several collections; multi_query
+        = number of generated sub-queries, 0 for single-query mode).
+    docs: documents retrieved in the current iteration (new candidates only).
+    seen_ids: primary keys of every chunk retrieved so far; later iterations exclude them.
+    graded_docs: every candidate graded so far (verdict in metadata['_grade']);
+        filtered_docs is chosen from this pool, so nothing is fetched or graded twice.
     filtered_docs: documents after grading/filtering.
     answer: final answer text.
     citations: list of citation dictionaries (source/page/snippet/score).
     needs_web: whether to route to web search.
-    quality: dict to store quality signals (relevance/coverage/hallucination scores).
-    iterations: loop counter to avoid infinite retries.
+    quality: dict to store quality signals (relevance/coverage/hallucination scores);
+        merged across nodes, so the answer and hallucination graders can run in parallel.
+    need_more_docs: set by the document grader when another retrieval round is needed.
+    need_retry_answer: set by the answer grader when the answer should be retried.
+    iterations: loop counter to avoid infinite retries; written by the nodes that ask for
+        another round (routing functions cannot update state).
     """
     messages: Annotated[List[BaseMessage], add_messages]
     user_input: str
     query: str
+    queries: List[str]
     retrieval_params: Dict[str, Any]
     docs: List[Document]
+    seen_ids: List[int]
+    graded_docs: List[Document]
     filtered_docs: List[Document]
     answer: str
     citations: List[Dict[str, Any]]
     needs_web: bool
-    quality: Dict[str, Any]
+    quality: Annotated[Dict[str, Any], merge_quality]
+    need_more_docs: bool
+    need_retry_answer: bool
     iterations: int
 
 
@@ -38,17 +61,14 @@ def default_retrieval_params() -> Dict[str, Any]:
     Default retrieval parameters for PDF+Milvus stack.
     """
     return {
-        "strategy": "hybrid",          # "dense" | "bm25" | "hybrid"
+        "strategy": "hybrid",          # "dense" | "bm25" | "hybrid" | "two_stage"
         "k": 5,
         "rrf_k": 60,
-        "expr": "page_number >= 1"
+        "expr": "page_number >= 1",
+        "multi_query": MULTI_QUERY_COUNT,  # >0: n LLM-written sub-queries searched in one batch
     }
 
 
-def inc_iterations(state: AdaptiveState, max_iters: int = 3) -> bool:
-    """
-    Increase iteration counter and return True if the loop should stop.
-    """
-    iters = state.get("iterations", 0) + 1
-    state["iterations"] = iters
-    return iters >= max_iters
+def iterations_exhausted(state: AdaptiveState, max_iters: int = 3) -> bool:
+    """True once the persisted loop counter reached `max_iters` (for routing functions)."""
+    return state.get("iterations", 0) >= max_iters
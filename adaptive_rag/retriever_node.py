@@ -1,38 +1,70 @@
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional, Sequence
 from langchain_core.documents import Document
 from My_RAG_Project.utils.log_utils import log
-from My_RAG_Project.tools.search_tools import (
-    dense_similarity_search,
-    sparse_bm25_search,
-    hybrid_rrf_search,
-)
+from My_RAG_Project.utils.async_utils import run_blocking
+from My_RAG_Project.tools.search_tools import search_resultset, multi_query_resultset, exclude_expr
 
 
-def retriever_node(state):
+def _retrieve(queries: Sequence[str], params: Dict[str, Any], exclude: Optional[Sequence[int]] = None
+              ) -> List[Document]:
     """
-    Run retrieval against Milvus PDF collection according to retrieval_params.
-    Write distances/scores into metadata['_score'] for grading.
+    One query: plain search. Several (multi-query mode): all phrasings are embedded and
+    searched as one batch, then their hit lists are fused (RRF) into one top-k list.
+    `exclude`: primary keys already retrieved in earlier iterations; the search is
+    filtered to unseen chunks, so each call returns up to k *new* candidates.
     """
-    log.info("[Adaptive] retriever_node")
-    query = state.get("query") or state.get("user_input") or ""
-    params = state.get("retrieval_params") or {}
     strategy = params.get("strategy", "hybrid")
     k = params.get("k", 5)
-    expr = params.get("expr", "page_number >= 1")
+    expr = exclude_expr(params.get("expr", "page_number >= 1"), exclude or [])
+    kwargs = dict(strategy=strategy, k=k, expr=expr, rrf_k=params.get("rrf_k", 60),
+                  coarse_level=params.get("coarse_level", "page"), coarse_k=params.get("coarse_k", 20),
+                  collections=params.get("collections"), shard_timeout=params.get("shard_timeout"))
 
-    rows: List[Tuple[Document, float]] = []
-    if strategy == "dense":
-        rows = dense_similarity_search(query, k=k, expr=expr, with_score=True)
-    elif strategy == "bm25":
-        rows = sparse_bm25_search(query, k=k, expr=expr, with_score=True)
+    if len(queries) > 1:
+        rs = multi_query_resultset(list(queries), **kwargs)
     else:
-        rows = hybrid_rrf_search(query, k=k, rrf_k=params.get("rrf_k", 60), expr=expr, with_score=True)
+        rs = search_resultset(list(queries), **kwargs)
 
+    seen = set(exclude or [])
     docs: List[Document] = []
-    for doc, score in rows:
-        doc.metadata = dict(doc.metadata or {})
+    for doc, score in rs.documents(0):
+        if doc.metadata.get("pk") in seen:  # beyond the filter's id cap
+            continue
         doc.metadata["_score"] = float(score)
         docs.append(doc)
+    return docs
+
+
+def _update(state, docs: List[Document]) -> Dict[str, Any]:
+    seen = list(state.get("seen_ids") or [])
+    log.info(f"[Adaptive] retrieved {len(docs)} new candidates ({len(seen)} seen before)")
+    return {"docs": docs, "seen_ids": seen + [d.metadata["pk"] for d in docs if "pk" in d.metadata]}
+
+
+def _queries(state) -> List[str]:
+    query = state.get("query") or state.get("user_input") or ""
+    return [q for q in state.get("queries") or [] if q.strip()] or [query]
+
+
+def retriever_node(state):
+    """
+    Run retrieval against Milvus PDF collection according to retrieval_params.
+    Write fused scores into metadata['_score'] (and the primary key into metadata['pk']) for grading.
+    With state['queries'] (multi-query mode) all sub-queries are searched in one batch and fused.
+    Later iterations only fetch chunks not in state['seen_ids']; grade_documents_node merges
+    them with the documents graded before.
+    """
+    log.info("[Adaptive] retriever_node")
+    docs = _retrieve(_queries(state), state.get("retrieval_params") or {}, state.get("seen_ids"))
+
+    update = _update(state, docs)
+    state.update(update)
+    return update
+
 
-    state["docs"] = docs
-    return {"docs": docs}
+async def aretriever_node(state):
+    """Async retriever_node: the blocking Milvus search / query embedding runs on the I/O pool."""
+    log.info("[Adaptive] aretriever_node")
+    docs = await run_blocking(_retrieve, _queries(state), state.get("retrieval_params") or {},
+                              state.get("seen_ids"))
+    return _update(state, docs)
@@ -1,30 +1,81 @@
+import re
+from typing import Any, Dict, List, Sequence
+
 from My_RAG_Project.utils.log_utils import log
-from My_RAG_Project.llm_models.embeddings_model import llm
+from My_RAG_Project.utils.async_utils import llm_slot
+from My_RAG_Project.llm_models.embeddings_model import get_llm
+from My_RAG_Project.llm_models.llm_cache import llm_cache_scope
 from langchain_core.messages import HumanMessage
 
 
+def _expansion_prompt(original: str) -> HumanMessage:
+    return HumanMessage(
+        content=(
+            "Rewrite a short Chinese query into a retrieval-friendly form. "
+            "Keep domain keywords and add 3~5 relevant terms. "
+            f"Original: {original}\n"
+            "Return only the query; do not add explanations."
+        )
+    )
+
+
+def _multi_query_prompt(question: str, n: int, tried: Sequence[str]) -> HumanMessage:
+    avoid = ("Earlier queries did not retrieve enough; do not repeat them:\n" + "\n".join(tried) + "\n") if tried else ""
+    return HumanMessage(
+        content=(
+            f"Write {n} different search queries for a Chinese/English PDF knowledge base that together "
+            "cover the question below. Split a compound question into its sub-questions, otherwise "
+            "paraphrase it with different domain keywords. Keep the question's language.\n"
+            f"{avoid}"
+            f"Question: {question}\n"
+            "Return one query per line, without numbering or explanations."
+        )
+    )
+
+
+def _parse_queries(text: str, question: str, n: int) -> List[str]:
+    """Original question first, then up to n distinct generated queries."""
+    out = [question]
+    for line in text.splitlines():
+        q = re.sub(r"^\s*(?:[-*•]|\d+[.)、])\s*", "", line).strip()
+        if q and q not in out:
+            out.append(q)
+    return out[:n + 1]
+
+
+def _multi_query_count(state) -> int:
+    return int((state.get("retrieval_params") or {}).get("multi_query") or 0)
+
+
+def _multi_query_update(state, text: str, question: str, n: int) -> Dict[str, Any]:
+    queries = _parse_queries(text, question, n)
+    log.info(f"[Adaptive] multi-query: {len(queries)} queries -> {queries}")
+    return {"query": question, "queries": queries}
+
+
+@llm_cache_scope("transform_query")
 def transform_query_node(state):
     """
     Light-weight query refinement to improve retrieval hit rate.
     - Keep domain keywords.
     - Expand synonyms or add constraints when needed.
+    - Multi-query mode (retrieval_params["multi_query"] = n): one LLM call writes n
+      sub-queries / paraphrases; the retriever searches them together in one batch.
     """
     log.info("[Adaptive] transform_query_node")
     original = state.get("query") or state.get("user_input") or ""
     if not original.strip():
         return {}
 
+    n = _multi_query_count(state)
+    if n > 0:
+        question = state.get("user_input") or original
+        text = get_llm().invoke([_multi_query_prompt(question, n, state.get("queries") or [])]).content
+        return _multi_query_update(state, text, question, n)
+
     # Simple heuristic: if query is too short, ask LLM to expand with more keywords.
     if len(original.strip()) < 6:
-        prompt = HumanMessage(
-            content=(
-                "Rewrite a short Chinese query into a retrieval-friendly form. "
-                "Keep domain keywords and add 3~5 relevant terms. "
-                f"Original: {original}\n"
-                "Return only the query; do not add explanations."
-            )
-        )
-        refined = llm.invoke([prompt]).content.strip()
+        refined = get_llm().invoke([_expansion_prompt(original)]).content.strip()
         if refined:
             state["query"] = refined
             return {"query": refined}
@@ -32,3 +83,26 @@ def transform_query_node(state):
     # Otherwise keep as is
     state["query"] = original
     return {"query": original}
+
+
+@llm_cache_scope("transform_query")
+async def atransform_query_node(state):
+    """Async transform_query_node (same logic, awaits the LLM)."""
+    log.info("[Adaptive] atransform_query_node")
+    original = state.get("query") or state.get("user_input") or ""
+    if not original.strip():
+        return {}
+
+    n = _multi_query_count(state)
+    if n > 0:
+        question = state.get("user_input") or original
+        async with llm_slot():
+            text = (await get_llm().ainvoke([_multi_query_prompt(question, n, state.get("queries") or [])])).content
+        return _multi_query_update(state, text, question, n)
+
+    if len(original.strip()) < 6:
+        async with llm_slot():
+            refined = (await get_llm().ainvoke([_expansion_prompt(original)])).content.strip()
+        if refined:
+            return {"query": refined}
+    return {"query": original}
@@ -1,7 +1,20 @@
-from typing import List
+from typing import Any, Dict, List
 from langchain_core.documents import Document
 from My_RAG_Project.utils.log_utils import log
-from My_RAG_Project.llm_models.all_llm import web_search_tool
+
+
+def _web_tool():
+    from My_RAG_Project.llm_models.all_llm import web_search_tool  # lazy: only when the web fallback runs
+
+    return web_search_tool
+
+
+def _append_results(docs: List[Document], results) -> List[Document]:
+    for r in results or []:
+        content = (r.get("content") or r.get("snippet") or "")[:1200]
+        url = r.get("url") or r.get("source") or ""
+        docs.append(Document(page_content=content, metadata={"source": url, "page_number": -1, "keywords": "web"}))
+    return docs
 
 
 def web_search_node(state):
@@ -14,13 +27,19 @@ def web_search_node(state):
     if not query:
         return {}
 
-    results = web_search_tool.invoke({"query": query})  # TavilyResults format
-    docs: List[Document] = state.get("docs", [])
-
-    for r in results or []:
-        content = (r.get("content") or r.get("snippet") or "")[:1200]
-        url = r.get("url") or r.get("source") or ""
-        docs.append(Document(page_content=content, metadata={"source": url, "page_number": -1, "keywords": "web"}))
+    results = _web_tool().invoke({"query": query})  # TavilyResults format
+    docs = _append_results(state.get("docs", []), results)
 
     state["docs"] = docs
     return {"docs": docs}
+
+
+async def aweb_search_node(state) -> Dict[str, Any]:
+    """Async web_search_node."""
+    log.info("[Adaptive] aweb_search_node")
+    query = state.get("query") or state.get("user_input") or ""
+    if not query:
+        return {}
+
+    results = await _web_tool().ainvoke({"query": query})
+    return {"docs": _append_results(list(state.get("docs", [])), results)}
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any
+from typing import List
 
 from langchain_openai import ChatOpenAI
 from langchain.tools import Tool
@@ -6,9 +6,9 @@ from langchain_core.tools import BaseTool
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 from langchain_core.chat_history import BaseChatMessageHistory
-from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
 
+from My_RAG_Project.agent.session_memory import get_session_store
 from My_RAG_Project.documents.milvus_db_pdf import MilvusPDFWriter
 from My_RAG_Project.utils.env_utils import COLLECTION_NAME
 from My_RAG_Project.utils.log_utils import log
@@ -92,13 +92,9 @@ def build_pdf_agent() -> AgentExecutor:
 # -----------------------------
 # 4) chat history
 # -----------------------------
-_store: Dict[str, ChatMessageHistory] = {}
-
-
 def get_session_history(session_id: str) -> BaseChatMessageHistory:
-    if session_id not in _store:
-        _store[session_id] = ChatMessageHistory()
-    return _store[session_id]
+    # Bounded store: summary + recent turns within a token budget, LRU-evicted sessions
+    return get_session_store().get(session_id)
 
 
 def build_agent_with_history() -> RunnableWithMessageHistory:
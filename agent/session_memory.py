@@ -0,0 +1,302 @@
+"""
+Bounded chat memory for the PDF agent (agent/rag_agent.py).
+
+The agent used a global dict of ChatMessageHistory: sessions were never evicted and every
+turn re-sent the whole conversation, so latency and token cost grew with its length.
+
+WindowedChatHistory keeps the newest turns within SESSION_HISTORY_TOKEN_BUDGET tokens
+(whole turns: a window never starts with an orphaned AI reply). Turns that fall out of
+the window are folded into a running summary by a background thread, so the next turns
+see "summary + recent window" and the user's request never waits for the summarizer.
+The newest turn always stays; if it alone is over the budget, its reply (and, if still
+needed, its question) is truncated in the window.
+
+Session stores (SESSION_STORE):
+    memory  InMemorySessionStore: LRU over SESSION_MAX_SESSIONS sessions / SESSION_MAX_MB
+    file    FileSessionStore: same LRU in memory, every session also saved as JSON under
+            SESSION_DIR; an evicted session is reloaded from disk on its next turn
+"""
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+from My_RAG_Project.llm_models.llm_cache import llm_cache_scope
+from My_RAG_Project.tools.context_packer import count_tokens, truncate_tokens
+from My_RAG_Project.utils.env_utils import (
+    SESSION_STORE,
+    SESSION_DIR,
+    SESSION_MAX_SESSIONS,
+    SESSION_MAX_MB,
+    SESSION_HISTORY_TOKEN_BUDGET,
+    SESSION_SUMMARY_TOKENS,
+)
+from My_RAG_Project.utils.log_utils import log
+
+_SUMMARY_PREFIX = "此前对话摘要："
+
+
+@lru_cache(maxsize=1)
+def _summary_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-summary")
+
+
+def _msg_tokens(m: BaseMessage) -> int:
+    return count_tokens(m.content if isinstance(m.content, str) else str(m.content)) + 4  # role/format overhead
+
+
+def _msg_bytes(m: BaseMessage) -> int:
+    return len(str(m.content).encode("utf-8"))
+
+
+def _transcript(messages: Sequence[BaseMessage]) -> str:
+    names = {"human": "用户", "ai": "助手"}
+    return "\n".join(f"{names.get(m.type, m.type)}: {m.content}" for m in messages)
+
+
+@llm_cache_scope("summarize_history")
+def summarize(previous: str, messages: Sequence[BaseMessage], max_tokens: int = SESSION_SUMMARY_TOKENS) -> str:
+    """Fold `messages` into the running summary `previous` (one LLM call)."""
+    from My_RAG_Project.llm_models.embeddings_model import get_llm
+
+    prompt = (
+        "你在为一段多轮对话维护简洁的摘要，供后续回答时参考。\n"
+        f"已有摘要：\n{previous or '（无）'}\n\n"
+        f"新增的较早对话：\n{_transcript(messages)}\n\n"
+        f"请输出更新后的摘要（不超过 {max_tokens} 个 token），保留用户的问题、关注点、"
+        "已确认的事实和页码引用，省略寒暄。只输出摘要本身。"
+    )
+    return get_llm().invoke([HumanMessage(content=prompt)]).content.strip()
+
+
+class WindowedChatHistory(BaseChatMessageHistory):
+    """Chat history = running summary + the newest turns within a token budget."""
+
+    def __init__(self, session_id: str, store: Optional["InMemorySessionStore"] = None,
+                 token_budget: int = SESSION_HISTORY_TOKEN_BUDGET, summary: str = "",
+                 window: Optional[List[BaseMessage]] = None, pending: Optional[List[BaseMessage]] = None):
+        self.session_id = session_id
+        self.store = store
+        self.token_budget = token_budget
+        self.summary = summary
+        self.window: List[BaseMessage] = list(window or [])
+        self.pending: List[BaseMessage] = list(pending or [])  # left the window, not yet summarized
+        self._lock = threading.RLock()
+        self._summarizing = False
+        if self.pending:
+            self._schedule_summary()
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with self._lock:
+            head = [SystemMessage(content=_SUMMARY_PREFIX + self.summary)] if self.summary else []
+            return head + list(self.window)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        with self._lock:
+            self.window.extend(messages)
+            self._trim()
+        if self.store is not None:
+            self.store.touch(self)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.summary = ""
+            self.window.clear()
+            self.pending.clear()
+        if self.store is not None:
+            self.store.touch(self)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return len(self.summary.encode("utf-8")) + sum(_msg_bytes(m) for m in self.window + self.pending)
+
+    # ---------- Windowing / summarization ----------
+
+    def _trim(self):
+        """Move the oldest whole turns out of the window until it fits the budget (lock held)."""
+        tokens = [_msg_tokens(m) for m in self.window]
+        total = sum(tokens)
+        # a turn starts at a question; the newest turn is never moved out
+        starts = [i for i, m in enumerate(self.window) if i and isinstance(m, HumanMessage)]
+        cut = 0
+        for start in starts:
+            if total <= self.token_budget:
+                break
+            total -= sum(tokens[cut:start])
+            cut = start
+        if cut:
+            self.pending.extend(self.window[:cut])
+            del self.window[:cut]
+            self._schedule_summary()
+        if total > self.token_budget:
+            self._fit_last_turn(total)
+
+    def _fit_last_turn(self, total: int):
+        """The newest turn alone is over budget: truncate its replies, then its question (lock held)."""
+        order = [i for i in reversed(range(len(self.window))) if not isinstance(self.window[i], HumanMessage)]
+        order += [i for i in range(len(self.window)) if isinstance(self.window[i], HumanMessage)]
+        for i in order:
+            m = self.window[i]
+            if total <= self.token_budget:
+                return
+            if not isinstance(m.content, str):
+                continue
+            before = _msg_tokens(m)
+            keep = max(count_tokens(m.content) - (total - self.token_budget) - 1, 0)
+            self.window[i] = m.model_copy(update={"content": truncate_tokens(m.content, keep) + "…"})
+            total -= before - _msg_tokens(self.window[i])
+
+    def _schedule_summary(self):
+        with self._lock:
+            if self._summarizing or not self.pending:
+                return
+            self._summarizing = True
+        _summary_executor().submit(self._summarize_pending)
+
+    def _summarize_pending(self):
+        while True:
+            with self._lock:
+                batch = list(self.pending)
+                previous = self.summary
+                if not batch:
+                    self._summarizing = False
+                    return
+            try:
+                summary = summarize(previous, batch)
+            except Exception as e:
+                log.warning(f"History summary failed for session {self.session_id}: {e}")
+                with self._lock:
+                    self._summarizing = False
+                return
+            with self._lock:
+                self.summary = summary
+                del self.pending[:len(batch)]
+            log.info(f"📝 Session {self.session_id}: summarized {len(batch)} messages")
+            if self.store is not None:
+                self.store.touch(self)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {"session_id": self.session_id, "summary": self.summary,
+                    "window": messages_to_dict(self.window), "pending": messages_to_dict(self.pending)}
+
+
+class InMemorySessionStore:
+    """Session histories in process memory, LRU-evicted by count and total size."""
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, max_mb: float = SESSION_MAX_MB,
+                 token_budget: int = SESSION_HISTORY_TOKEN_BUDGET):
+        self.max_sessions = max_sessions
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.token_budget = token_budget
+        self._sessions: "OrderedDict[str, WindowedChatHistory]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> WindowedChatHistory:
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is not None:
+                self._sessions.move_to_end(session_id)
+                return history
+        history = self._load(session_id) or WindowedChatHistory(session_id, self, self.token_budget)
+        with self._lock:
+            history = self._sessions.setdefault(session_id, history)
+            self._sessions.move_to_end(session_id)
+            self._sizes[session_id] = history.size_bytes()
+            self._evict()
+        return history
+
+    def touch(self, history: WindowedChatHistory):
+        """Called after a history changed: update its size, persist, evict."""
+        self._save(history)
+        with self._lock:
+            if history.session_id in self._sessions:
+                self._sessions.move_to_end(history.session_id)
+                self._sizes[history.session_id] = history.size_bytes()
+                self._evict()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._sizes.pop(session_id, None)
+
+    def _evict(self):
+        """Drop least recently used sessions beyond the count / size caps (lock held; newest stays)."""
+        total = sum(self._sizes.values())
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or total > self.max_bytes):
+            sid, _ = self._sessions.popitem(last=False)
+            total -= self._sizes.pop(sid, 0)
+            log.debug(f"Session {sid} evicted from memory")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "mb": sum(self._sizes.values()) / 1024 / 1024}
+
+    # persistence hooks (no-ops in memory)
+    def _load(self, session_id: str) -> Optional[WindowedChatHistory]:
+        return None
+
+    def _save(self, history: WindowedChatHistory):
+        pass
+
+
+class FileSessionStore(InMemorySessionStore):
+    """InMemorySessionStore backed by one JSON file per session: evicted or restarted sessions reload from disk."""
+
+    def __init__(self, directory: str = SESSION_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # one writer at a time, snapshot taken inside: a save can never overwrite a newer one
+        self._save_lock = threading.Lock()
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^\w.-]", "_", session_id) + ".json")
+
+    def _load(self, session_id: str) -> Optional[WindowedChatHistory]:
+        path = self._path(session_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return WindowedChatHistory(session_id, self, self.token_budget, summary=data.get("summary", ""),
+                                       window=messages_from_dict(data.get("window", [])),
+                                       pending=messages_from_dict(data.get("pending", [])))
+        except Exception as e:
+            log.warning(f"Unreadable session file {path}: {e}")
+            return None
+
+    def _save(self, history: WindowedChatHistory):
+        path = self._path(history.session_id)
+        tmp = f"{path}.tmp"
+        with self._save_lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(history.to_dict(), f, ensure_ascii=False)
+            os.replace(tmp, path)
+
+    def delete(self, session_id: str):
+        super().delete(session_id)
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+
+@lru_cache(maxsize=1)
+def get_session_store() -> InMemorySessionStore:
+    if SESSION_STORE == "memory":
+        return InMemorySessionStore()
+    if SESSION_STORE == "file":
+        return FileSessionStore()
+    raise ValueError(f"Unknown SESSION_STORE '{SESSION_STORE}' (memory | file)")
@@ -0,0 +1,145 @@
+"""
+Execution backends behind the HTTP service (api/server.py).
+
+A backend turns (route, question) into the event stream of adaptive_rag.graph_2.stream_answer:
+    {"type": "token" | "retract" | "annotate" | "final", ...}
+    GraphBackend  the real async graphs (adaptive, corrective) and the tool-calling agent
+    FakeBackend   stand-in for the LLM and Milvus: fixed retrieval latency, canned tokens at
+                  a fixed rate, no network; for load tests of the serving layer and for CI
+"""
+import asyncio
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Optional
+
+from My_RAG_Project.utils.log_utils import log
+from My_RAG_Project.utils.tracing import span
+
+ROUTES = ("adaptive", "corrective", "agent")
+
+
+def _final(answer: str, t0: float, ttft_ms: Optional[float], citations=None, quality=None) -> Dict[str, Any]:
+    total_ms = (time.perf_counter() - t0) * 1000
+    return {"type": "final", "answer": answer, "citations": citations or [], "quality": quality or {},
+            "cached": False, "ttft_ms": ttft_ms if ttft_ms is not None else total_ms, "total_ms": total_ms}
+
+
+@lru_cache(maxsize=1)
+def _agent():
+    from My_RAG_Project.agent.rag_agent import build_agent_with_history
+
+    return build_agent_with_history()
+
+
+class GraphBackend:
+    """Adaptive / corrective graphs (async builds) and the PDF agent."""
+
+    name = "graphs"
+
+    def warm_up(self):
+        from My_RAG_Project.utils.warmup import warm_up
+        from My_RAG_Project.adaptive_rag.graph_2 import get_async_graph as adaptive_graph
+        from My_RAG_Project.corrective_rag.graph1 import get_async_graph as corrective_graph
+
+        warm_up(("embedding", "llm", "milvus"))
+        adaptive_graph()
+        corrective_graph()
+
+    async def stream(self, route: str, question: str, params: Optional[Dict[str, Any]] = None,
+                     session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        config = {"configurable": {"thread_id": session_id or str(uuid.uuid4())}}
+        if route == "adaptive":
+            from My_RAG_Project.adaptive_rag.graph_2 import astream_answer
+
+            async for event in astream_answer(question, config=config, retrieval_params=params):
+                yield event
+        elif route == "corrective":
+            async for event in self._corrective(question, config):
+                yield event
+        elif route == "agent":
+            async for event in self._agent(question, session_id):
+                yield event
+        else:
+            raise ValueError(f"Unknown route '{route}'. Available: {ROUTES}")
+
+    async def _corrective(self, question: str, config: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        from My_RAG_Project.corrective_rag.graph1 import get_async_graph
+        from My_RAG_Project.utils.async_utils import session_slot
+        from My_RAG_Project.utils.stream_utils import astream_answer_tokens
+
+        t0 = time.perf_counter()
+        ttft_ms = None
+        state: Dict[str, Any] = {}
+        async with session_slot():
+            async for kind, payload in astream_answer_tokens(get_async_graph(), {"messages": [("user", question)]},
+                                                             config):
+                if kind == "token":
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - t0) * 1000
+                    yield {"type": "token", "text": payload}
+                elif kind == "reset":
+                    yield {"type": "retract", "reason": "answer regenerated"}
+                else:
+                    state = payload
+        messages = state.get("messages") or []
+        yield _final(getattr(messages[-1], "content", "") if messages else "", t0, ttft_ms)
+
+    async def _agent(self, question: str, session_id: Optional[str]) -> AsyncIterator[Dict[str, Any]]:
+        from My_RAG_Project.utils.async_utils import session_slot
+
+        t0 = time.perf_counter()
+        async with session_slot():
+            res = await _agent().ainvoke(
+                {"input": question},
+                config={"configurable": {"session_id": session_id or str(uuid.uuid4())}},
+            )
+        answer = res.get("output", "")
+        ttft_ms = (time.perf_counter() - t0) * 1000
+        yield {"type": "token", "text": answer}
+        yield _final(answer, t0, ttft_ms)
+
+
+class FakeBackend:
+    """Stand-in LLM + Milvus with deterministic latency (no OpenAI key, no Milvus needed)."""
+
+    name = "fake"
+
+    def __init__(self, search_ms: float = 50.0, token_ms: float = 20.0, n_tokens: int = 20,
+                 warmup_s: float = 0.5):
+        self.search_ms = search_ms
+        self.token_ms = token_ms
+        self.n_tokens = n_tokens
+        self.warmup_s = warmup_s
+
+    def warm_up(self):
+        time.sleep(self.warmup_s)
+        log.info(f"🧪 Fake backend ready (search={self.search_ms}ms, token={self.token_ms}ms x {self.n_tokens})")
+
+    async def stream(self, route: str, question: str, params: Optional[Dict[str, Any]] = None,
+                     session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        if route not in ROUTES:
+            raise ValueError(f"Unknown route '{route}'. Available: {ROUTES}")
+        t0 = time.perf_counter()
+        with span("fake_search", "search"):
+            await asyncio.sleep(self.search_ms / 1000)  # "Milvus"
+        k = (params or {}).get("k", 3)
+        citations = [{"page_number": i + 1, "source": "fake.pdf", "keywords": "", "score": round(1 - 0.1 * i, 2),
+                      "snippet": f"passage {i + 1} for: {question[:40]}"} for i in range(k)]
+
+        ttft_ms = None
+        words = [f"[{route}]"] + [f"tok{i}" for i in range(self.n_tokens - 1)]
+        for w in words:  # "LLM"
+            await asyncio.sleep(self.token_ms / 1000)
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - t0) * 1000
+            yield {"type": "token", "text": w + " "}
+        yield _final(" ".join(words), t0, ttft_ms, citations=citations)
+
+
+def make_backend(name: str, **kwargs):
+    if name == "fake":
+        return FakeBackend(**kwargs)
+    if name == "graphs":
+        return GraphBackend()
+    raise ValueError(f"Unknown backend '{name}' (graphs | fake)")
@@ -0,0 +1,345 @@
+"""
+HTTP service for the RAG graphs (stdlib only: ThreadingHTTPServer + one asyncio loop).
+
+Connection threads only parse requests and write responses. The work runs on a
+Dispatcher: a bounded asyncio queue drained by N worker coroutines that drive the async
+graphs (api/backends.py). Admission control is the queue bound — when it is full the
+request is rejected at once with 503 + Retry-After instead of piling up. Every request
+carries a deadline: it fails with 504 if it is still queued at the deadline or has not
+finished by then (the run is cancelled).
+
+Endpoints:
+    POST /v1/adaptive | /v1/corrective | /v1/agent
+        {"question": str, "stream": bool = false, "deadline_ms": int, "session_id": str,
+         "retrieval_params": {...}}   (retrieval_params: adaptive only)
+        stream=false -> 200 JSON {"answer", "citations", "quality", "cached", "ttft_ms", "total_ms"}
+        stream=true  -> text/event-stream, one `data: <event json>` per token / retract /
+                        annotate / final / error event
+        400 bad request, 503 overloaded or warming up, 504 deadline exceeded
+    GET /healthz   liveness: the process and its worker loop are running
+    GET /readyz    readiness: 200 once warm-up (models, Milvus, graphs) finished; queue stats
+    GET /metrics   Prometheus text: per-node / per-span latency histograms, request totals,
+                   token and cache counters, queue gauges (utils/tracing.py)
+
+Every POST response carries X-Request-ID (client-supplied or generated); the same id keys
+the request's trace in TRACE_PATH.
+
+Usage:
+    python -m My_RAG_Project.api.server --port 8000 --workers 8 --queue 64
+    python -m My_RAG_Project.api.server --backend fake        # no OpenAI / Milvus needed
+"""
+import argparse
+import asyncio
+import json
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from My_RAG_Project.api.backends import ROUTES, make_backend
+from My_RAG_Project.utils.env_utils import API_WORKERS, API_QUEUE_SIZE, REQUEST_DEADLINE_SECONDS
+from My_RAG_Project.utils.log_utils import log
+from My_RAG_Project.utils.tracing import metrics, start_trace
+
+_END = None  # sentinel closing a job's event queue
+
+
+@dataclass
+class Job:
+    route: str
+    question: str
+    deadline: float  # time.monotonic()
+    params: Optional[Dict[str, Any]] = None
+    session_id: Optional[str] = None
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    enqueued: float = field(default_factory=time.monotonic)
+    events: "queue.Queue[Optional[Dict[str, Any]]]" = field(default_factory=queue.Queue)
+    task: Optional[asyncio.Task] = None
+    cancelled: bool = False
+
+
+class Dispatcher:
+    """Bounded job queue + worker coroutines on a dedicated event loop thread."""
+
+    def __init__(self, backend, workers: int = API_WORKERS, queue_size: int = API_QUEUE_SIZE):
+        self.backend = backend
+        self.workers = workers
+        self.queue_size = queue_size
+        self.counts = {"accepted": 0, "rejected": 0, "completed": 0, "failed": 0, "timeouts": 0, "cancelled": 0}
+        self.in_flight = 0
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="rag-dispatcher", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+
+    async def _start(self):
+        self._queue: "asyncio.Queue[Job]" = asyncio.Queue(maxsize=self.queue_size)
+        for i in range(self.workers):
+            self.loop.create_task(self._worker(), name=f"rag-worker-{i}")
+
+    def alive(self) -> bool:
+        return self._thread.is_alive() and self.loop.is_running()
+
+    # ---------- Admission ----------
+
+    def submit(self, job: Job) -> bool:
+        """Enqueue `job`; False if the queue is full (caller answers 503)."""
+        return asyncio.run_coroutine_threadsafe(self._offer(job), self.loop).result()
+
+    async def _offer(self, job: Job) -> bool:
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counts["rejected"] += 1
+            return False
+        self.counts["accepted"] += 1
+        return True
+
+    def cancel(self, job: Job):
+        """Client went away: drop the job if queued, cancel it if running."""
+        job.cancelled = True
+        if job.task is not None:
+            self.loop.call_soon_threadsafe(job.task.cancel)
+
+    # ---------- Workers ----------
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                job.events.put(_END)
+                self._queue.task_done()
+
+    async def _execute(self, job: Job):
+        if job.cancelled:
+            self.counts["cancelled"] += 1
+            return
+        remaining = job.deadline - time.monotonic()
+        if remaining <= 0:
+            self.counts["timeouts"] += 1
+            job.events.put({"type": "error", "status": 504, "message": "deadline exceeded while queued"})
+            return
+
+        self.in_flight += 1
+        job.task = asyncio.ensure_future(self._run(job))
+        try:
+            await asyncio.wait_for(job.task, remaining)
+            self.counts["completed"] += 1
+        except asyncio.TimeoutError:
+            self.counts["timeouts"] += 1
+            job.events.put({"type": "error", "status": 504, "message": "deadline exceeded"})
+        except asyncio.CancelledError:
+            if not job.cancelled:
+                raise  # the worker itself is being shut down
+            self.counts["cancelled"] += 1
+        except Exception as e:
+            self.counts["failed"] += 1
+            log.exception(e)
+            job.events.put({"type": "error", "status": 500, "message": str(e)})
+        finally:
+            self.in_flight -= 1
+
+    async def _run(self, job: Job):
+        queued_ms = (time.monotonic() - job.enqueued) * 1000
+        metrics.observe("rag_queue_wait_seconds", queued_ms / 1000, route=job.route)
+        with start_trace(job.request_id, route=job.route, queued_ms=queued_ms):
+            async for event in self.backend.stream(job.route, job.question, job.params, job.session_id):
+                if event.get("type") == "final":
+                    event = {**event, "queued_ms": queued_ms, "request_id": job.request_id}
+                job.events.put(event)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "queue_size": self.queue_size, "queued": self._queue.qsize(),
+                "in_flight": self.in_flight, **self.counts}
+
+
+class RAGHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, dispatcher: Dispatcher, default_deadline: float = REQUEST_DEADLINE_SECONDS):
+        super().__init__(address, RAGRequestHandler)
+        self.dispatcher = dispatcher
+        self.default_deadline = default_deadline
+        self.ready = False
+        self.warmup_error: Optional[str] = None
+
+    def warm_up_async(self):
+        def _run():
+            t0 = time.perf_counter()
+            try:
+                self.dispatcher.backend.warm_up()
+                self.ready = True
+                log.info(f"✅ Service ready after {time.perf_counter() - t0:.1f}s warm-up")
+            except Exception as e:
+                self.warmup_error = str(e)
+                log.exception(e)
+
+        threading.Thread(target=_run, name="rag-warmup", daemon=True).start()
+
+
+class RAGRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: RAGHTTPServer
+
+    def log_message(self, fmt, *args):
+        log.debug(f"{self.address_string()} {fmt % args}")
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    # ---------- GET ----------
+
+    def do_GET(self):
+        dispatcher = self.server.dispatcher
+        if self.path == "/healthz":
+            alive = dispatcher.alive()
+            self._send_json(200 if alive else 500, {"status": "ok" if alive else "dispatcher down"})
+        elif self.path == "/metrics":
+            stats = dispatcher.stats()
+            gauges = {"rag_queue_depth": stats["queued"], "rag_queue_capacity": stats["queue_size"],
+                      "rag_in_flight": stats["in_flight"], "rag_ready": int(self.server.ready)}
+            data = metrics.render(gauges).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif self.path == "/readyz":
+            ready = self.server.ready and dispatcher.alive()
+            body = {"ready": ready, "backend": dispatcher.backend.name, **dispatcher.stats()}
+            if self.server.warmup_error:
+                body["warmup_error"] = self.server.warmup_error
+            self._send_json(200 if ready else 503, body)
+        else:
+            self._send_json(404, {"error": f"no route {self.path}"})
+
+    # ---------- POST ----------
+
+    def _parse_job(self) -> Job:
+        route = self.path.rstrip("/").rsplit("/", 1)[-1]
+        if not self.path.startswith("/v1/") or route not in ROUTES:
+            raise LookupError(f"no route {self.path}")
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        question = (body.get("question") or "").strip()
+        if not question:
+            raise ValueError("'question' is required")
+        deadline_s = min(float(body.get("deadline_ms") or self.server.default_deadline * 1000) / 1000,
+                         self.server.default_deadline)
+        self._stream = bool(body.get("stream"))
+        job = Job(route=route, question=question, deadline=time.monotonic() + deadline_s,
+                  params=body.get("retrieval_params"), session_id=body.get("session_id"))
+        request_id = (self.headers.get("X-Request-ID") or "").strip()
+        if request_id:
+            job.request_id = request_id[:64]
+        return job
+
+    def do_POST(self):
+        try:
+            job = self._parse_job()
+        except LookupError as e:
+            return self._send_json(404, {"error": str(e)})
+        except (ValueError, json.JSONDecodeError) as e:
+            return self._send_json(400, {"error": str(e)})
+
+        rid = {"X-Request-ID": job.request_id}
+        if not self.server.ready:
+            return self._send_json(503, {"error": "warming up"}, {"Retry-After": "5", **rid})
+        if not self.server.dispatcher.submit(job):
+            metrics.inc("rag_rejected_total", route=job.route)
+            return self._send_json(503, {"error": "overloaded: request queue is full"}, {"Retry-After": "1", **rid})
+
+        if self._stream:
+            self._respond_sse(job)
+        else:
+            self._respond_json(job)
+
+    def _next_event(self, job: Job) -> Optional[Dict[str, Any]]:
+        # the worker always closes the queue (deadline included); the margin only guards a stuck loop
+        timeout = max(job.deadline - time.monotonic(), 0) + 5.0
+        try:
+            return job.events.get(timeout=timeout)
+        except queue.Empty:
+            self.server.dispatcher.cancel(job)
+            return {"type": "error", "status": 504, "message": "deadline exceeded"}
+
+    def _respond_json(self, job: Job):
+        rid = {"X-Request-ID": job.request_id}
+        final: Optional[Dict[str, Any]] = None
+        while True:
+            event = self._next_event(job)
+            if event is _END:
+                break
+            if event["type"] == "error":
+                return self._send_json(event["status"], {"error": event["message"]}, rid)
+            if event["type"] == "final":
+                final = event
+        if final is None:
+            return self._send_json(500, {"error": "no answer produced"}, rid)
+        self._send_json(200, {k: v for k, v in final.items() if k != "type"}, rid)
+
+    def _respond_sse(self, job: Job):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.send_header("X-Accel-Buffering", "no")
+        self.send_header("X-Request-ID", job.request_id)
+        self.end_headers()
+        self.close_connection = True
+        try:
+            while True:
+                event = self._next_event(job)
+                if event is _END:
+                    break
+                payload = json.dumps(event, ensure_ascii=False, default=str)
+                self.wfile.write(f"event: {event['type']}\ndata: {payload}\n\n".encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            log.info("Client disconnected; cancelling request")
+            self.server.dispatcher.cancel(job)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, backend: str = "graphs", workers: int = API_WORKERS,
+          queue_size: int = API_QUEUE_SIZE, deadline: float = REQUEST_DEADLINE_SECONDS, **backend_kwargs):
+    dispatcher = Dispatcher(make_backend(backend, **backend_kwargs), workers=workers, queue_size=queue_size)
+    server = RAGHTTPServer((host, port), dispatcher, default_deadline=deadline)
+    server.warm_up_async()
+    log.info(f"🚀 RAG service on http://{host}:{port} (backend={backend}, workers={workers}, queue={queue_size})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="HTTP service for the adaptive / corrective graphs and the agent")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--backend", default="graphs", choices=["graphs", "fake"])
+    ap.add_argument("--workers", type=int, default=API_WORKERS)
+    ap.add_argument("--queue", type=int, default=API_QUEUE_SIZE)
+    ap.add_argument("--deadline", type=float, default=REQUEST_DEADLINE_SECONDS, help="max seconds per request")
+    ap.add_argument("--fake-search-ms", type=float, default=50.0)
+    ap.add_argument("--fake-token-ms", type=float, default=20.0)
+    args = ap.parse_args()
+
+    extra = {"search_ms": args.fake_search_ms, "token_ms": args.fake_token_ms} if args.backend == "fake" else {}
+    serve(args.host, args.port, args.backend, args.workers, args.queue, args.deadline, **extra)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 from My_RAG_Project.corrective_rag.graph_state1 import AgentState
-from My_RAG_Project.llm_models.embeddings_model import llm
-from My_RAG_Project.tools.retriever_tools import retriever_tool
+from My_RAG_Project.llm_models.embeddings_model import get_llm
+from My_RAG_Project.llm_models.llm_cache import llm_cache_scope
+from My_RAG_Project.tools.retriever_tools import get_retriever_tool
 from My_RAG_Project.utils.log_utils import log
+from My_RAG_Project.utils.async_utils import llm_slot
 
 
+@llm_cache_scope("agent")
 def agent_node(state: AgentState):
     """
     The Agent node decides whether to call tools based on the latest user message.
@@ -18,6 +21,18 @@ def agent_node(state: AgentState):
     log.info("--- entering agent node ---")
     messages = state["messages"]
 
-    model = llm.bind_tools([retriever_tool])
+    model = get_llm().bind_tools([get_retriever_tool()])
     response = model.invoke([messages[-1]])
     return {"messages": [response]}
+
+
+@llm_cache_scope("agent")
+async def aagent_node(state: AgentState):
+    """Async agent_node (awaits the tool-calling LLM)."""
+    log.info("--- entering agent node (async) ---")
+    messages = state["messages"]
+
+    model = get_llm().bind_tools([get_retriever_tool()])
+    async with llm_slot():
+        response = await model.ainvoke([messages[-1]])
+    return {"messages": [response]}
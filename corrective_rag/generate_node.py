@@ -5,7 +5,11 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
 
 from My_RAG_Project.corrective_rag.get_human_message import get_last_human_message
-from My_RAG_Project.llm_models.embeddings_model import llm
+from My_RAG_Project.llm_models.embeddings_model import get_llm
+from My_RAG_Project.llm_models.llm_cache import llm_cache_scope
+from My_RAG_Project.utils.stream_utils import ANSWER_STREAM_TAG
+from My_RAG_Project.tools.context_packer import pack_text
+from My_RAG_Project.utils.async_utils import run_blocking, llm_slot
 from My_RAG_Project.utils.log_utils import log
 
 
@@ -38,29 +42,46 @@ def _stringify_tool_output(docs: Any) -> str:
     return str(docs)
 
 
+_PROMPT = PromptTemplate(
+    template=(
+        "You are a helpful QA assistant. Answer the question using ONLY the context.\n"
+        "If the answer is not present, say you don't know.\n\n"
+        "Question:\n{question}\n\n"
+        "Context:\n{context}\n\n"
+        "Answer:"
+    ),
+    input_variables=["question", "context"],
+)
+
+
+def _chain():
+    # Tagged: its tokens are streamed to the caller (utils/stream_utils.py)
+    return (_PROMPT | get_llm() | StrOutputParser()).with_config(tags=[ANSWER_STREAM_TAG])
+
+
+def _question_and_context(state):
+    messages = state["messages"]
+    question = get_last_human_message(messages).content
+    raw_context = getattr(messages[-1], "content", "")
+    return question, pack_text(_stringify_tool_output(raw_context), question)
+
+
+@llm_cache_scope("generate")
 def generate(state):
     """
     Generate the final answer based on retrieved context and the user's question.
     """
     log.info("--- generating final answer ---")
-    messages = state["messages"]
-    question = get_last_human_message(messages).content
-    last_message = messages[-1]
-
-    raw_context = getattr(last_message, "content", "")
-    context = _stringify_tool_output(raw_context)
-
-    # Prompt template
-    prompt = PromptTemplate(
-        template=(
-            "You are a helpful QA assistant. Answer the question using ONLY the context.\n"
-            "If the answer is not present, say you don't know.\n\n"
-            "Question:\n{question}\n\n"
-            "Context:\n{context}\n\n"
-            "Answer:"
-        ),
-        input_variables=["question", "context"],
-    )
-    chain = prompt | llm | StrOutputParser()
-    response = chain.invoke({"context": context, "question": question})
+    question, context = _question_and_context(state)
+    response = _chain().invoke({"context": context, "question": question})
+    return {"messages": [AIMessage(content=response)]}
+
+
+@llm_cache_scope("generate")
+async def agenerate(state):
+    """Async generate: context packing on the I/O pool, the LLM awaited."""
+    log.info("--- generating final answer (async) ---")
+    question, context = await run_blocking(_question_and_context, state)
+    async with llm_slot():
+        response = await _chain().ainvoke({"context": context, "question": question})
     return {"messages": [AIMessage(content=response)]}
@@ -1,22 +1,29 @@
 import uuid
+from functools import lru_cache
 from typing import Literal
 
 from langchain_core.messages import BaseMessage, HumanMessage
 from langchain_core.prompts import PromptTemplate
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.constants import START, END
 from langgraph.graph import StateGraph
 from langgraph.prebuilt import ToolNode, tools_condition
 
-from My_RAG_Project.corrective_rag.agent_node import agent_node
-from My_RAG_Project.corrective_rag.generate_node import generate
+from My_RAG_Project.corrective_rag.agent_node import agent_node, aagent_node
+from My_RAG_Project.corrective_rag.generate_node import generate, agenerate
 from My_RAG_Project.corrective_rag.get_human_message import get_last_human_message
 from My_RAG_Project.corrective_rag.graph_state1 import AgentState, Grade
-from My_RAG_Project.corrective_rag.rewrite_node import rewrite
-from My_RAG_Project.llm_models.embeddings_model import llm
-from My_RAG_Project.tools.retriever_tools import retriever_tool
+from My_RAG_Project.corrective_rag.local_grader import tiered_grade, atiered_grade, grader_metrics
+from My_RAG_Project.corrective_rag.rewrite_node import rewrite, arewrite
+from My_RAG_Project.llm_models.embeddings_model import get_llm
+from My_RAG_Project.llm_models.llm_cache import llm_cache_scope, get_llm_cache
+from My_RAG_Project.tools.retriever_tools import get_retriever_tool
+from My_RAG_Project.tools.context_packer import pack_text
+from My_RAG_Project.utils.async_utils import run_blocking, llm_slot
+from My_RAG_Project.utils.checkpointer import get_checkpointer
+from My_RAG_Project.utils.tracing import traced_node
 from My_RAG_Project.utils.log_utils import log
 from My_RAG_Project.utils.print_utils import _print_event  # keep your existing printer
+from My_RAG_Project.utils.stream_utils import stream_answer_tokens
 
 
 def _stringify_tool_output_for_grade(docs) -> str:
@@ -43,14 +50,8 @@ def _stringify_tool_output_for_grade(docs) -> str:
     return str(docs)
 
 
-def grade_documents(state) -> Literal["generate", "rewrite"]:
-    """
-    Judge whether retrieved documents are relevant to the user query.
-    Returns 'generate' if relevant, else 'rewrite'.
-    """
-    log.info("--- grading retrieved docs ---")
-
-    llm_with_structured = llm.with_structured_output(Grade)
+def _grade_chain():
+    llm_with_structured = get_llm().with_structured_output(Grade)
 
     prompt = PromptTemplate(
         template=(
@@ -62,17 +63,40 @@ def grade_documents(state) -> Literal["generate", "rewrite"]:
         ),
         input_variables=["context", "question"],
     )
-    chain = prompt | llm_with_structured
+    return prompt | llm_with_structured
+
 
+def _llm_grade(question: str, context: str) -> str:
+    """LLM relevance grade ("yes" / "no"); the fallback tier of tiered_grade."""
+    scored = _grade_chain().invoke({"question": question, "context": context})
+    return scored.binary_score.strip().lower()
+
+
+async def _allm_grade(question: str, context: str) -> str:
+    async with llm_slot():
+        scored = await _grade_chain().ainvoke({"question": question, "context": context})
+    return scored.binary_score.strip().lower()
+
+
+def _question_and_context(state):
     messages = state["messages"]
-    last_message = messages[-1]
     question = get_last_human_message(messages).content
+    docs = getattr(messages[-1], "content", "")
+    return question, pack_text(_stringify_tool_output_for_grade(docs), question)
 
-    docs = getattr(last_message, "content", "")
-    context = _stringify_tool_output_for_grade(docs)
 
-    scored = chain.invoke({"question": question, "context": context})
-    score = scored.binary_score.strip().lower()
+@llm_cache_scope("grade_documents")
+def grade_documents(state) -> Literal["generate", "rewrite"]:
+    """
+    Judge whether retrieved documents are relevant to the user query.
+    Confident cases are decided locally (embeddings + lexical overlap); only
+    uncertain ones reach the LLM (corrective_rag/local_grader.py).
+    Returns 'generate' if relevant, else 'rewrite'.
+    """
+    log.info("--- grading retrieved docs ---")
+    question, context = _question_and_context(state)
+
+    score = tiered_grade(question, context, _llm_grade)
 
     if score == "yes":
         print("--- result: relevant ---")
@@ -82,38 +106,90 @@ def grade_documents(state) -> Literal["generate", "rewrite"]:
         return "rewrite"
 
 
-# Build the LangGraph
-workflow = StateGraph(AgentState)
-workflow.add_node("agent", agent_node)
-workflow.add_node("retrieve", ToolNode([retriever_tool]))
-workflow.add_node("rewrite", rewrite)
-workflow.add_node("generate", generate)
+@llm_cache_scope("grade_documents")
+async def agrade_documents(state) -> Literal["generate", "rewrite"]:
+    """Async grade_documents (routing function of the async graph)."""
+    log.info("--- grading retrieved docs (async) ---")
+    question, context = await run_blocking(_question_and_context, state)
+    score = await atiered_grade(question, context, _allm_grade)
+    log.info(f"--- result: {'relevant' if score == 'yes' else 'not relevant'} ---")
+    return "generate" if score == "yes" else "rewrite"
+
+
+def build_graph(use_async: bool = False):
+    """
+    Build and compile the LangGraph (connects the retriever tool to Milvus).
+    use_async=True wires the async nodes; run that build with ainvoke / astream.
+    """
+    workflow = StateGraph(AgentState)
+    # Function nodes get one "node" span per run (utils/tracing.py); the retriever tool
+    # call is a "search" span (tracing callback on the tool)
+    workflow.add_node("agent", traced_node("agent", aagent_node if use_async else agent_node))
+    workflow.add_node("retrieve", ToolNode([get_retriever_tool()]))  # ToolNode runs tools async on ainvoke
+    workflow.add_node("rewrite", traced_node("rewrite", arewrite if use_async else rewrite))
+    workflow.add_node("generate", traced_node("generate", agenerate if use_async else generate))
+
+    workflow.add_edge(START, "agent")
+    workflow.add_conditional_edges(
+        "agent",
+        tools_condition,
+        {"tools": "retrieve", END: END},
+    )
+    workflow.add_conditional_edges("retrieve",
+                                   traced_node("grade_documents", agrade_documents if use_async else grade_documents),
+                                   {"generate": "generate", "rewrite": "rewrite"})
+    workflow.add_edge("rewrite", "agent")
+    workflow.add_edge("generate", END)
+
+    # Memory/checkpoint: bounded SQLite store shared by the sync and async builds
+    return workflow.compile(checkpointer=get_checkpointer("corrective"))
+
 
-workflow.add_edge(START, "agent")
-workflow.add_conditional_edges(
-    "agent",
-    tools_condition,
-    {"tools": "retrieve", END: END},
-)
-workflow.add_conditional_edges("retrieve", grade_documents)
-workflow.add_edge("rewrite", "agent")
-workflow.add_edge("generate", END)
+@lru_cache(maxsize=1)
+def get_graph():
+    """Compiled graph, built on first use and shared by the process."""
+    return build_graph()
 
-# Memory/checkpoint
-memory = MemorySaver()
-graph = workflow.compile(checkpointer=memory)
 
-config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+@lru_cache(maxsize=1)
+def get_async_graph():
+    """Compiled graph with async nodes (for ainvoke / astream)."""
+    return build_graph(use_async=True)
+
+
+def __getattr__(name):
+    # Backward compatible `graph1.graph` (compiled lazily)
+    if name == "graph":
+        return get_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-_printed = set()
 
 if __name__ == "__main__":
+    graph = get_graph()
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    _printed = set()
+
     while True:
         question = input("用户：")
         if question.lower() in ["q", "exit", "quit"]:
             log.info("对话结束，拜拜！")
             break
         inputs = {"messages": [("user", question)]}
-        events = graph.stream(inputs, config=config, stream_mode="values")
-        for event in events:
-            _print_event(event, _printed)
+        streamed = False
+        for kind, payload in stream_answer_tokens(graph, inputs, config):
+            if kind == "token":
+                print(payload, end="", flush=True)
+                streamed = True
+            elif kind == "reset":
+                print("\n[regenerating]\n")
+            else:
+                last = payload.get("messages", [None])[-1]
+                if streamed and getattr(last, "type", "") == "ai" and not getattr(last, "tool_calls", None):
+                    # final answer was already printed token by token
+                    _printed.add(getattr(last, "id", None) or f"ai:{hash(str(last.content))}")
+                    print()
+                    continue
+                _print_event(payload, _printed)
+        if get_llm_cache() is not None:
+            log.info(f"LLM cache per chain: {get_llm_cache().stats()}")
+        log.info(f"Grader: {grader_metrics.summary()}")
@@ -0,0 +1,142 @@
+"""
+Tiered relevance grading for retrieved context.
+
+Tier 1 (local, no LLM): bge cosine between the question and each retrieved passage
+(vectors from the shared sentence cache in tools/context_packer.py) plus a lexical
+overlap score (share of the question's terms / CJK bigrams found in the context).
+    best cosine >= GRADER_RELEVANT_THRESHOLD                          -> "yes"
+    best cosine <  GRADER_IRRELEVANT_THRESHOLD and lexical < 0.2      -> "no"
+    anything in between                                               -> undecided
+Tier 2 (LLM): only undecided cases go to the structured-output grader.
+
+A small share of locally decided cases (GRADER_SHADOW_RATE) is also sent to the LLM,
+so the metrics show how often the two tiers agree; use that to tune the thresholds.
+"""
+import random
+import re
+import threading
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from My_RAG_Project.tools.context_packer import embed_cached
+from My_RAG_Project.utils.env_utils import (
+    GRADER_RELEVANT_THRESHOLD,
+    GRADER_IRRELEVANT_THRESHOLD,
+    GRADER_SHADOW_RATE,
+)
+from My_RAG_Project.utils.async_utils import run_blocking
+from My_RAG_Project.utils.log_utils import log
+
+LEXICAL_IRRELEVANT = 0.2
+_CJK_RUN = re.compile(r"[一-鿿]+")
+_WORD = re.compile(r"[a-z0-9]{2,}")
+
+
+@dataclass
+class LocalVerdict:
+    decision: Optional[str]  # "yes" | "no" | None (escalate to the LLM)
+    dense: float
+    lexical: float
+
+
+def _terms(text: str) -> set:
+    text = text.lower()
+    terms = set(_WORD.findall(text))
+    for run in _CJK_RUN.findall(text):
+        terms.update(run[i:i + 2] for i in range(max(len(run) - 1, 1)))
+    return terms
+
+
+def lexical_overlap(question: str, context: str) -> float:
+    """Share of the question's terms (words, CJK bigrams) that occur in the context."""
+    q = _terms(question)
+    if not q:
+        return 0.0
+    c = context.lower()
+    return sum(1 for t in q if t in c) / len(q)
+
+
+def split_passages(context: str) -> List[str]:
+    return [p.strip() for p in re.split(r"\n\s*\n", context) if p.strip() not in ("", "---")]
+
+
+def local_relevance(question: str, context: str,
+                    relevant: float = GRADER_RELEVANT_THRESHOLD,
+                    irrelevant: float = GRADER_IRRELEVANT_THRESHOLD) -> LocalVerdict:
+    passages = split_passages(context)
+    if not passages:
+        return LocalVerdict("no", 0.0, 0.0)
+    vecs = embed_cached([question] + passages)
+    dense = float((vecs[1:] @ vecs[0]).max())
+    lexical = lexical_overlap(question, context)
+    if dense >= relevant:
+        return LocalVerdict("yes", dense, lexical)
+    if dense < irrelevant and lexical < LEXICAL_IRRELEVANT:
+        return LocalVerdict("no", dense, lexical)
+    return LocalVerdict(None, dense, lexical)
+
+
+class GraderMetrics:
+    """Counters for the tiered grader (process-wide)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {
+            "graded": 0, "local_yes": 0, "local_no": 0, "escalated": 0, "shadow": 0, "shadow_agree": 0,
+        }
+
+    def add(self, **deltas: int):
+        with self._lock:
+            for k, v in deltas.items():
+                self.counts[k] += v
+            graded = self.counts["graded"]
+        if graded and graded % 100 == 0:
+            log.info(f"📊 Grader: {self.summary()}")
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            c = dict(self.counts)
+        local = c["local_yes"] + c["local_no"]
+        return {
+            **c,
+            "llm_calls": c["escalated"] + c["shadow"],
+            "llm_calls_avoided": local - c["shadow"],
+            "avoided_rate": (local - c["shadow"]) / c["graded"] if c["graded"] else 0.0,
+            "agreement": c["shadow_agree"] / c["shadow"] if c["shadow"] else 0.0,
+        }
+
+
+grader_metrics = GraderMetrics()
+
+
+def _record(verdict: LocalVerdict):
+    if verdict.decision is None:
+        grader_metrics.add(graded=1, escalated=1)
+        log.info(f"Grader: uncertain (cos={verdict.dense:.3f}, lex={verdict.lexical:.2f}) -> LLM")
+    else:
+        grader_metrics.add(graded=1, **{f"local_{verdict.decision}": 1})
+        log.info(f"Grader: local '{verdict.decision}' (cos={verdict.dense:.3f}, lex={verdict.lexical:.2f})")
+
+
+def tiered_grade(question: str, context: str, llm_grade: Callable[[str, str], str],
+                 shadow_rate: float = GRADER_SHADOW_RATE) -> str:
+    """Return "yes" / "no", calling `llm_grade(question, context)` only when the local tier is unsure."""
+    verdict = local_relevance(question, context)
+    _record(verdict)
+    if verdict.decision is None:
+        return llm_grade(question, context)
+    if shadow_rate > 0 and random.random() < shadow_rate:
+        grader_metrics.add(shadow=1, shadow_agree=int(llm_grade(question, context) == verdict.decision))
+    return verdict.decision
+
+
+async def atiered_grade(question: str, context: str, allm_grade: Callable[[str, str], Awaitable[str]],
+                        shadow_rate: float = GRADER_SHADOW_RATE) -> str:
+    """Async tiered_grade: local scoring on the I/O pool, `allm_grade` awaited."""
+    verdict = await run_blocking(local_relevance, question, context)
+    _record(verdict)
+    if verdict.decision is None:
+        return await allm_grade(question, context)
+    if shadow_rate > 0 and random.random() < shadow_rate:
+        grader_metrics.add(shadow=1, shadow_agree=int(await allm_grade(question, context) == verdict.decision))
+    return verdict.decision
@@ -1,20 +1,14 @@
 from langchain_core.messages import HumanMessage
 
 from My_RAG_Project.corrective_rag.get_human_message import get_last_human_message
-from My_RAG_Project.llm_models.embeddings_model import llm
+from My_RAG_Project.llm_models.embeddings_model import get_llm
+from My_RAG_Project.llm_models.llm_cache import llm_cache_scope
+from My_RAG_Project.utils.async_utils import llm_slot
 from My_RAG_Project.utils.log_utils import log
 
 
-def rewrite(state):
-    """
-    Rewrite the user's query to improve retrieval.
-    Returns an AIMessage with a refined query proposal.
-    """
-    log.info("--- rewriting query ---")
-    messages = state["messages"]
-    question = get_last_human_message(messages).content
-
-    msg = [
+def _rewrite_prompt(question: str):
+    return [
         HumanMessage(
             content=(
                 "Analyze the input and infer the underlying intent.\n"
@@ -26,5 +20,27 @@ def rewrite(state):
             )
         )
     ]
-    response = llm.invoke(msg)
+
+
+@llm_cache_scope("rewrite")
+def rewrite(state):
+    """
+    Rewrite the user's query to improve retrieval.
+    Returns an AIMessage with a refined query proposal.
+    """
+    log.info("--- rewriting query ---")
+    messages = state["messages"]
+    question = get_last_human_message(messages).content
+
+    response = get_llm().invoke(_rewrite_prompt(question))
+    return {"messages": [response]}
+
+
+@llm_cache_scope("rewrite")
+async def arewrite(state):
+    """Async rewrite."""
+    log.info("--- rewriting query (async) ---")
+    question = get_last_human_message(state["messages"]).content
+    async with llm_slot():
+        response = await get_llm().ainvoke(_rewrite_prompt(question))
     return {"messages": [response]}
@@ -0,0 +1,193 @@
+"""
+External memory-mapped chunk store for text payloads.
+
+With PAYLOAD_MODE="external" Milvus keeps vectors, keys and the scalar fields used
+in filters; `text` stays in the schema only because the BM25 function needs the
+analyzed field (it is mmap-enabled and never fetched in search responses), and
+`keywords` lives only here. Search results are filled in from this store by pk.
+
+On-disk layout (one store per physical collection version):
+    <CHUNK_STORE_DIR>/<version>/blocks.bin   concatenated compressed blocks (JSON list of payloads)
+    <CHUNK_STORE_DIR>/<version>/index.npy    sorted [pk, block offset, block length, item index]
+    <CHUNK_STORE_DIR>/<version>/meta.json    codec + size stats
+    <CHUNK_STORE_DIR>/<alias>.current        name of the version the alias points to
+Blocks are zstd-compressed when `zstandard` is installed, zlib otherwise.
+"""
+import json
+import mmap
+import os
+import shutil
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from My_RAG_Project.utils.env_utils import CHUNK_STORE_DIR
+from My_RAG_Project.utils.log_utils import log
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+INDEX_DTYPE = np.dtype([("pk", np.int64), ("offset", np.int64), ("length", np.int32), ("item", np.int32)])
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=6).compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def store_path(version: str) -> str:
+    return os.path.join(CHUNK_STORE_DIR, version)
+
+
+class ChunkStoreWriter:
+    """Append payloads keyed by primary key; `close()` seals blocks and writes the sorted index."""
+
+    def __init__(self, version: str, block_rows: int = 64):
+        self.path = store_path(version)
+        os.makedirs(self.path, exist_ok=True)
+        self.codec = "zstd" if zstandard is not None else "zlib"
+        self.block_rows = block_rows
+        self._blocks = open(os.path.join(self.path, "blocks.bin"), "ab")
+        self._offset = self._blocks.tell()
+        self._pending: List[Any] = []
+        self._index: List[tuple] = []
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def add(self, pk: int, payload: Dict[str, Any]):
+        self._pending.append((int(pk), payload))
+        if len(self._pending) >= self.block_rows:
+            self._flush_block()
+
+    def add_many(self, pks: Iterable[int], payloads: Iterable[Dict[str, Any]]):
+        for pk, payload in zip(pks, payloads):
+            self.add(pk, payload)
+
+    def _flush_block(self):
+        if not self._pending:
+            return
+        raw = json.dumps([p for _, p in self._pending], ensure_ascii=False).encode("utf-8")
+        blob = _compress(raw, self.codec)
+        self._blocks.write(blob)
+        for item, (pk, _) in enumerate(self._pending):
+            self._index.append((pk, self._offset, len(blob), item))
+        self._offset += len(blob)
+        self.raw_bytes += len(raw)
+        self.stored_bytes += len(blob)
+        self._pending = []
+
+    def close(self) -> Dict[str, Any]:
+        self._flush_block()
+        self._blocks.close()
+        index = np.array(self._index, dtype=INDEX_DTYPE)
+        index.sort(order="pk")
+        np.save(os.path.join(self.path, "index.npy"), index)
+
+        meta = {"codec": self.codec, "rows": int(index.size),
+                "raw_bytes": self.raw_bytes, "stored_bytes": self.stored_bytes}
+        with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        ratio = self.raw_bytes / self.stored_bytes if self.stored_bytes else 0.0
+        log.info(f"🗃️ Chunk store sealed at {self.path}: rows={meta['rows']}, "
+                 f"payload {self.raw_bytes / 1e6:.1f} MB -> {self.stored_bytes / 1e6:.1f} MB "
+                 f"({ratio:.1f}x, {self.codec}); these bytes no longer live in Milvus memory")
+        return meta
+
+
+class ChunkStore:
+    """Read-only, memory-mapped view of a sealed store with a small decompressed-block LRU."""
+
+    def __init__(self, version: str, cache_blocks: int = 256):
+        self.version = version
+        path = store_path(version)
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.index = np.load(os.path.join(path, "index.npy"), mmap_mode="r")
+        self._file = open(os.path.join(path, "blocks.bin"), "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.meta["rows"] else b""
+        self._cache: "OrderedDict[int, list]" = OrderedDict()
+        self._cache_blocks = cache_blocks
+        self._lock = threading.Lock()  # readers share the store across fan-out / I/O pool threads
+
+    def _block(self, offset: int, length: int) -> list:
+        with self._lock:
+            block = self._cache.get(offset)
+            if block is not None:
+                self._cache.move_to_end(offset)
+                return block
+        # decompress outside the lock; two threads missing the same block both decode it
+        block = json.loads(_decompress(self._mm[offset:offset + length], self.meta["codec"]))
+        with self._lock:
+            self._cache[offset] = block
+            if len(self._cache) > self._cache_blocks:
+                self._cache.popitem(last=False)
+        return block
+
+    def get_many(self, pks: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Return {pk: payload} for the pks present in the store."""
+        pks = np.asarray(list(pks), dtype=np.int64)
+        if pks.size == 0 or self.index.size == 0:
+            return {}
+        pos = np.clip(np.searchsorted(self.index["pk"], pks), 0, self.index.size - 1)
+        out = {}
+        for pk, p in zip(pks.tolist(), pos.tolist()):
+            entry = self.index[p]
+            if int(entry["pk"]) != pk:
+                continue
+            out[pk] = self._block(int(entry["offset"]), int(entry["length"]))[int(entry["item"])]
+        return out
+
+    def close(self):
+        if self.meta["rows"]:
+            self._mm.close()
+        self._file.close()
+
+
+# ---------- Alias pointer + reader cache ----------
+
+def set_current_version(alias: str, version: str):
+    """Point `alias` readers at the store of `version` (call right after switching the Milvus alias)."""
+    os.makedirs(CHUNK_STORE_DIR, exist_ok=True)
+    tmp = os.path.join(CHUNK_STORE_DIR, f"{alias}.current.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(CHUNK_STORE_DIR, f"{alias}.current"))
+
+
+_open_stores: Dict[str, ChunkStore] = {}
+
+
+def open_current_store(alias: str) -> Optional[ChunkStore]:
+    """Return the store for the version `alias` currently points at (reopened after a switch)."""
+    pointer = os.path.join(CHUNK_STORE_DIR, f"{alias}.current")
+    try:
+        with open(pointer, "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    store = _open_stores.get(alias)
+    if store is None or store.version != version:
+        # the previous store is not closed: in-flight readers may still hold it
+        store = ChunkStore(version)
+        _open_stores[alias] = store
+    return store
+
+
+def remove_store(version: str):
+    """Delete the store of a dropped collection version (no-op if none)."""
+    path = store_path(version)
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+        log.info(f"🗑️ Removed chunk store: {path}")
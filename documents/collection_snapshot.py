@@ -0,0 +1,229 @@
+"""
+Streaming snapshot export/restore for the PDF collection.
+
+Export streams every row (scalar fields + `dense` vectors) with a pymilvus query
+iterator into chunked columnar parts, so memory stays bounded by `part_rows`:
+    <dir>/part-00000.npy     float32 [n, dim] dense vectors
+    <dir>/part-00000.jsonl   one JSON object per row: id + scalar fields (same order)
+    <dir>/manifest.json      written last; a snapshot without it is incomplete
+`sparse` is not exported: the BM25 function regenerates it from `text` on insert.
+In "external" payload mode `keywords` is not a Milvus field; it is read from the
+version's chunk store by pk, so a snapshot always carries every scalar field.
+
+Restore bulk-inserts the parts into a fresh versioned collection (indexes deferred,
+primary keys preserved), builds indexes once, waits until ready and switches the alias.
+The page/doc summary collection is rebuilt from the same vectors on the way, and in
+"external" payload mode so is the chunk store of the new version (text/keywords by pk).
+No PDF parsing or re-embedding is needed.
+
+Usage:
+    python -m My_RAG_Project.documents.collection_snapshot export --out ../datas/snapshots/wanda
+    python -m My_RAG_Project.documents.collection_snapshot restore --src ../datas/snapshots/wanda
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pymilvus import MilvusClient
+
+from My_RAG_Project.documents.collection_versions import (
+    new_version_name,
+    resolve_alias,
+    wait_until_ready,
+    switch_alias,
+)
+from My_RAG_Project.documents.index_profiles import build_indexes
+from My_RAG_Project.documents.chunk_store import ChunkStore, ChunkStoreWriter, store_path, set_current_version
+from My_RAG_Project.documents.summary_vectors import SummaryAccumulator, write_summary, publish_summary
+from My_RAG_Project.documents.write_milvus_pdf import create_pdf_collection
+from My_RAG_Project.utils.env_utils import MILVUS_URI, COLLECTION_NAME, INDEX_PROFILE, PAYLOAD_MODE
+from My_RAG_Project.utils.log_utils import log
+
+SCALAR_FIELDS = ["id", "text", "source", "page_number", "char_count", "keywords"]
+MANIFEST = "manifest.json"
+
+
+# ---------- Export ----------
+
+def _write_part(out_dir: str, index: int, scalars: List[Dict[str, Any]], vectors: List[List[float]]) -> Dict:
+    name = f"part-{index:05d}"
+    np.save(os.path.join(out_dir, name + ".npy"), np.asarray(vectors, dtype=np.float32))
+    with open(os.path.join(out_dir, name + ".jsonl"), "w", encoding="utf-8") as f:
+        for row in scalars:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return {"name": name, "rows": len(scalars)}
+
+
+def export_snapshot(client: MilvusClient, collection: str, out_dir: str,
+                    batch_size: int = 1000, part_rows: int = 20000) -> Dict:
+    """Stream all rows of `collection` (alias or physical name) into `out_dir`; returns the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    if os.path.exists(os.path.join(out_dir, MANIFEST)):
+        raise FileExistsError(f"Snapshot already exists in {out_dir}")
+
+    # keywords is absent from the schema in "external" payload mode: read it from the chunk store
+    schema_fields = {f["name"] for f in client.describe_collection(collection)["fields"]}
+    fields = [f for f in SCALAR_FIELDS if f in schema_fields]
+    version = resolve_alias(client, collection) or collection
+    store = None
+    if "keywords" not in schema_fields:
+        if not os.path.isdir(store_path(version)):
+            raise FileNotFoundError(f"'{version}' has no keywords field and no chunk store at "
+                                    f"{store_path(version)}; the snapshot would lose them")
+        store = ChunkStore(version)
+
+    t0 = time.time()
+    parts, scalars, vectors = [], [], []
+    it = client.query_iterator(collection_name=collection, batch_size=batch_size, filter="",
+                               output_fields=fields + ["dense"])
+    while True:
+        batch = it.next()
+        if not batch:
+            it.close()
+            break
+        payloads = store.get_many(r["id"] for r in batch) if store is not None else {}
+        for r in batch:
+            vectors.append(r["dense"])
+            row = {f: r.get(f) for f in fields}
+            if store is not None:
+                row["keywords"] = payloads.get(r["id"], {}).get("keywords", "")
+            scalars.append(row)
+        if len(scalars) >= part_rows:
+            parts.append(_write_part(out_dir, len(parts), scalars, vectors))
+            scalars, vectors = [], []
+            log.info(f"📦 Exported {sum(p['rows'] for p in parts)} rows...")
+    if scalars:
+        parts.append(_write_part(out_dir, len(parts), scalars, vectors))
+    if store is not None:
+        store.close()
+        fields = fields + ["keywords"]
+
+    manifest = {
+        "collection": collection,
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "fields": fields + ["dense"],
+        "total_rows": sum(p["rows"] for p in parts),
+        "parts": parts,
+    }
+    with open(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    log.info(f"✅ Snapshot of '{collection}' written to {out_dir}: "
+             f"{manifest['total_rows']} rows, {len(parts)} parts, {time.time() - t0:.1f}s")
+    return manifest
+
+
+# ---------- Restore ----------
+
+def _iter_part_batches(src_dir: str, name: str, insert_batch: int, fields: set):
+    """Yield (insert rows restricted to `fields`, chunk-store payloads) per batch."""
+    vectors = np.load(os.path.join(src_dir, name + ".npy"), mmap_mode="r")
+    rows, payloads = [], []
+    with open(os.path.join(src_dir, name + ".jsonl"), "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            data = json.loads(line)
+            row = {k: v for k, v in data.items() if k in fields}
+            row["dense"] = vectors[i].tolist()
+            rows.append(row)
+            payloads.append({"text": data.get("text", ""), "keywords": data.get("keywords", "")})
+            if len(rows) >= insert_batch:
+                yield rows, payloads
+                rows, payloads = [], []
+    if rows:
+        yield rows, payloads
+
+
+def restore_snapshot(client: MilvusClient, src_dir: str, alias: str = COLLECTION_NAME,
+                     index_profile: str = INDEX_PROFILE, insert_batch: int = 2000,
+                     workers: int = 4, switch: bool = True) -> str:
+    """
+    Bulk-insert a snapshot into a new versioned collection behind `alias` and return its name.
+    Inserts run on `workers` threads with at most 2 * workers batches in flight.
+    """
+    with open(os.path.join(src_dir, MANIFEST), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    # External payloads: rebuilt from the snapshot when it carries keywords; older snapshots
+    # (exported without them) need the source version's store. Fail before inserting anything.
+    external = PAYLOAD_MODE == "external"
+    rebuild_store = external and "keywords" in manifest["fields"]
+    if external and not rebuild_store and not os.path.isdir(store_path(manifest["version"])):
+        raise FileNotFoundError(f"Snapshot has no keywords and the chunk store of '{manifest['version']}' "
+                                f"is missing ({store_path(manifest['version'])}); cannot restore in "
+                                f"external payload mode")
+
+    version = new_version_name(alias)
+    create_pdf_collection(client, version, index_profile=index_profile, defer_index=True, auto_id=False)
+    fields = {f["name"] for f in client.describe_collection(version)["fields"]}
+
+    t0 = time.time()
+    written = 0
+    summary = SummaryAccumulator()
+    store = ChunkStoreWriter(version) if rebuild_store else None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for part in manifest["parts"]:
+            for rows, payloads in _iter_part_batches(src_dir, part["name"], insert_batch, fields):
+                summary.add_rows(rows)
+                if store is not None:
+                    store.add_many((r["id"] for r in rows), payloads)
+                pending.append(pool.submit(client.insert, collection_name=version, data=rows))
+                if len(pending) >= 2 * workers:
+                    written += pending.pop(0).result()["insert_count"]
+        for fut in pending:
+            written += fut.result()["insert_count"]
+    log.info(f"📥 Inserted {written}/{manifest['total_rows']} rows into '{version}' in {time.time() - t0:.1f}s")
+
+    # Primary keys are preserved, so the external chunk store of the source version stays valid.
+    # Either step raises on failure, before any alias or store pointer is switched.
+    if store is not None:
+        store.close()
+    elif external:
+        shutil.copytree(store_path(manifest["version"]), store_path(version))
+
+    if len(summary):
+        write_summary(client, version, summary)
+    build_indexes(client, version, index_profile)
+    wait_until_ready(client, version, expected_rows=manifest["total_rows"])
+    if switch:
+        switch_alias(client, alias, version)
+        if external:
+            set_current_version(alias, version)
+        publish_summary(client, alias, version)
+    return version
+
+
+# ---------- Main ----------
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Export/restore a Milvus PDF collection snapshot")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ex = sub.add_parser("export")
+    ex.add_argument("--collection", default=COLLECTION_NAME)
+    ex.add_argument("--out", required=True)
+    ex.add_argument("--part-rows", type=int, default=20000)
+
+    rs = sub.add_parser("restore")
+    rs.add_argument("--src", required=True)
+    rs.add_argument("--alias", default=COLLECTION_NAME)
+    rs.add_argument("--profile", default=INDEX_PROFILE)
+    rs.add_argument("--workers", type=int, default=4)
+    rs.add_argument("--no-switch", action="store_true", help="restore without switching the alias")
+    args = ap.parse_args(argv)
+
+    client = MilvusClient(uri=MILVUS_URI)
+    if args.cmd == "export":
+        export_snapshot(client, args.collection, args.out, part_rows=args.part_rows)
+    else:
+        restore_snapshot(client, args.src, alias=args.alias, index_profile=args.profile,
+                         workers=args.workers, switch=not args.no_switch)
+
+
+if __name__ == "__main__":
+    main()
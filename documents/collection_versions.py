@@ -0,0 +1,148 @@
+import re
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from pymilvus import MilvusClient
+
+from My_RAG_Project.utils.env_utils import VERSION_GC_GRACE_SECONDS, VERSIONS_TO_KEEP
+from My_RAG_Project.utils.log_utils import log
+from My_RAG_Project.documents.chunk_store import remove_store
+
+# Versioned physical collections are named "<alias>__v<YYYYmmddHHMMSS>".
+# Readers only ever see the alias (env_utils.COLLECTION_NAME); a reindex builds
+# a fresh version next to the live one and flips the alias once it is ready.
+_VERSION_SEP = "__v"
+_VERSION_FMT = "%Y%m%d%H%M%S"
+# Each version may have a page/doc summary collection "<version>_summary",
+# served through the alias "<alias>_summary" (documents/summary_vectors.py).
+_SUMMARY_SUFFIX = "_summary"
+
+
+def new_version_name(alias: str) -> str:
+    """Return a new versioned collection name for `alias`, stamped with the current time."""
+    return f"{alias}{_VERSION_SEP}{datetime.now().strftime(_VERSION_FMT)}"
+
+
+def summary_name(name: str) -> str:
+    """Summary collection (or alias) paired with a chunk collection (or alias)."""
+    return f"{name}{_SUMMARY_SUFFIX}"
+
+
+def version_timestamp(alias: str, name: str) -> Optional[float]:
+    """Parse the build timestamp out of a versioned collection name (None if not a version of `alias`)."""
+    m = re.fullmatch(re.escape(alias + _VERSION_SEP) + r"(\d{14})", name)
+    if not m:
+        return None
+    return datetime.strptime(m.group(1), _VERSION_FMT).timestamp()
+
+
+def list_versions(client: MilvusClient, alias: str) -> List[str]:
+    """List all physical versions of `alias`, oldest first."""
+    names = [n for n in client.list_collections() if version_timestamp(alias, n) is not None]
+    return sorted(names, key=lambda n: version_timestamp(alias, n))
+
+
+def resolve_alias(client: MilvusClient, alias: str) -> Optional[str]:
+    """Return the collection currently behind `alias`, or None if the alias does not exist."""
+    try:
+        return client.describe_alias(alias).get("collection_name") or None
+    except Exception:
+        return None
+
+
+def wait_until_ready(client: MilvusClient, collection_name: str, expected_rows: int = 0,
+                     timeout: float = 600.0, poll: float = 1.0) -> int:
+    """
+    Flush, load and block until `collection_name` can serve traffic:
+      - every inserted row is visible (row_count >= expected_rows)
+      - the collection is fully loaded
+      - all indexes have caught up (no pending index rows), so the first
+        queries after the alias switch do not hit brute-force segments
+    Returns the final row count; raises TimeoutError if not ready in time.
+    """
+    client.flush(collection_name=collection_name)
+    client.load_collection(collection_name=collection_name)
+
+    deadline = time.time() + timeout
+    while True:
+        row_count = int(client.get_collection_stats(collection_name).get("row_count", 0))
+        state = str(client.get_load_state(collection_name=collection_name).get("state", ""))
+        pending = 0
+        for idx in client.list_indexes(collection_name):
+            desc = client.describe_index(collection_name, index_name=idx) or {}
+            pending += int(desc.get("pending_index_rows", 0) or 0)
+
+        if row_count >= expected_rows and state.endswith("Loaded") and pending == 0:
+            log.info(f"✅ Collection '{collection_name}' ready: rows={row_count}")
+            return row_count
+        if time.time() > deadline:
+            raise TimeoutError(
+                f"Collection '{collection_name}' not ready after {timeout}s "
+                f"(rows={row_count}/{expected_rows}, state={state}, pending_index_rows={pending})"
+            )
+        log.info(f"⏳ Waiting for '{collection_name}': rows={row_count}/{expected_rows}, "
+                 f"state={state}, pending_index_rows={pending}")
+        time.sleep(poll)
+
+
+def switch_alias(client: MilvusClient, alias: str, target: str, drop_legacy: bool = False) -> Optional[str]:
+    """
+    Atomically point `alias` at `target`. Returns the previous target (None on first switch).
+
+    A legacy physical collection that still carries the alias name blocks alias creation.
+    It is dropped only if `drop_legacy=True` (one-off migration; readers see a short gap).
+    """
+    previous = resolve_alias(client, alias)
+    if previous is not None:
+        client.alter_alias(collection_name=target, alias=alias)
+        log.info(f"🔀 Alias '{alias}': {previous} -> {target}")
+        return previous
+
+    if alias in client.list_collections():
+        if not drop_legacy:
+            raise ValueError(
+                f"'{alias}' is a physical collection, not an alias. "
+                f"Re-run with drop_legacy=True to migrate it to versioned collections."
+            )
+        log.warning(f"Dropping legacy collection '{alias}' to free the alias name")
+        client.release_collection(alias)
+        client.drop_collection(alias)
+
+    client.create_alias(collection_name=target, alias=alias)
+    log.info(f"🔀 Alias '{alias}' created -> {target}")
+    return None
+
+
+def gc_old_versions(client: MilvusClient, alias: str, keep: int = VERSIONS_TO_KEEP,
+                    grace_seconds: float = VERSION_GC_GRACE_SECONDS) -> List[str]:
+    """
+    Drop retired versions of `alias`.
+
+    The live version is never touched, and the `keep` most recent retired versions
+    are kept for rollback. Older ones are dropped once their successor has existed
+    for longer than `grace_seconds`. Returns the names of dropped collections.
+    """
+    live = resolve_alias(client, alias)
+    versions = list_versions(client, alias)
+    retired = [v for v in versions if v != live]
+    candidates = retired[:max(len(retired) - keep, 0)]
+
+    dropped = []
+    now = time.time()
+    for name in candidates:
+        successor = versions[versions.index(name) + 1]
+        if now - version_timestamp(alias, successor) < grace_seconds:
+            continue
+        try:
+            client.release_collection(name)
+            client.drop_collection(name)
+            if summary_name(name) in client.list_collections():
+                client.release_collection(summary_name(name))
+                client.drop_collection(summary_name(name))
+            remove_store(name)
+            dropped.append(name)
+            log.info(f"🗑️ Dropped retired version: {name}")
+        except Exception as e:
+            log.error(f"Failed to drop retired version {name}: {e}")
+    return dropped
@@ -0,0 +1,108 @@
+from typing import Any, Dict, Optional
+
+from pymilvus import MilvusClient
+
+from My_RAG_Project.utils.env_utils import INDEX_PROFILE
+from My_RAG_Project.utils.log_utils import log
+from My_RAG_Project.utils.retrieval_config import load_retrieval_config
+
+# Named dense-index profiles. Each one pairs build params with the search params
+# that match them, so ingestion and search functions always agree.
+INDEX_PROFILES: Dict[str, Dict[str, Any]] = {
+    "hnsw_m16": {
+        "index_type": "HNSW",
+        "build_params": {"M": 16, "efConstruction": 64},
+        "search_params": {"ef": 64},
+    },
+    "hnsw_m32": {
+        "index_type": "HNSW",
+        "build_params": {"M": 32, "efConstruction": 200},
+        "search_params": {"ef": 128},
+    },
+    "ivf_flat": {
+        "index_type": "IVF_FLAT",
+        "build_params": {"nlist": 1024},
+        "search_params": {"nprobe": 16},
+    },
+    "ivf_pq": {
+        "index_type": "IVF_PQ",
+        "build_params": {"nlist": 1024, "m": 64, "nbits": 8},  # m must divide dim=512
+        "search_params": {"nprobe": 32},
+    },
+    "diskann": {
+        "index_type": "DISKANN",
+        "build_params": {},
+        "search_params": {"search_list": 100},
+    },
+}
+
+DENSE_METRIC = "IP"
+
+SPARSE_INDEX = {
+    "index_type": "SPARSE_INVERTED_INDEX",
+    "metric_type": "BM25",
+    "build_params": {"inverted_index_algo": "DAAT_MAXSCORE", "bm25_k1": 1.2, "bm25_b": 0.75},
+    "search_params": {"drop_ratio_search": 0.2},
+}
+
+
+def get_index_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """Return the index profile by name (defaults to env INDEX_PROFILE)."""
+    name = name or INDEX_PROFILE
+    if name not in INDEX_PROFILES:
+        raise ValueError(f"Unknown index profile '{name}'. Available: {sorted(INDEX_PROFILES)}")
+    return INDEX_PROFILES[name]
+
+
+def build_index_params(client: MilvusClient, profile: Optional[str] = None):
+    """Prepare index params for the 'sparse' (BM25) and 'dense' fields using the given profile."""
+    p = get_index_profile(profile)
+    index_params = client.prepare_index_params()
+    index_params.add_index(
+        field_name="sparse",
+        index_name="sparse_index",
+        index_type=SPARSE_INDEX["index_type"],
+        metric_type=SPARSE_INDEX["metric_type"],
+        params=SPARSE_INDEX["build_params"],
+    )
+    index_params.add_index(
+        field_name="dense",
+        index_name="dense_index",
+        index_type=p["index_type"],
+        metric_type=DENSE_METRIC,
+        params=p["build_params"],
+    )
+    return index_params
+
+
+def build_indexes(client: MilvusClient, collection_name: str, profile: Optional[str] = None):
+    """
+    Bulk-load finish step: flush the inserted data, then build all indexes once.
+    Loading and waiting for index completion is left to wait_until_ready().
+    """
+    client.flush(collection_name=collection_name)
+    client.create_index(collection_name=collection_name, index_params=build_index_params(client, profile))
+    log.info(f"🏗️ Building indexes on '{collection_name}' with profile '{profile or INDEX_PROFILE}'")
+
+
+def dense_search_params(profile: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Search params matching the dense index profile, e.g. {"metric_type": "IP", "params": {"ef": 64}}.
+    Tuned values from the retrieval config override the profile defaults.
+    """
+    name = profile or INDEX_PROFILE
+    params = dict(get_index_profile(name)["search_params"])
+    params.update(load_retrieval_config().get("dense_search_params", {}).get(name, {}))
+    return {"metric_type": DENSE_METRIC, "params": params}
+
+
+def sparse_search_params() -> Dict[str, Any]:
+    """Search params for the BM25 sparse index (tuned values from the retrieval config win)."""
+    params = dict(SPARSE_INDEX["search_params"])
+    params.update(load_retrieval_config().get("sparse_search_params", {}))
+    return {"metric_type": SPARSE_INDEX["metric_type"], "params": params}
+
+
+def search_oversample() -> int:
+    """Per-leg oversampling factor for hybrid search (each leg fetches k * oversample before fusion)."""
+    return max(int(load_retrieval_config().get("oversample", 1)), 1)
@@ -1,13 +1,13 @@
 from typing import List
 from langchain_core.documents import Document
-from langchain_milvus import Milvus, BM25BuiltInFunction
-from pymilvus import IndexType, MilvusClient, Function
-from pymilvus.client.types import MetricType, DataType, FunctionType
+from pymilvus import MilvusClient
 
-from My_RAG_Project.documents.pdf_parser import PDFParser
-from My_RAG_Project.llm_models.embeddings_model import bge_embedding
-from My_RAG_Project.utils.env_utils import MILVUS_URI, COLLECTION_NAME
+from My_RAG_Project.llm_models.embeddings_model import get_bge_embedding
+from My_RAG_Project.utils.env_utils import MILVUS_URI, COLLECTION_NAME, INDEX_PROFILE, PAYLOAD_MODE
 from My_RAG_Project.utils.log_utils import log
+from My_RAG_Project.documents.collection_versions import new_version_name, wait_until_ready, switch_alias
+from My_RAG_Project.documents.chunk_store import ChunkStoreWriter, set_current_version
+from My_RAG_Project.documents.write_milvus_pdf import create_pdf_collection, docs_to_rows, docs_to_payloads
 
 
 def validate_docs(docs: List[Document]):
@@ -23,73 +23,58 @@ def validate_docs(docs: List[Document]):
 
 
 class MilvusPDFWriter:
-    """Write parsed PDF documents into Milvus"""
+    """
+    Write parsed PDF documents into Milvus.
+    Follows PAYLOAD_MODE like the bulk pipeline (write_milvus_pdf.py): in "external" mode
+    rows go through pymilvus and text/keywords are appended to the version's chunk store,
+    which `close()` seals before the alias is switched.
+    """
 
     def __init__(self):
-        self.vector_store: Milvus = None
-
-    def create_collection(self):
-        client = MilvusClient(uri=MILVUS_URI)
-        schema = client.create_schema()
-        schema.add_field(field_name='id', datatype=DataType.INT64, is_primary=True, auto_id=True)
-        schema.add_field(field_name='text', datatype=DataType.VARCHAR, max_length=10000, enable_analyzer=True,
-                         analyzer_params={"tokenizer": "jieba", "filter": ["cnalphanumonly"]})
-        schema.add_field(field_name='source', datatype=DataType.VARCHAR, max_length=1000)
-        schema.add_field(field_name='page_number', datatype=DataType.INT64)
-        schema.add_field(field_name='char_count', datatype=DataType.INT64)
-        schema.add_field(field_name='keywords', datatype=DataType.VARCHAR, max_length=2000)
-        schema.add_field(field_name='sparse', datatype=DataType.SPARSE_FLOAT_VECTOR)
-        schema.add_field(field_name='dense', datatype=DataType.FLOAT_VECTOR, dim=512)
-
-        bm25_func = Function(
-            name="text_bm25_emb",
-            input_field_names=["text"],
-            output_field_names=["sparse"],
-            function_type=FunctionType.BM25,
-        )
-        schema.add_function(bm25_func)
-
-        index_params = client.prepare_index_params()
-        index_params.add_index(
-            field_name="sparse",
-            index_name="sparse_index",
-            index_type="SPARSE_INVERTED_INDEX",
-            metric_type="BM25",
-            params={"inverted_index_algo": "DAAT_MAXSCORE", "bm25_k1": 1.2, "bm25_b": 0.75},
-        )
-        index_params.add_index(
-            field_name="dense",
-            index_name="dense_index",
-            index_type=IndexType.HNSW,
-            metric_type=MetricType.IP,
-            params={"M": 16, "efConstruction": 64},
-        )
-
-        if COLLECTION_NAME in client.list_collections():
-            client.release_collection(COLLECTION_NAME)
-            client.drop_index(COLLECTION_NAME, index_name='sparse_index')
-            client.drop_index(COLLECTION_NAME, index_name='dense_index')
-            client.drop_collection(COLLECTION_NAME)
-
-        client.create_collection(COLLECTION_NAME, schema=schema, index_params=index_params)
-        log.info(f"✅ Created Milvus collection: {COLLECTION_NAME}")
+        self.vector_store = None  # langchain_milvus.Milvus, created by create_connection()
+        self.collection_name = None
+        self._chunk_store = None  # ChunkStoreWriter, "external" payload mode only
+
+    def create_collection(self, index_profile: str = INDEX_PROFILE) -> str:
+        """
+        Create a new versioned collection behind the COLLECTION_NAME alias.
+        The live version stays untouched; switch the alias once the new one is ready.
+        """
+        collection_name = new_version_name(COLLECTION_NAME)
+        create_pdf_collection(MilvusClient(uri=MILVUS_URI), collection_name, index_profile=index_profile)
+        return collection_name
+
+    def create_connection(self, collection_name: str = COLLECTION_NAME):
+        from langchain_milvus import Milvus, BM25BuiltInFunction  # heavy import, only when connecting
 
-    def create_connection(self):
         self.vector_store = Milvus(
-            embedding_function=bge_embedding,
-            collection_name=COLLECTION_NAME,
+            embedding_function=get_bge_embedding(),
+            collection_name=collection_name,
             builtin_function=BM25BuiltInFunction(),
             vector_field=['dense', 'sparse'],
             consistency_level="Strong",
             auto_id=True,
             connection_args={"uri": MILVUS_URI}
         )
+        self.collection_name = collection_name
         log.info("🔗 Connected to Milvus with embedding and BM25 support")
 
+    def _insert_external(self, docs: List[Document]):
+        """pymilvus insert (the chunk store needs the returned primary keys) + payloads to the store."""
+        if self._chunk_store is None:
+            self._chunk_store = ChunkStoreWriter(self.collection_name)
+        vectors = get_bge_embedding().embed_documents([d.page_content for d in docs])
+        res = self.vector_store.client.insert(collection_name=self.collection_name,
+                                              data=docs_to_rows(docs, vectors))
+        self._chunk_store.add_many(res["ids"], docs_to_payloads(docs))
+
     def add_documents(self, docs: List[Document]):
         try:
             validate_docs(docs)
-            self.vector_store.add_documents(docs)
+            if PAYLOAD_MODE == "external":
+                self._insert_external(docs)
+            else:
+                self.vector_store.add_documents(docs)
             log.info(f"📄 Added {len(docs)} documents to Milvus collection")
         except Exception as e:
             log.error(f"❌ Failed to add documents to Milvus: {e}")
@@ -97,49 +82,44 @@ class MilvusPDFWriter:
                 text = doc.page_content if doc.page_content else ""
                 log.warning(f"Doc {i} failed:\nMeta: {doc.metadata}\nText Preview: {text[:100]}...")
 
+    def close(self):
+        """Seal the chunk store ("external" payload mode); call before publishing the version."""
+        if self._chunk_store is not None:
+            self._chunk_store.close()
+            self._chunk_store = None
+
 
 if __name__ == '__main__':
+    from My_RAG_Project.documents.pdf_parser import PDFParser
+
     # Example test run
     file_path = r'../datas/pdf/(改v2)万达智慧商业逐字稿202409版本 .pdf'
     parser = PDFParser()
     docs = parser.parse_pdf_to_documents(file_path)
 
     milvus = MilvusPDFWriter()
-    milvus.create_collection()
-    milvus.create_connection()
+    version = milvus.create_collection()
+    milvus.create_connection(version)
 
     # Insert
     milvus.add_documents(docs)
+    milvus.close()
 
     # --- Make data visible for query/search: flush + load + wait (important) ---
     client = milvus.vector_store.client
-
-    # 1) Flush to seal segments so row_count updates
-    client.flush(collection_name=COLLECTION_NAME)
-    # 2) Load collection to enable query/search
-    client.load_collection(collection_name=COLLECTION_NAME)
-
-    # 3) Wait until row_count reflects the newly inserted rows
-    import time
-    expected = len(docs)
-    for _ in range(30):  # up to ~15s (30 * 0.5s)
-        stats = client.get_collection_stats(COLLECTION_NAME)
-        row_count = int(stats.get("row_count", 0))
-        print(f"⏳ Waiting rows... row_count={row_count}", flush=True)
-        if row_count >= expected:
-            break
-        time.sleep(0.5)
-
-    # Print final row_count
-    stats = client.get_collection_stats(COLLECTION_NAME)
-    total_rows = int(stats.get("row_count", 0))
+    total_rows = wait_until_ready(client, version, expected_rows=len(docs))
     print(f"📊 Total rows in collection: {total_rows}", flush=True)
 
+    # Readers follow the alias; switch only after the new version is fully ready
+    switch_alias(client, COLLECTION_NAME, version)
+    if PAYLOAD_MODE == "external":
+        set_current_version(COLLECTION_NAME, version)
+
     # 4) Query (note: empty filter requires a limit)
     result = client.query(
         collection_name=COLLECTION_NAME,
         filter="",  # empty expr allowed with limit
-        output_fields=['text', 'page_number', 'keywords'],
+        output_fields=['text', 'page_number'] + (['keywords'] if PAYLOAD_MODE != "external" else []),
         limit=20
     )
 
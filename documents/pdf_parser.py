@@ -3,7 +3,7 @@ from langchain_core.documents import Document
 from langchain_experimental.text_splitter import SemanticChunker
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import UnstructuredPDFLoader
-from My_RAG_Project.llm_models.embeddings_model import openai_embedding
+from My_RAG_Project.llm_models.embeddings_model import get_openai_embedding
 from My_RAG_Project.utils.log_utils import log
 from sklearn.feature_extraction.text import TfidfVectorizer
 
@@ -16,7 +16,7 @@ class PDFParser:
 
     def __init__(self):
         self.semantic_splitter = SemanticChunker(
-            openai_embedding,
+            get_openai_embedding(),
             breakpoint_threshold_type="standard_deviation",
             breakpoint_threshold_amount=1.0
         )
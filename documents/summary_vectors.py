@@ -0,0 +1,123 @@
+"""
+Page- and document-level aggregate vectors for coarse-to-fine retrieval.
+
+Ingestion accumulates the dense chunk vectors per (source, page) and per source and
+writes their normalized means into a small secondary collection next to each version:
+    <version>_summary      level ("page" | "doc"), source, page_number (0 for "doc"),
+                           chunk_count, dense (FLOAT_VECTOR dim=512)
+Readers use the alias "<alias>_summary", switched together with the chunk alias.
+A two-stage search first finds the top pages/documents here, then runs the chunk
+search restricted to them (see tools/search_tools.two_stage_resultset).
+"""
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+from pymilvus import MilvusClient
+from pymilvus.client.types import DataType
+
+from My_RAG_Project.documents.collection_versions import summary_name, wait_until_ready, switch_alias
+from My_RAG_Project.documents.index_profiles import DENSE_METRIC
+from My_RAG_Project.utils.log_utils import log
+
+SUMMARY_LEVELS = ("page", "doc")
+
+# The summary collection is a few thousand rows: a small HNSW graph is plenty.
+SUMMARY_INDEX = {
+    "index_type": "HNSW",
+    "build_params": {"M": 16, "efConstruction": 64},
+    "search_params": {"ef": 64},
+}
+
+
+class SummaryAccumulator:
+    """Running sums of chunk vectors per page and per document (memory ~ pages * dim)."""
+
+    def __init__(self):
+        self._pages: Dict[Tuple[str, int], List[Any]] = {}
+        self._docs: Dict[str, List[Any]] = {}
+
+    @staticmethod
+    def _add(groups: Dict, key, vec: np.ndarray):
+        entry = groups.get(key)
+        if entry is None:
+            groups[key] = [vec.astype(np.float64), 1]
+        else:
+            entry[0] += vec
+            entry[1] += 1
+
+    def add_rows(self, rows: Iterable[Dict[str, Any]]):
+        """Accumulate Milvus insert rows (needs 'source', 'page_number', 'dense')."""
+        for row in rows:
+            vec = np.asarray(row["dense"], dtype=np.float64)
+            source = row.get("source") or ""
+            self._add(self._pages, (source, int(row.get("page_number") or 0)), vec)
+            self._add(self._docs, source, vec)
+
+    def __len__(self):
+        return len(self._pages) + len(self._docs)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Summary rows with L2-normalized mean vectors (IP == cosine, like the chunk index)."""
+        out = []
+        groups = [("page", src, page, e) for (src, page), e in self._pages.items()]
+        groups += [("doc", src, 0, e) for src, e in self._docs.items()]
+        for level, source, page, (total, count) in groups:
+            mean = total / count
+            norm = np.linalg.norm(mean)
+            out.append({
+                "level": level,
+                "source": source,
+                "page_number": page,
+                "chunk_count": count,
+                "dense": (mean / norm if norm > 0 else mean).astype(np.float32).tolist(),
+            })
+        return out
+
+
+def create_summary_collection(client: MilvusClient, collection_name: str):
+    schema = client.create_schema()
+    schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True, auto_id=True)
+    schema.add_field(field_name="level", datatype=DataType.VARCHAR, max_length=8)
+    schema.add_field(field_name="source", datatype=DataType.VARCHAR, max_length=1000)
+    schema.add_field(field_name="page_number", datatype=DataType.INT64)
+    schema.add_field(field_name="chunk_count", datatype=DataType.INT64)
+    schema.add_field(field_name="dense", datatype=DataType.FLOAT_VECTOR, dim=512)
+
+    index_params = client.prepare_index_params()
+    index_params.add_index(
+        field_name="dense",
+        index_name="dense_index",
+        index_type=SUMMARY_INDEX["index_type"],
+        metric_type=DENSE_METRIC,
+        params=SUMMARY_INDEX["build_params"],
+    )
+    client.create_collection(collection_name=collection_name, schema=schema, index_params=index_params)
+
+
+def write_summary(client: MilvusClient, version: str, acc: SummaryAccumulator, batch_size: int = 1000) -> int:
+    """Create `<version>_summary` and insert the accumulated page/doc vectors; returns the row count."""
+    name = summary_name(version)
+    if name in client.list_collections():
+        client.drop_collection(name)
+    create_summary_collection(client, name)
+
+    rows = acc.rows()
+    for i in range(0, len(rows), batch_size):
+        client.insert(collection_name=name, data=rows[i:i + batch_size])
+    log.info(f"🧭 Summary collection '{name}': {len(rows)} rows "
+             f"({sum(r['level'] == 'page' for r in rows)} pages, {sum(r['level'] == 'doc' for r in rows)} docs)")
+    return len(rows)
+
+
+def publish_summary(client: MilvusClient, alias: str, version: str):
+    """Make `<version>_summary` ready and point `<alias>_summary` at it (no-op if it was not built)."""
+    name = summary_name(version)
+    if name not in client.list_collections():
+        log.warning(f"No summary collection for '{version}'; two-stage retrieval keeps the previous one")
+        return
+    wait_until_ready(client, name)
+    switch_alias(client, summary_name(alias), name)
+
+
+def summary_search_params() -> Dict[str, Any]:
+    return {"metric_type": DENSE_METRIC, "params": dict(SUMMARY_INDEX["search_params"])}
@@ -7,10 +7,19 @@ import multiprocessing as mp
 from typing import List
 
 from My_RAG_Project.utils.log_utils import log
-from My_RAG_Project.utils.env_utils import MILVUS_URI
+from My_RAG_Project.utils.env_utils import MILVUS_URI, COLLECTION_NAME, INDEX_PROFILE, PAYLOAD_MODE
+from My_RAG_Project.documents.collection_versions import (
+    new_version_name,
+    wait_until_ready,
+    switch_alias,
+    gc_old_versions,
+)
+from My_RAG_Project.documents.index_profiles import build_index_params, build_indexes
+from My_RAG_Project.documents.chunk_store import ChunkStoreWriter, set_current_version
+from My_RAG_Project.documents.summary_vectors import SummaryAccumulator, write_summary, publish_summary
 from pymilvus import MilvusClient
-from pymilvus.client.types import DataType, MetricType
-from pymilvus import IndexType, Function
+from pymilvus.client.types import DataType
+from pymilvus import Function
 from pymilvus.client.types import FunctionType
 
 # --------------- Parser process ---------------
@@ -57,25 +66,77 @@ def file_parser_process(pdf_dir: str, output_queue: mp.Queue, batch_size: int =
 
 # --------------- Writer process ---------------
 
-def milvus_writer_process(input_queue: mp.Queue, collection_name: str, milvus_uri: str):
+def docs_to_rows(docs: List, vectors: List[List[float]], payload_mode: str = PAYLOAD_MODE) -> List[dict]:
+    """
+    Convert chunked Documents + their dense vectors into Milvus insert rows (sparse is filled by BM25).
+    In "external" payload mode `keywords` is not part of the schema (it lives in the chunk store).
+    """
+    rows = []
+    for doc, vec in zip(docs, vectors):
+        meta = doc.metadata or {}
+        row = {
+            "text": doc.page_content,
+            "source": meta.get("source", ""),
+            "page_number": meta.get("page_number", 0),
+            "char_count": meta.get("char_count", len(doc.page_content)),
+            "dense": vec,
+        }
+        if payload_mode != "external":
+            row["keywords"] = meta.get("keywords", "")
+        rows.append(row)
+    return rows
+
+
+def docs_to_payloads(docs: List) -> List[dict]:
+    """Payloads kept in the external chunk store (served instead of Milvus output fields)."""
+    return [{"text": d.page_content, "keywords": (d.metadata or {}).get("keywords", "")} for d in docs]
+
+
+def milvus_writer_process(input_queue: mp.Queue, collection_name: str, milvus_uri: str,
+                          written_counter=None, bulk_load: bool = False, build_summary: bool = True):
     """
     Process-2: Initialize embedding and Milvus vector store in THIS process and write batches.
     This is where CUDA can be safely initialized (spawn).
+    `written_counter` (optional mp.Value) reports the number of written rows to the parent.
+    `bulk_load=True` inserts raw rows through pymilvus into an index-less collection;
+    indexes are built once at the end by the parent (see build_indexes).
+    In "external" payload mode rows always go through pymilvus (we need the returned
+    primary keys) and text/keywords are appended to the version's chunk store.
+    `build_summary=True` also accumulates page/doc mean vectors and writes them to
+    `<collection_name>_summary` at the end (used by two-stage retrieval).
     """
     # Lazy import here so CUDA init happens in the child process, not parent.
     from langchain_milvus import Milvus, BM25BuiltInFunction
-    from My_RAG_Project.llm_models.embeddings_model import bge_embedding
-
-    # Build the vectorstore connection in the writer process
-    vector_store = Milvus(
-        embedding_function=bge_embedding,                # CUDA/HF init happens here
-        collection_name=collection_name,
-        builtin_function=BM25BuiltInFunction(),
-        vector_field=["dense", "sparse"],
-        consistency_level="Strong",
-        auto_id=True,
-        connection_args={"uri": milvus_uri},
-    )
+    from My_RAG_Project.llm_models.embeddings_model import get_bge_embedding
+
+    bge_embedding = get_bge_embedding()              # CUDA/HF init happens here
+    chunk_store = ChunkStoreWriter(collection_name) if PAYLOAD_MODE == "external" else None
+    summary = SummaryAccumulator() if build_summary else None
+    client = MilvusClient(uri=milvus_uri)
+
+    if bulk_load or chunk_store is not None or summary is not None:
+        # langchain-milvus would auto-create an index on an index-less collection (and hides
+        # the vectors the summary needs), so these modes write through the low-level client.
+        def write(batch):
+            vectors = bge_embedding.embed_documents([d.page_content for d in batch])
+            rows = docs_to_rows(batch, vectors)
+            res = client.insert(collection_name=collection_name, data=rows)
+            if chunk_store is not None:
+                chunk_store.add_many(res["ids"], docs_to_payloads(batch))
+            if summary is not None:
+                summary.add_rows(rows)
+    else:
+        # Build the vectorstore connection in the writer process
+        vector_store = Milvus(
+            embedding_function=bge_embedding,
+            collection_name=collection_name,
+            builtin_function=BM25BuiltInFunction(),
+            vector_field=["dense", "sparse"],
+            consistency_level="Strong",
+            auto_id=True,
+            connection_args={"uri": milvus_uri},
+        )
+        write = vector_store.add_documents
 
     total_written = 0
     while True:
@@ -86,12 +147,18 @@ def milvus_writer_process(input_queue: mp.Queue, collection_name: str, milvus_ur
             if not batch:
                 continue
 
-            vector_store.add_documents(batch)
+            write(batch)
             total_written += len(batch)
+            if written_counter is not None:
+                written_counter.value = total_written
             log.info(f"Written batch. Total written: {total_written}")
         except Exception as e:
             log.error(f"Written failed: {e}", exc_info=True)
 
+    if chunk_store is not None:
+        chunk_store.close()
+    if summary is not None and len(summary):
+        write_summary(client, collection_name, summary)
     log.info(f"The writing process has ended. A total of {total_written} documents have been written.")
 
 
@@ -114,16 +181,20 @@ def drop_collection_if_exists(client: MilvusClient, collection_name: str):
             pass
         client.drop_collection(collection_name)
 
-def create_pdf_collection(client: MilvusClient, collection_name: str):
+def create_pdf_collection(client: MilvusClient, collection_name: str,
+                          index_profile: str = INDEX_PROFILE, defer_index: bool = False, auto_id: bool = True):
     """
     Create a collection compatible with pdf_parser & milvus_db_pdf:
       - text (VARCHAR, analyzer enabled), source, page_number, char_count, keywords
+        (keywords omitted and text memory-mapped in "external" payload mode)
       - sparse (SPARSE_FLOAT_VECTOR) + dense (FLOAT_VECTOR dim=512)
       - BM25 function on text -> sparse
-      - HNSW index on dense; SPARSE_INVERTED_INDEX on sparse
+      - dense index from `index_profile`; SPARSE_INVERTED_INDEX on sparse
+    With `defer_index=True` no index is created (bulk-load mode); call build_indexes() after inserting.
+    With `auto_id=False` callers supply primary keys (used by snapshot restore to keep ids stable).
     """
     schema = client.create_schema()
-    schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True, auto_id=True)
+    schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True, auto_id=auto_id)
     schema.add_field(
         field_name="text",
         datatype=DataType.VARCHAR,
@@ -134,7 +205,8 @@ def create_pdf_collection(client: MilvusClient, collection_name: str):
     schema.add_field(field_name="source", datatype=DataType.VARCHAR, max_length=1000)
     schema.add_field(field_name="page_number", datatype=DataType.INT64)
     schema.add_field(field_name="char_count", datatype=DataType.INT64)
-    schema.add_field(field_name="keywords", datatype=DataType.VARCHAR, max_length=2000)
+    if PAYLOAD_MODE != "external":
+        schema.add_field(field_name="keywords", datatype=DataType.VARCHAR, max_length=2000)
 
     schema.add_field(field_name="sparse", datatype=DataType.SPARSE_FLOAT_VECTOR)
     schema.add_field(field_name="dense", datatype=DataType.FLOAT_VECTOR, dim=512)
@@ -147,77 +219,86 @@ def create_pdf_collection(client: MilvusClient, collection_name: str):
     )
     schema.add_function(bm25_func)
 
-    index_params = client.prepare_index_params()
-    index_params.add_index(
-        field_name="sparse",
-        index_name="sparse_index",
-        index_type="SPARSE_INVERTED_INDEX",
-        metric_type="BM25",
-        params={"inverted_index_algo": "DAAT_MAXSCORE", "bm25_k1": 1.2, "bm25_b": 0.75},
-    )
-    index_params.add_index(
-        field_name="dense",
-        index_name="dense_index",
-        index_type=IndexType.HNSW,
-        metric_type=MetricType.IP,
-        params={"M": 16, "efConstruction": 64},
-    )
+    if defer_index:
+        client.create_collection(collection_name=collection_name, schema=schema)
+        log.info(f"✅ Created Milvus collection (indexes deferred): {collection_name}")
+    else:
+        index_params = build_index_params(client, index_profile)
+        client.create_collection(collection_name=collection_name, schema=schema, index_params=index_params)
+        log.info(f"✅ Created Milvus collection: {collection_name}")
 
-    client.create_collection(collection_name=collection_name, schema=schema, index_params=index_params)
-    log.info(f"✅ Created Milvus collection: {collection_name}")
+    if PAYLOAD_MODE == "external":
+        # text is kept only for the BM25 analyzer: memory-map it instead of holding it in RAM.
+        # Field properties can only change while released; wait_until_ready() loads it again.
+        client.release_collection(collection_name)
+        client.alter_collection_field(collection_name, field_name="text", field_params={"mmap.enabled": True})
 
 
-def prepare_collection_interactive(client: MilvusClient) -> str:
+def ask_alias_interactive() -> str:
     """
-    Ask user for collection name.
-    - If exists: ask whether to drop and recreate.
-    - If 'n' or anything else: exit program.
+    Ask user for the alias readers use (defaults to COLLECTION_NAME).
+    A fresh versioned collection is built behind it; the live version keeps
+    serving until the alias is switched.
     """
-    name = input("Please input the Collection name: ").strip()
+    name = input(f"Please input the Collection alias [{COLLECTION_NAME}]: ").strip() or COLLECTION_NAME
     import re
     if not re.match(r'^[A-Za-z0-9_]+$', name):
         print("❌ Collection name can only contain letters, numbers, and underscores.")
         exit()
 
-    if not name:
-        print("Empty collection name, exit.")
-        sys.exit(0)
-
-    if collection_exists(client, name):
-        ans = input(f"Collection '{name}' already exists. Drop and recreate? (y/N): ").strip().lower()
-        if ans == "y":
-            drop_collection_if_exists(client, name)
-            create_pdf_collection(client, name)
-        else:
-            print("You chose not to drop the existing collection. Exit.")
-            sys.exit(0)
-    else:
-        create_pdf_collection(client, name)
-
     return name
 
 
+def publish_version(client: MilvusClient, alias: str, version: str, expected_rows: int):
+    """
+    Wait until `version` is flushed, loaded and indexed, switch `alias` to it (and
+    `<alias>_summary` to its summary collection), then garbage-collect retired
+    versions past their grace period.
+    """
+    wait_until_ready(client, version, expected_rows=expected_rows)
+
+    drop_legacy = False
+    if alias in client.list_collections():
+        ans = input(f"'{alias}' is a legacy (non-alias) collection. Drop it and switch to aliases? (y/N): ")
+        drop_legacy = ans.strip().lower() == "y"
+        if not drop_legacy:
+            print(f"Keeping legacy collection. New data stays in '{version}'.")
+            return
+
+    switch_alias(client, alias, version, drop_legacy=drop_legacy)
+    if PAYLOAD_MODE == "external":
+        set_current_version(alias, version)
+    publish_summary(client, alias, version)
+    gc_old_versions(client, alias)
+
+
 # --------------- Main ---------------
 
 def main():
     pdf_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "datas", "pdf"))
     queue_maxsize = 20
     batch_size = 20
+    bulk_load = True                # insert first, build indexes once at the end
+    index_profile = INDEX_PROFILE
 
-    # Prepare collection (parent process, no CUDA touched)
+    # Prepare a new version behind the alias (parent process, no CUDA touched)
     client = MilvusClient(uri=MILVUS_URI)
-    collection_name = prepare_collection_interactive(client)
+    alias = ask_alias_interactive()
+    collection_name = new_version_name(alias)
+    create_pdf_collection(client, collection_name, index_profile=index_profile, defer_index=bulk_load)
 
     # Use spawn context for safety with CUDA
     ctx = mp.get_context("spawn")
     docs_queue: mp.Queue = ctx.Queue(maxsize=queue_maxsize)
+    written = ctx.Value("i", 0)
 
     # Start processes
     parser_proc = ctx.Process(
         target=file_parser_process, args=(pdf_dir, docs_queue, batch_size), name="parser-proc"
     )
     writer_proc = ctx.Process(
-        target=milvus_writer_process, args=(docs_queue, collection_name, MILVUS_URI), name="writer-proc"
+        target=milvus_writer_process, args=(docs_queue, collection_name, MILVUS_URI, written, bulk_load),
+        name="writer-proc"
     )
 
     parser_proc.start()
@@ -227,22 +308,15 @@ def main():
     docs_queue.put(None)  # ensure writer can exit
     writer_proc.join()
 
-    # Wait for rows to be visible and then print stats & sample rows
-    time.sleep(0.3)
-    # Some engines are async; do a lightweight retry for row_count
-    for _ in range(10):
-        try:
-            stats = client.get_collection_stats(collection_name)
-            row_count = stats.get("row_count", 0)
-            if int(row_count) > 0:
-                break
-            time.sleep(0.3)
-        except Exception:
-            time.sleep(0.3)
+    if bulk_load:
+        build_indexes(client, collection_name, index_profile)
+
+    # Flush + load + wait for indexes, then switch readers over atomically
+    publish_version(client, alias, collection_name, expected_rows=written.value)
 
     stats = client.get_collection_stats(collection_name)
     row_count = int(stats.get("row_count", 0))
-    print(f"📊 Total rows in collection: {row_count}")
+    print(f"📊 Total rows in collection '{collection_name}': {row_count}")
 
     # Print first 10 docs
     try:
@@ -250,7 +324,8 @@ def main():
             collection_name=collection_name,
             filter="",                # empty filter must be paired with limit
             limit=10,
-            output_fields=["text", "page_number", "keywords", "source", "char_count"],
+            output_fields=["text", "page_number", "source", "char_count"]
+                          + (["keywords"] if PAYLOAD_MODE != "external" else []),
         )
         print("🔍 Query Result (first 10):")
         for i, r in enumerate(res):
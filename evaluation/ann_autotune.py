@@ -0,0 +1,210 @@
+"""
+ANN search parameter autotuner.
+
+Builds exact ground truth for a sample of queries (brute-force inner product over the
+stored `dense` vectors, un-pruned BM25 for `sparse`), sweeps the dense search param of
+the active index profile (ef / nprobe / search_list), BM25 `drop_ratio_search` and the
+per-leg oversampling factor, prints recall@k against p50/p99 latency and writes the
+chosen operating point into the retrieval config (utils/retrieval_config.py).
+
+Usage:
+    python -m My_RAG_Project.evaluation.ann_autotune --k 5 --queries 200 --target-recall 0.95
+"""
+import argparse
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pymilvus import MilvusClient
+
+from My_RAG_Project.documents.index_profiles import get_index_profile, DENSE_METRIC, SPARSE_INDEX
+from My_RAG_Project.evaluation.metrics import recall_at_k, percentile
+from My_RAG_Project.llm_models.embeddings_model import get_bge_embedding
+from My_RAG_Project.utils.env_utils import MILVUS_URI, COLLECTION_NAME, INDEX_PROFILE
+from My_RAG_Project.utils.log_utils import log
+from My_RAG_Project.utils.retrieval_config import save_retrieval_config
+
+# Sweep grids per dense search param
+PARAM_GRIDS = {
+    "ef": [16, 32, 48, 64, 96, 128, 256],
+    "nprobe": [4, 8, 16, 32, 64, 128],
+    "search_list": [20, 50, 100, 200],
+}
+DROP_RATIOS = [0.0, 0.1, 0.2, 0.3, 0.5]
+OVERSAMPLES = [1, 2, 3]
+
+
+# ---------- Ground truth ----------
+
+def load_corpus(client: MilvusClient, collection: str, expr: str,
+                batch_size: int = 1000) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """Stream (id, dense, text) for every row matching `expr` with a query iterator."""
+    ids, vecs, texts = [], [], []
+    it = client.query_iterator(collection_name=collection, batch_size=batch_size, filter=expr,
+                               output_fields=["id", "dense", "text"])
+    while True:
+        batch = it.next()
+        if not batch:
+            it.close()
+            break
+        for r in batch:
+            ids.append(r["id"])
+            vecs.append(r["dense"])
+            texts.append(r.get("text") or "")
+    log.info(f"Loaded {len(ids)} rows from '{collection}' for ground truth")
+    return np.asarray(ids, dtype=np.int64), np.asarray(vecs, dtype=np.float32), texts
+
+
+def sample_queries(texts: List[str], n: int, seed: int = 42, max_chars: int = 64) -> List[str]:
+    """Use the leading sentence fragment of random chunks as synthetic queries."""
+    rnd = random.Random(seed)
+    picked = rnd.sample(texts, min(n, len(texts)))
+    return [t.strip().replace("\n", " ")[:max_chars] for t in picked if t.strip()]
+
+
+def exact_dense_topk(query_vecs: np.ndarray, corpus_vecs: np.ndarray, ids: np.ndarray, k: int) -> List[List[int]]:
+    """Brute-force inner-product top-k."""
+    scores = query_vecs @ corpus_vecs.T
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return ids[np.take_along_axis(top, order, axis=1)].tolist()
+
+
+def exact_bm25_topk(client: MilvusClient, collection: str, queries: List[str], k: int, expr: str) -> List[List[int]]:
+    """BM25 with drop_ratio_search=0 scans every posting, i.e. the exact ranking."""
+    res = client.search(collection_name=collection, data=queries, anns_field="sparse", limit=k, filter=expr,
+                        search_params={"metric_type": SPARSE_INDEX["metric_type"],
+                                       "params": {"drop_ratio_search": 0.0}})
+    return [[h["id"] for h in hits] for hits in res]
+
+
+def rrf_ids(dense_ids: List[int], sparse_ids: List[int], k: int, rrf_k: int = 60) -> List[int]:
+    """Same fusion as hybrid_rrf_search, on id lists."""
+    fused: Dict[int, float] = {}
+    for lst in (dense_ids, sparse_ids):
+        for rank, pk in enumerate(lst):
+            fused[pk] = fused.get(pk, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)[:k]
+
+
+# ---------- Sweep ----------
+
+def _timed_search(client: MilvusClient, collection: str, data, anns_field: str, limit: int,
+                  search_params: dict, expr: str) -> Tuple[List[int], float]:
+    t0 = time.perf_counter()
+    res = client.search(collection_name=collection, data=[data], anns_field=anns_field, limit=limit,
+                        filter=expr, search_params=search_params)
+    return [h["id"] for h in res[0]], (time.perf_counter() - t0) * 1000
+
+
+def run_sweep(client: MilvusClient, collection: str, queries: List[str], query_vecs: np.ndarray,
+              gt_dense: List[List[int]], gt_sparse: List[List[int]], k: int, expr: str,
+              profile: Optional[str] = None) -> List[Dict]:
+    """
+    Each leg is swept independently (dense: param x oversample, sparse: drop x oversample) and
+    the hybrid result/latency of every combination is rebuilt offline from the per-query legs,
+    exactly as hybrid_rrf_search runs them (sequential legs, then RRF).
+    """
+    p = get_index_profile(profile)
+    param_key = next(iter(p["search_params"]))
+    grid = PARAM_GRIDS.get(param_key, [p["search_params"][param_key]])
+
+    # Warm up caches/connections so the first grid point is not penalized
+    for v, q in list(zip(query_vecs, queries))[:5]:
+        _timed_search(client, collection, v.tolist(), "dense", k, {"metric_type": DENSE_METRIC, "params": {}}, expr)
+        _timed_search(client, collection, q, "sparse", k, {"metric_type": SPARSE_INDEX["metric_type"]}, expr)
+
+    dense_runs, sparse_runs = {}, {}
+    for os_ in OVERSAMPLES:
+        limit = k * os_
+        for val in grid:
+            val_eff = max(val, limit) if param_key == "ef" else val
+            params = {"metric_type": DENSE_METRIC, "params": {param_key: val_eff}}
+            dense_runs[(val, os_)] = [_timed_search(client, collection, v.tolist(), "dense", limit, params, expr)
+                                      for v in query_vecs]
+        for drop in DROP_RATIOS:
+            params = {"metric_type": SPARSE_INDEX["metric_type"], "params": {"drop_ratio_search": drop}}
+            sparse_runs[(drop, os_)] = [_timed_search(client, collection, q, "sparse", limit, params, expr)
+                                        for q in queries]
+
+    gt_hybrid = [rrf_ids(d, s, k) for d, s in zip(gt_dense, gt_sparse)]
+    results = []
+    for os_ in OVERSAMPLES:
+        for val in grid:
+            dense = dense_runs[(val, os_)]
+            for drop in DROP_RATIOS:
+                sparse = sparse_runs[(drop, os_)]
+                lat = [d[1] + s[1] for d, s in zip(dense, sparse)]
+                hybrid = [rrf_ids(d[0], s[0], k) for d, s in zip(dense, sparse)]
+                results.append({
+                    param_key: val,
+                    "drop_ratio_search": drop,
+                    "oversample": os_,
+                    "dense_recall": float(np.mean([recall_at_k(d[0], g[:k], k) for d, g in zip(dense, gt_dense)])),
+                    "sparse_recall": float(np.mean([recall_at_k(s[0], g[:k], k) for s, g in zip(sparse, gt_sparse)])),
+                    "hybrid_recall": float(np.mean([recall_at_k(h, g, k) for h, g in zip(hybrid, gt_hybrid)])),
+                    "p50_ms": percentile(lat, 50),
+                    "p99_ms": percentile(lat, 99),
+                })
+    return results
+
+
+def choose_operating_point(results: List[Dict], target_recall: float) -> Dict:
+    """Lowest p99 among points meeting the hybrid recall target; best recall if none does."""
+    ok = [r for r in results if r["hybrid_recall"] >= target_recall]
+    if ok:
+        return min(ok, key=lambda r: (r["p99_ms"], r["p50_ms"]))
+    log.warning(f"No point reaches hybrid recall@k >= {target_recall}; picking the most accurate one")
+    return max(results, key=lambda r: (r["hybrid_recall"], -r["p99_ms"]))
+
+
+def print_results(results: List[Dict], k: int):
+    param_key = next(iter(results[0]))
+    print(f"{param_key:>11} {'drop':>5} {'os':>3} {'dense@' + str(k):>9} {'bm25@' + str(k):>8} "
+          f"{'hybrid@' + str(k):>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in sorted(results, key=lambda r: r["p99_ms"]):
+        print(f"{r[param_key]:>11} {r['drop_ratio_search']:>5.2f} {r['oversample']:>3} {r['dense_recall']:>9.3f} "
+              f"{r['sparse_recall']:>8.3f} {r['hybrid_recall']:>10.3f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+
+# ---------- Main ----------
+
+def main():
+    ap = argparse.ArgumentParser(description="Sweep ANN/BM25 search params against exact ground truth")
+    ap.add_argument("--collection", default=COLLECTION_NAME)
+    ap.add_argument("--profile", default=INDEX_PROFILE)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--queries", type=int, default=200, help="number of sampled queries")
+    ap.add_argument("--expr", default="page_number >= 1")
+    ap.add_argument("--target-recall", type=float, default=0.95)
+    ap.add_argument("--dry-run", action="store_true", help="print only, do not write the retrieval config")
+    args = ap.parse_args()
+
+    client = MilvusClient(uri=MILVUS_URI)
+    ids, corpus_vecs, texts = load_corpus(client, args.collection, args.expr)
+    queries = sample_queries(texts, args.queries)
+    query_vecs = np.asarray(get_bge_embedding().embed_documents(queries), dtype=np.float32)
+
+    depth = args.k * max(OVERSAMPLES)
+    gt_dense = exact_dense_topk(query_vecs, corpus_vecs, ids, depth)
+    gt_sparse = exact_bm25_topk(client, args.collection, queries, depth, args.expr)
+
+    results = run_sweep(client, args.collection, queries, query_vecs, gt_dense, gt_sparse,
+                        args.k, args.expr, args.profile)
+    print_results(results, args.k)
+
+    best = choose_operating_point(results, args.target_recall)
+    print(f"\n✅ Chosen operating point: {best}")
+    if not args.dry_run:
+        param_key = next(iter(best))
+        save_retrieval_config({
+            "dense_search_params": {args.profile: {param_key: best[param_key]}},
+            "sparse_search_params": {"drop_ratio_search": best["drop_ratio_search"]},
+            "oversample": best["oversample"],
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Import-time budget check.
+
+Imports each module in a fresh interpreter (so nothing is cached by earlier imports)
+and fails (exit code 1) when one takes longer than its budget. Imports must stay
+free of model loading, network connections and graph compilation — those belong in
+the lazy factories (get_llm, get_bge_embedding, get_retriever_tool, get_graph, ...).
+
+Budgets (seconds) come from configs/import_budget.json ({"module": seconds}), falling
+back to DEFAULT_BUDGETS.
+
+Usage:
+    python -m My_RAG_Project.evaluation.import_budget
+    python -m My_RAG_Project.evaluation.import_budget --repeat 5 --report import_times.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+from My_RAG_Project.utils.log_utils import log
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(root_dir, "configs", "import_budget.json")
+
+DEFAULT_BUDGETS: Dict[str, float] = {
+    "My_RAG_Project.llm_models.embeddings_model": 0.5,
+    "My_RAG_Project.tools.retriever_tools": 0.5,
+    "My_RAG_Project.tools.search_tools": 2.0,
+    "My_RAG_Project.corrective_rag.graph1": 3.0,
+    "My_RAG_Project.adaptive_rag.graph_2": 3.0,
+    "My_RAG_Project.documents.write_milvus_pdf": 2.0,
+}
+
+_PROBE = (
+    "import time, importlib, sys\n"
+    "t0 = time.perf_counter()\n"
+    "importlib.import_module(sys.argv[1])\n"
+    "print(time.perf_counter() - t0)\n"
+)
+
+
+def import_seconds(module: str) -> float:
+    """Wall time of `import module` in a fresh interpreter (interpreter start-up excluded)."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    out = subprocess.run([sys.executable, "-c", _PROBE, module], capture_output=True, text=True, env=env)
+    if out.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{out.stderr.strip()}")
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def load_budgets(path: str = BUDGET_PATH) -> Dict[str, float]:
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return dict(DEFAULT_BUDGETS)
+
+
+def check(budgets: Dict[str, float], repeat: int = 3) -> List[str]:
+    """Return the modules over budget (best of `repeat` runs, to ignore cold disk caches)."""
+    failures = []
+    for module, budget in budgets.items():
+        try:
+            best = min(import_seconds(module) for _ in range(repeat))
+        except RuntimeError as e:
+            failures.append(str(e))
+            continue
+        status = "ok" if best <= budget else "SLOW"
+        print(f"{status:>4}  {best:6.2f}s / {budget:4.1f}s  {module}")
+        if best > budget:
+            failures.append(f"{module}: {best:.2f}s > budget {budget:.1f}s")
+    return failures
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Fail when module imports exceed their time budget")
+    ap.add_argument("--budgets", default=BUDGET_PATH)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--report", help="optional path to write the measured times as JSON")
+    args = ap.parse_args()
+
+    budgets = load_budgets(args.budgets)
+    failures = check(budgets, args.repeat)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"failures": failures, "budgets": budgets}, f, indent=2)
+    if failures:
+        print("\n❌ Import budget exceeded:")
+        for msg in failures:
+            print(" -", msg)
+        log.error(f"{len(failures)} module(s) over import budget")
+        return 1
+    print("\n✅ All imports within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import math
+from typing import Dict, Iterable, List, Sequence
+
+
+def recall_at_k(retrieved: Sequence, relevant: Iterable, k: int) -> float:
+    """Fraction of `relevant` items found in the first k of `retrieved`."""
+    relevant = set(relevant)
+    if not relevant:
+        return 0.0
+    hits = len(relevant.intersection(list(retrieved)[:k]))
+    return hits / min(len(relevant), k)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile (q in [0, 100]); 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    pos = (len(xs) - 1) * q / 100.0
+    lo, hi = math.floor(pos), math.ceil(pos)
+    if lo == hi:
+        return xs[lo]
+    return xs[lo] + (xs[hi] - xs[lo]) * (pos - lo)
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/mean in milliseconds."""
+    return {
+        "p50_ms": percentile(latencies_ms, 50),
+        "p90_ms": percentile(latencies_ms, 90),
+        "p99_ms": percentile(latencies_ms, 99),
+        "mean_ms": sum(latencies_ms) / len(latencies_ms) if latencies_ms else 0.0,
+    }
+
+
+def reciprocal_rank(relevance: Sequence[bool]) -> float:
+    """1 / rank of the first relevant hit (0.0 if none)."""
+    for i, rel in enumerate(relevance):
+        if rel:
+            return 1.0 / (i + 1)
+    return 0.0
+
+
+def ndcg_at_k(relevance: Sequence[bool], k: int, n_relevant: int) -> float:
+    """Binary-gain nDCG@k; the ideal ranking puts min(n_relevant, k) relevant hits first."""
+    dcg = sum(1.0 / math.log2(i + 2) for i, rel in enumerate(list(relevance)[:k]) if rel)
+    idcg = sum(1.0 / math.log2(i + 2) for i in range(min(n_relevant, k)))
+    return dcg / idcg if idcg > 0 else 0.0
@@ -0,0 +1,192 @@
+"""
+Offline retrieval quality + latency regression suite.
+
+Runs dense_similarity_search, sparse_bm25_search, hybrid_rrf_search (and two_stage_search
+with --strategies) over a labeled question set and reports recall@k, MRR, nDCG@k,
+latency percentiles and throughput.
+Compared against a saved baseline, the run fails (exit code 1) when any metric regresses
+past the configured tolerance.
+
+Labeled set (JSONL, one object per line):
+    {"question": "万达智慧商业平台的核心功能有哪些？", "source": "xxx.pdf", "pages": [3, 4]}
+`source` is matched by file name; omit `pages` to accept any page of the source.
+
+Usage:
+    python -m My_RAG_Project.evaluation.retrieval_eval --dataset datas/eval/questions.jsonl --save-baseline
+    python -m My_RAG_Project.evaluation.retrieval_eval --dataset datas/eval/questions.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from My_RAG_Project.evaluation.metrics import latency_summary, ndcg_at_k, reciprocal_rank
+from My_RAG_Project.tools.search_tools import (
+    dense_similarity_search,
+    sparse_bm25_search,
+    hybrid_rrf_search,
+    two_stage_search,
+)
+from My_RAG_Project.utils.log_utils import log
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(root_dir, "configs", "retrieval_baseline.json")
+
+STRATEGIES: Dict[str, Callable[..., List[Dict[str, Any]]]] = {
+    "dense": dense_similarity_search,
+    "bm25": sparse_bm25_search,
+    "hybrid": hybrid_rrf_search,
+    "two_stage": two_stage_search,
+}
+QUALITY_METRICS = ["recall", "mrr", "ndcg"]
+
+Target = Tuple[Optional[str], Optional[int]]
+
+
+def load_dataset(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _targets(item: Dict[str, Any]) -> List[Target]:
+    source = os.path.basename(item["source"]) if item.get("source") else None
+    pages = item.get("pages") or [None]
+    return [(source, p) for p in pages]
+
+
+def _matches(row: Dict[str, Any], target: Target) -> bool:
+    source, page = target
+    if source is not None and os.path.basename(row.get("source") or "") != source:
+        return False
+    return page is None or row.get("page_number") == page
+
+
+def judge(rows: List[Dict[str, Any]], targets: List[Target]) -> Tuple[List[bool], int]:
+    """
+    Mark each hit relevant if it covers a not-yet-covered target (so several chunks
+    of the same page count once). Returns (relevance per hit, number of targets covered).
+    """
+    covered = set()
+    relevance = []
+    for row in rows:
+        new = [t for t in targets if t not in covered and _matches(row, t)]
+        relevance.append(bool(new))
+        covered.update(new)
+    return relevance, len(covered)
+
+
+def evaluate_strategy(name: str, dataset: List[Dict[str, Any]], k: int, expr: str) -> Dict[str, float]:
+    search = STRATEGIES[name]
+    search(dataset[0]["question"], k=k, expr=expr)  # warm-up (connections, model)
+
+    recalls, mrrs, ndcgs, latencies = [], [], [], []
+    t_start = time.perf_counter()
+    for item in dataset:
+        targets = _targets(item)
+        t0 = time.perf_counter()
+        rows = search(item["question"], k=k, expr=expr)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+        relevance, covered = judge(rows[:k], targets)
+        recalls.append(covered / len(targets))
+        mrrs.append(reciprocal_rank(relevance))
+        ndcgs.append(ndcg_at_k(relevance, k, len(targets)))
+    wall = time.perf_counter() - t_start
+
+    n = len(dataset)
+    report = {
+        "recall": sum(recalls) / n,
+        "mrr": sum(mrrs) / n,
+        "ndcg": sum(ndcgs) / n,
+        "qps": n / wall if wall > 0 else 0.0,
+    }
+    report.update(latency_summary(latencies))
+    return report
+
+
+def compare(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            quality_tolerance: float, latency_tolerance: float) -> List[str]:
+    """
+    Return human-readable regressions:
+      - quality metrics may drop by at most `quality_tolerance` (absolute)
+      - p99 may grow / qps may shrink by at most `latency_tolerance` (relative)
+    """
+    failures = []
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for m in QUALITY_METRICS:
+            if base[m] - cur[m] > quality_tolerance:
+                failures.append(f"{name}.{m}: {cur[m]:.3f} < baseline {base[m]:.3f} - {quality_tolerance}")
+        if cur["p99_ms"] > base["p99_ms"] * (1 + latency_tolerance):
+            failures.append(f"{name}.p99_ms: {cur['p99_ms']:.1f} > baseline {base['p99_ms']:.1f} "
+                            f"* (1 + {latency_tolerance})")
+        if cur["qps"] < base["qps"] * (1 - latency_tolerance):
+            failures.append(f"{name}.qps: {cur['qps']:.1f} < baseline {base['qps']:.1f} * (1 - {latency_tolerance})")
+    return failures
+
+
+def print_report(report: Dict[str, Dict[str, float]], k: int):
+    print(f"{'strategy':>8} {'recall@' + str(k):>9} {'MRR':>6} {'nDCG@' + str(k):>7} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'qps':>7}")
+    for name, r in report.items():
+        print(f"{name:>8} {r['recall']:>9.3f} {r['mrr']:>6.3f} {r['ndcg']:>7.3f} "
+              f"{r['p50_ms']:>8.1f} {r['p90_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['qps']:>7.1f}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Retrieval quality/latency regression suite")
+    ap.add_argument("--dataset", required=True, help="labeled JSONL: question, source, pages")
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--expr", default="page_number >= 1")
+    ap.add_argument("--strategies", default="dense,bm25,hybrid")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    ap.add_argument("--quality-tolerance", type=float, default=0.02, help="max absolute drop of recall/MRR/nDCG")
+    ap.add_argument("--latency-tolerance", type=float, default=0.25, help="max relative p99 growth / qps drop")
+    ap.add_argument("--report", help="optional path to write the JSON report")
+    args = ap.parse_args()
+
+    dataset = load_dataset(args.dataset)
+    if not dataset:
+        log.error(f"Empty dataset: {args.dataset}")
+        return 1
+
+    report = {}
+    for name in [s.strip() for s in args.strategies.split(",") if s.strip()]:
+        log.info(f"Evaluating '{name}' on {len(dataset)} questions (k={args.k})")
+        report[name] = evaluate_strategy(name, dataset, args.k, args.expr)
+    print_report(report, args.k)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        log.info(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        log.warning(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    failures = compare(report, baseline, args.quality_tolerance, args.latency_tolerance)
+    if failures:
+        print("\n❌ Regressions:")
+        for msg in failures:
+            print(" -", msg)
+        return 1
+    print("\n✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
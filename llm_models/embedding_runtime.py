@@ -0,0 +1,237 @@
+"""
+Device-aware runtime for the bge embedding model.
+
+On a GPU box the model runs as before (sentence-transformers through
+HuggingFaceEmbeddings on CUDA). Without a GPU it runs through an optimized CPU
+backend instead of failing at import:
+    "onnx"  ONNX Runtime (optimum export, cached under datas/onnx/), graph-optimized
+    "int8"  PyTorch dynamic int8 quantization of the Linear layers
+Both use bge's CLS pooling + L2 normalization, tuned intra-op threads and
+length-bucketed batches (texts sorted by length, padded per batch only).
+
+Select with EMBEDDING_DEVICE (auto | cuda | mps | cpu) and EMBEDDING_BACKEND
+(auto | hf | onnx | int8). Check a CPU backend against the reference model with:
+    python -m My_RAG_Project.llm_models.embedding_runtime --backend int8
+"""
+import argparse
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from My_RAG_Project.utils.env_utils import (
+    root_dir,
+    EMBEDDING_DEVICE,
+    EMBEDDING_BACKEND,
+    EMBEDDING_THREADS,
+    EMBEDDING_SOCKET,
+)
+from My_RAG_Project.utils.log_utils import log
+
+BGE_MODEL_NAME = "BAAI/bge-small-zh-v1.5"
+BGE_MAX_LENGTH = 512
+ONNX_CACHE_DIR = os.path.join(root_dir, "datas", "onnx")
+
+
+def detect_device(preferred: str = EMBEDDING_DEVICE) -> str:
+    """Return "cuda" | "mps" | "cpu" (an explicit EMBEDDING_DEVICE wins over detection)."""
+    if preferred and preferred != "auto":
+        return preferred
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    if torch.cuda.is_available():
+        return "cuda"
+    if getattr(torch.backends, "mps", None) is not None and torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def default_threads() -> int:
+    """Physical-core-ish default: leave one core for the event loop / Milvus client."""
+    if EMBEDDING_THREADS > 0:
+        return EMBEDDING_THREADS
+    return max((os.cpu_count() or 2) - 1, 1)
+
+
+class CPUEmbeddings(Embeddings):
+    """
+    LangChain Embeddings for bge on CPU via ONNX Runtime or int8 PyTorch.
+    Output matches HuggingFaceEmbeddings(normalize_embeddings=True) up to quantization error.
+    """
+
+    def __init__(self, model_name: str = BGE_MODEL_NAME, backend: str = "onnx", batch_size: int = 32,
+                 num_threads: Optional[int] = None, max_length: int = BGE_MAX_LENGTH):
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.num_threads = num_threads or default_threads()
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.backend = backend
+        if backend == "onnx":
+            try:
+                self._load_onnx()
+            except ImportError:
+                log.warning("optimum[onnxruntime] is not installed; falling back to int8 PyTorch")
+                self.backend = "int8"
+        if self.backend == "int8":
+            self._load_int8()
+        log.info(f"🧮 bge on CPU: backend={self.backend}, threads={self.num_threads}, batch={batch_size}")
+
+    def _load_onnx(self):
+        import onnxruntime as ort
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = self.num_threads
+        so.inter_op_num_threads = 1
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        local = os.path.join(ONNX_CACHE_DIR, self.model_name.replace("/", "__"))
+        if os.path.isdir(local):
+            self.model = ORTModelForFeatureExtraction.from_pretrained(local, session_options=so)
+        else:
+            # one-off export; later processes load the cached graph
+            self.model = ORTModelForFeatureExtraction.from_pretrained(self.model_name, export=True, session_options=so)
+            self.model.save_pretrained(local)
+            self.tokenizer.save_pretrained(local)
+        self._run = self._run_onnx
+
+    def _load_int8(self):
+        import torch
+        from transformers import AutoModel
+
+        torch.set_num_threads(self.num_threads)
+        model = AutoModel.from_pretrained(self.model_name).eval()
+        self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self._run = self._run_torch
+
+    def _run_onnx(self, inputs: Dict[str, Any]) -> np.ndarray:
+        out = self.model(**inputs)
+        return np.asarray(out.last_hidden_state[:, 0])
+
+    def _run_torch(self, inputs: Dict[str, Any]) -> np.ndarray:
+        import torch
+
+        with torch.inference_mode():
+            out = self.model(**{k: torch.as_tensor(v) for k, v in inputs.items()})
+        return out.last_hidden_state[:, 0].numpy()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Length bucketing: similar lengths share a batch, so padding stays small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out: List[Optional[np.ndarray]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            inputs = self.tokenizer([texts[i] for i in idx], padding=True, truncation=True,
+                                    max_length=self.max_length, return_tensors="np")
+            cls = self._run(dict(inputs)).astype(np.float32)
+            cls /= np.maximum(np.linalg.norm(cls, axis=1, keepdims=True), 1e-12)
+            for i, vec in zip(idx, cls):
+                out[i] = vec
+        return np.stack(out)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+
+def reference_bge_embedding(device: str = "cpu") -> Embeddings:
+    """The original sentence-transformers model (reference output for parity checks)."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(
+        model_name=BGE_MODEL_NAME,
+        model_kwargs={"device": device},
+        encode_kwargs={"normalize_embeddings": True},
+    )
+
+
+def build_bge_embedding(device: Optional[str] = None, backend: str = EMBEDDING_BACKEND,
+                        use_server: bool = True) -> Embeddings:
+    """
+    Pick the bge backend for this machine:
+      - embedding server reachable on EMBEDDING_SOCKET (and use_server): a thin client, no local model
+      - accelerator (cuda/mps) or backend="hf": the reference HuggingFaceEmbeddings
+      - CPU: CPUEmbeddings with backend "onnx" (default for "auto") or "int8"
+    """
+    if use_server and EMBEDDING_SOCKET and os.path.exists(EMBEDDING_SOCKET):
+        from My_RAG_Project.llm_models.embedding_server import EmbeddingClient
+
+        client = EmbeddingClient(EMBEDDING_SOCKET)
+        if client.available():
+            log.info(f"🧮 bge via embedding server at {EMBEDDING_SOCKET}")
+            return client
+        log.warning(f"Embedding server socket {EMBEDDING_SOCKET} is stale; loading a local model")
+
+    device = device or detect_device()
+    if backend == "hf" or (backend == "auto" and device != "cpu"):
+        log.info(f"🧮 bge via sentence-transformers on {device}")
+        return reference_bge_embedding(device)
+    return CPUEmbeddings(backend="onnx" if backend == "auto" else backend)
+
+
+def parity_check(candidate: Embeddings, reference: Embeddings, texts: List[str],
+                 min_cosine: float = 0.99) -> Dict[str, float]:
+    """
+    Compare `candidate` vectors with `reference` vectors on `texts` (both L2-normalized).
+    Raises AssertionError if any text's cosine similarity is below `min_cosine`.
+    """
+    t0 = time.perf_counter()
+    cand = np.asarray(candidate.embed_documents(texts), dtype=np.float32)
+    t_cand = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ref = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    t_ref = time.perf_counter() - t0
+
+    cos = (cand * ref).sum(axis=1)
+    stats = {
+        "min_cosine": float(cos.min()),
+        "mean_cosine": float(cos.mean()),
+        "candidate_s": t_cand,
+        "reference_s": t_ref,
+        "speedup": t_ref / t_cand if t_cand > 0 else 0.0,
+    }
+    if stats["min_cosine"] < min_cosine:
+        raise AssertionError(f"Embedding parity failed: min cosine {stats['min_cosine']:.4f} < {min_cosine}")
+    return stats
+
+
+SAMPLE_TEXTS = [
+    "万达智慧商业平台的核心功能有哪些？",
+    "增值服务包括广告投放、会员营销和数据分析。",
+    "The platform exposes APIs for tenants and property managers.",
+    "商户可以通过小程序查看客流、销售和租金账单等经营数据，平台按月生成经营分析报告，" * 8,
+    "短句",
+]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Parity + speed check of a CPU embedding backend vs. the reference")
+    ap.add_argument("--backend", default="onnx", choices=["onnx", "int8"])
+    ap.add_argument("--min-cosine", type=float, default=0.99)
+    ap.add_argument("--texts", help="optional file with one text per line")
+    args = ap.parse_args()
+
+    texts = SAMPLE_TEXTS
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    stats = parity_check(CPUEmbeddings(backend=args.backend), reference_bge_embedding("cpu"),
+                         texts, args.min_cosine)
+    print(f"✅ {args.backend}: min cos={stats['min_cosine']:.5f}, mean cos={stats['mean_cosine']:.5f}, "
+          f"{stats['candidate_s']:.2f}s vs reference {stats['reference_s']:.2f}s ({stats['speedup']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Shared bge embedding service over a Unix socket with dynamic micro-batching.
+
+One server process holds the only model copy. Connection threads hand their texts to
+a MicroBatcher, which gathers concurrent requests until `max_batch` texts or
+`max_wait_ms` after the first one, runs a single forward pass and splits the vectors
+back to the callers. EmbeddingClient is a thin LangChain `Embeddings` for it;
+build_bge_embedding() returns one automatically when the server is reachable.
+
+Wire format (both directions): 4-byte big-endian length + payload.
+    request   JSON {"texts": [...]}
+    response  JSON {"n": int, "dim": int} (or {"error": str}), then float32 [n, dim] bytes
+
+Usage:
+    python -m My_RAG_Project.llm_models.embedding_server
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from My_RAG_Project.utils.env_utils import EMBEDDING_SOCKET, EMBEDDING_BATCH_MAX, EMBEDDING_BATCH_WAIT_MS
+from My_RAG_Project.utils.log_utils import log
+
+_LEN = struct.Struct(">I")
+
+
+# ---------- Framing ----------
+
+def _recv_exact(sock: socket.socket, n: int) -> Optional[bytes]:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def recv_frame(sock: socket.socket) -> Optional[bytes]:
+    """Read one length-prefixed frame (None on a clean EOF)."""
+    head = _recv_exact(sock, _LEN.size)
+    if head is None:
+        return None
+    body = _recv_exact(sock, _LEN.unpack(head)[0])
+    if body is None:
+        raise ConnectionError("Connection closed mid-frame")
+    return body
+
+
+def send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(_LEN.pack(len(payload)) + payload)
+
+
+# ---------- Server ----------
+
+class MicroBatcher:
+    """Collects concurrent embed requests into batches for one worker thread."""
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]],
+                 max_batch: int = EMBEDDING_BATCH_MAX, max_wait_ms: float = EMBEDDING_BATCH_WAIT_MS):
+        self.embed_fn = embed_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self.batches = 0
+        self.texts = 0
+        threading.Thread(target=self._loop, name="embed-batcher", daemon=True).start()
+
+    def submit(self, texts: List[str]) -> Future:
+        fut: Future = Future()
+        self._queue.put((texts, fut))
+        return fut
+
+    def _gather(self) -> List[Tuple[List[str], Future]]:
+        pending = [self._queue.get()]
+        n = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while n < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            n += len(item[0])
+        return pending
+
+    def _loop(self):
+        while True:
+            pending = self._gather()
+            texts = [t for req, _ in pending for t in req]
+            try:
+                vectors = np.asarray(self.embed_fn(texts), dtype=np.float32)
+            except Exception as e:
+                log.error(f"Embedding batch of {len(texts)} failed: {e}")
+                for _, fut in pending:
+                    fut.set_exception(e)
+                continue
+
+            offset = 0
+            for req, fut in pending:
+                fut.set_result(vectors[offset:offset + len(req)])
+                offset += len(req)
+            self.batches += 1
+            self.texts += len(texts)
+            if self.batches % 1000 == 0:
+                log.info(f"📈 Embedding server: {self.batches} batches, avg {self.texts / self.batches:.1f} texts/batch")
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        batcher: MicroBatcher = self.server.batcher
+        while True:
+            try:
+                frame = recv_frame(self.request)
+            except ConnectionError:
+                return
+            if frame is None:
+                return
+            try:
+                texts = json.loads(frame)["texts"]
+                vectors = batcher.submit(texts).result() if texts else np.zeros((0, 0), dtype=np.float32)
+                header = {"n": int(vectors.shape[0]), "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0}
+                send_frame(self.request, json.dumps(header).encode("utf-8"))
+                send_frame(self.request, vectors.tobytes())
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            except Exception as e:
+                send_frame(self.request, json.dumps({"error": str(e)}).encode("utf-8"))
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 256  # many workers connect at once; the default backlog of 5 refuses them
+
+    def __init__(self, socket_path: str, batcher: MicroBatcher):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # stale socket from a previous run
+        os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+        super().__init__(socket_path, _Handler)
+        self.batcher = batcher
+
+
+def serve(socket_path: str = EMBEDDING_SOCKET, max_batch: int = EMBEDDING_BATCH_MAX,
+          max_wait_ms: float = EMBEDDING_BATCH_WAIT_MS):
+    from My_RAG_Project.llm_models.embedding_runtime import build_bge_embedding
+
+    model = build_bge_embedding(use_server=False)
+    batcher = MicroBatcher(model.embed_documents, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    with EmbeddingServer(socket_path, batcher) as server:
+        log.info(f"🚀 Embedding server on {socket_path} (max_batch={max_batch}, max_wait={max_wait_ms}ms)")
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_path)
+
+
+# ---------- Client ----------
+
+class EmbeddingClient(Embeddings):
+    """LangChain Embeddings backed by the embedding server (one persistent connection per thread)."""
+
+    def __init__(self, socket_path: str = EMBEDDING_SOCKET, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        self._close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def available(self) -> bool:
+        """True if the server accepts connections (the socket file may be stale)."""
+        try:
+            self._connect()
+            return True
+        except OSError:
+            return False
+
+    def _exchange(self, payload: bytes) -> Tuple[dict, Optional[bytes]]:
+        """
+        One request/response on this thread's connection. On any failure the connection
+        is dropped: it may hold the unread rest of a response, which the next call
+        would take for its header.
+        """
+        try:
+            sock = getattr(self._local, "sock", None) or self._connect()
+            send_frame(sock, payload)
+            header = recv_frame(sock)
+            if header is None:
+                raise ConnectionError("Embedding server closed the connection")
+            meta = json.loads(header)
+            data = None
+            if "error" not in meta:
+                data = recv_frame(sock)
+                if data is None:
+                    raise ConnectionError("Embedding server closed the connection mid-response")
+        except (OSError, ValueError) as e:
+            self._close()
+            raise ConnectionError(f"Embedding server request failed: {e}") from e
+        return meta, data
+
+    def _request(self, texts: List[str]) -> np.ndarray:
+        payload = json.dumps({"texts": texts}, ensure_ascii=False).encode("utf-8")
+        reused = getattr(self._local, "sock", None) is not None
+        try:
+            meta, data = self._exchange(payload)
+        except ConnectionError:
+            if not reused:
+                raise
+            # server restarted since the last call: reconnect once
+            meta, data = self._exchange(payload)
+        if "error" in meta:
+            raise RuntimeError(f"Embedding server error: {meta['error']}")
+        return np.frombuffer(data, dtype=np.float32).reshape(meta["n"], meta["dim"])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._request(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._request([text])[0].tolist()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Shared bge embedding server (Unix socket, micro-batching)")
+    ap.add_argument("--socket", default=EMBEDDING_SOCKET)
+    ap.add_argument("--max-batch", type=int, default=EMBEDDING_BATCH_MAX)
+    ap.add_argument("--max-wait-ms", type=float, default=EMBEDDING_BATCH_WAIT_MS)
+    args = ap.parse_args()
+    serve(args.socket, args.max_batch, args.max_wait_ms)
+
+
+if __name__ == "__main__":
+    main()
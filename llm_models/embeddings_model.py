@@ -1,29 +1,58 @@
-from langchain_openai import OpenAIEmbeddings
-from langchain_huggingface import HuggingFaceEmbeddings
+"""
+Model factories. Nothing is loaded at import time: each getter builds its model on
+first use and caches it for the process (see utils/warmup.py to pay that cost upfront).
+The old module attributes (`bge_embedding`, `openai_embedding`, `llm`) still resolve,
+lazily, through the same factories.
+"""
+from functools import lru_cache
+
 from My_RAG_Project.utils.env_utils import OPENAI_API_KEY
-from langchain_openai import ChatOpenAI
 
-# Chinese embedding model
-bge_model_name = "BAAI/bge-small-zh-v1.5"
-bge_model_kwargs = {"device": "cuda"}
-bge_encode_kwargs = {"normalize_embeddings": True}
 
-bge_embedding = HuggingFaceEmbeddings(
-    model_name=bge_model_name,
-    model_kwargs=bge_model_kwargs,
-    encode_kwargs=bge_encode_kwargs
-)
+@lru_cache(maxsize=1)
+def get_bge_embedding():
+    """Chinese embedding model (BAAI/bge-small-zh-v1.5): embedding server, CUDA or optimized CPU backend."""
+    from My_RAG_Project.llm_models.embedding_runtime import build_bge_embedding
+
+    return build_bge_embedding()
+
+
+@lru_cache(maxsize=1)
+def get_openai_embedding():
+    """English embedding model."""
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(
+        api_key=OPENAI_API_KEY,
+        model="text-embedding-ada-002"
+    )
+
+
+@lru_cache(maxsize=1)
+def get_llm():
+    """Shared chat model; temperature 0, so responses go through the persistent LLM cache."""
+    from langchain_openai import ChatOpenAI
+    from My_RAG_Project.llm_models.llm_cache import get_llm_cache
+    from My_RAG_Project.utils.tracing import tracing_callback
+
+    return ChatOpenAI(
+        temperature=0,
+        model="gpt-4o-mini",
+        api_key=OPENAI_API_KEY,
+        cache=get_llm_cache(),
+        callbacks=[tracing_callback()],  # "llm" spans with token counts (utils/tracing.py)
+    )
 
 
-# English embedding model
-openai_embedding = OpenAIEmbeddings(
-    api_key=OPENAI_API_KEY,
-    model="text-embedding-ada-002"
-)
+_LAZY_ATTRS = {
+    "bge_embedding": get_bge_embedding,
+    "openai_embedding": get_openai_embedding,
+    "llm": get_llm,
+}
 
 
-llm = ChatOpenAI(
-    temperature=0,
-    model="gpt-4o-mini",
-    api_key=OPENAI_API_KEY
-)
+def __getattr__(name):
+    # Backward compatible `from embeddings_model import llm` (builds on first access)
+    if name in _LAZY_ATTRS:
+        return _LAZY_ATTRS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,221 @@
+"""
+Persistent exact-match cache for LLM responses (SQLite).
+
+The graders, query rewriters and generators all run ChatOpenAI at temperature 0, so the
+same rendered prompt always gets the same answer; repeated questions and graph retries
+re-send identical prompts. get_llm() attaches this cache to the shared chat model,
+so every chain in adaptive_rag and corrective_rag goes through it.
+
+Key: sha256 of LangChain's llm_string (model, temperature, bound tools / structured
+output schema, ...) plus the serialized prompt messages.
+Eviction: entries expire after LLM_CACHE_TTL_SECONDS; once the file holds more than
+LLM_CACHE_MAX_MB of payload, the least recently used entries are deleted.
+Stats: hits / misses per chain, where the chain name comes from the node decorator
+`@llm_cache_scope("grade_answer")` (calls outside a scope count as "default").
+
+Usage:
+    python -m My_RAG_Project.llm_models.llm_cache
+    python -m My_RAG_Project.llm_models.llm_cache --purge-expired
+    python -m My_RAG_Project.llm_models.llm_cache --clear
+"""
+import argparse
+import contextvars
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from My_RAG_Project.utils.env_utils import LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_MB
+from My_RAG_Project.utils.log_utils import log
+from My_RAG_Project.utils import tracing
+
+_SCOPE: contextvars.ContextVar[str] = contextvars.ContextVar("llm_cache_scope", default="default")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key         TEXT PRIMARY KEY,
+    value       TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    created     REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access);
+"""
+
+
+def llm_cache_scope(name: str) -> Callable:
+    """Decorator for graph nodes / chains (sync or async): LLM cache lookups inside are counted under `name`."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                token = _SCOPE.set(name)
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    _SCOPE.reset(token)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            token = _SCOPE.set(name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _SCOPE.reset(token)
+        return wrapper
+    return decorator
+
+
+def current_scope() -> str:
+    """Name of the chain (llm_cache_scope) the current LLM call belongs to."""
+    return _SCOPE.get()
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class SQLiteLLMCache(BaseCache):
+    """LangChain BaseCache with TTL, size-bounded LRU eviction and per-chain hit stats."""
+
+    # Check the total size only every N writes (SUM over the table is not free)
+    _EVICT_CHECK_EVERY = 50
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+                 max_mb: float = LLM_CACHE_MAX_MB):
+        self.path = path
+        self.ttl = ttl_seconds
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    # ---------- BaseCache ----------
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            hit = row is not None and (self.ttl <= 0 or now - row[1] <= self.ttl)
+            if hit:
+                self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            elif row is not None:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._stats[_SCOPE.get()]["hits" if hit else "misses"] += 1
+        tracing.count("llm_cache_hits" if hit else "llm_cache_misses", scope=_SCOPE.get())
+        if not hit:
+            return None
+        try:
+            return [loads(g) for g in json.loads(row[0])]
+        except Exception as e:
+            # written by an incompatible langchain version: treat as a miss
+            log.warning(f"Dropping unreadable LLM cache entry: {e}")
+            with self._lock:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        value = json.dumps([dumps(g) for g in return_val])
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (cache_key(prompt, llm_string), value, len(value), now, now),
+            )
+            self._writes += 1
+            if self._writes % self._EVICT_CHECK_EVERY == 0:
+                self._evict()
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.execute("VACUUM")
+
+    # ---------- Maintenance ----------
+
+    def _evict(self):
+        """Drop expired rows, then least recently used rows until under 90% of max size (lock held)."""
+        if self.ttl > 0:
+            self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access"):
+            if total - freed <= target:
+                break
+            stale.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", stale)
+        log.info(f"🧹 LLM cache evicted {len(stale)} entries ({freed / 1024 / 1024:.1f} MB)")
+
+    def purge_expired(self) -> int:
+        if self.ttl <= 0:
+            return 0
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl,))
+            return cur.rowcount
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        return {"path": self.path, "entries": entries, "mb": total / 1024 / 1024,
+                "max_mb": self.max_bytes / 1024 / 1024, "ttl_seconds": self.ttl}
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-chain hits, misses and hit rate since this process started."""
+        with self._lock:
+            out = {}
+            for scope, s in self._stats.items():
+                total = s["hits"] + s["misses"]
+                out[scope] = {**s, "hit_rate": s["hits"] / total if total else 0.0}
+            return out
+
+
+@functools.lru_cache(maxsize=1)
+def get_llm_cache() -> Optional[SQLiteLLMCache]:
+    """The process-wide cache, or None when disabled (LLM_CACHE_MAX_MB <= 0)."""
+    if LLM_CACHE_MAX_MB <= 0:
+        return None
+    return SQLiteLLMCache()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect / maintain the persistent LLM response cache")
+    ap.add_argument("--purge-expired", action="store_true")
+    ap.add_argument("--clear", action="store_true")
+    args = ap.parse_args()
+
+    cache = SQLiteLLMCache()
+    if args.clear:
+        cache.clear()
+        print("🧹 LLM cache cleared")
+    if args.purge_expired:
+        print(f"🧹 Removed {cache.purge_expired()} expired entries")
+    info = cache.info()
+    print(f"{info['path']}: {info['entries']} entries, {info['mb']:.1f}/{info['max_mb']:.0f} MB, "
+          f"ttl={info['ttl_seconds']:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+Shared fixtures. Run from the directory that contains the project package:
+    python -m pytest My_RAG_Project/tests
+"""
+import hashlib
+
+import numpy as np
+import pytest
+
+from My_RAG_Project.tools import context_packer
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    """Deterministic unit vectors instead of bge (no model download; stable across PYTHONHASHSEED)."""
+    def embed(texts):
+        seeds = [int.from_bytes(hashlib.md5(t.encode("utf-8")).digest()[:8], "little") for t in texts]
+        vecs = np.stack([np.random.default_rng(seed).normal(size=8) for seed in seeds])
+        return (vecs / np.linalg.norm(vecs, axis=1, keepdims=True)).astype(np.float32)
+
+    monkeypatch.setattr(context_packer, "embed_cached", embed)
+    return embed
@@ -0,0 +1,124 @@
+"""
+GraphBackend behind the HTTP service (api/server.py, api/backends.py).
+
+Runs the real async adaptive graph; only the edges leave the process-free path:
+the chat model is a canned fake, Milvus search returns a fixed hit list and the
+context packer gets fake embeddings (conftest.py). Covers the astream_answer wiring,
+deadline propagation (504) and error mapping (500).
+"""
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import MemorySaver
+
+from My_RAG_Project.adaptive_rag import generate_node2, grade_answer_chain, grade_hallucinations_chain, graph_2
+from My_RAG_Project.adaptive_rag import retriever_node, transform_query_node
+from My_RAG_Project.adaptive_rag.grade_answer_chain import AnswerQuality
+from My_RAG_Project.adaptive_rag.grade_hallucinations_chain import HalluCheck
+from My_RAG_Project.api.backends import GraphBackend
+from My_RAG_Project.api.server import Dispatcher, RAGHTTPServer
+from My_RAG_Project.tools.fusion import PayloadStore, ResultSet
+
+ANSWER = "根据文档 第一页 给出 答案"
+QUESTION = "文档里怎么说明安装步骤"
+
+
+class FakeChatModel(GenericFakeChatModel):
+    """Streams ANSWER word by word; structured outputs are fixed 'good answer' verdicts."""
+
+    def with_structured_output(self, schema, **kwargs):
+        verdicts = {AnswerQuality: AnswerQuality(relevance=0.9, uses_citations=True, sufficient=True),
+                    HalluCheck: HalluCheck(hallucination=False)}
+        return RunnableLambda(lambda _prompt: verdicts[schema])
+
+
+def _hits(*_args, **_kwargs) -> ResultSet:
+    hits = [{"id": i, "distance": 0.9 - 0.1 * i, "text": f"安装步骤第{i}条。", "page_number": i + 1,
+             "source": "manual.pdf"} for i in range(3)]
+    return ResultSet.from_milvus([hits], PayloadStore(), fields=("text", "page_number", "source"))
+
+
+@pytest.fixture
+def search(monkeypatch):
+    """Swap the Milvus search used by the retriever; tests may replace it again."""
+    monkeypatch.setattr(retriever_node, "search_resultset", _hits)
+    return lambda fn: monkeypatch.setattr(retriever_node, "search_resultset", fn)
+
+
+@pytest.fixture(autouse=True)
+def offline_graph(monkeypatch, fake_embeddings):
+    """Fake LLM and embeddings, in-memory checkpoints, no answer cache; a fresh async graph per test."""
+    llm = FakeChatModel(messages=itertools.repeat(AIMessage(content=ANSWER)))
+    for module in (generate_node2, grade_answer_chain, grade_hallucinations_chain, transform_query_node):
+        monkeypatch.setattr(module, "get_llm", lambda: llm)
+    monkeypatch.setattr(graph_2, "get_checkpointer", lambda name: MemorySaver())
+    monkeypatch.setattr(graph_2, "get_answer_cache", lambda: None)
+    graph_2.get_async_graph.cache_clear()
+    yield
+    graph_2.get_async_graph.cache_clear()
+
+
+@pytest.fixture
+def post():
+    """POST to a live RAGHTTPServer backed by GraphBackend; returns (status, headers, body)."""
+    server = RAGHTTPServer(("127.0.0.1", 0), Dispatcher(GraphBackend(), workers=2, queue_size=4),
+                           default_deadline=30)
+    server.ready = True  # skip warm_up(): it loads the real models
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    def _post(body, route="adaptive", headers=None):
+        req = urllib.request.Request(f"http://127.0.0.1:{port}/v1/{route}", data=json.dumps(body).encode("utf-8"),
+                                     headers=headers or {})
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                return resp.status, resp.headers, json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, json.loads(e.read())
+
+    yield _post
+    server.shutdown()
+    server.server_close()
+
+
+def test_adaptive_answer_through_graph_backend(search, post):
+    status, headers, body = post({"question": QUESTION}, headers={"X-Request-ID": "req-1"})
+
+    assert status == 200
+    assert headers["X-Request-ID"] == "req-1"
+    assert body["request_id"] == "req-1"
+    assert body["answer"] == ANSWER
+    assert [c["page_number"] for c in body["citations"]] == [1, 2, 3]
+    assert body["quality"]["answer_sufficient"] is True
+    assert body["quality"]["hallucination"] is False
+
+
+def test_deadline_inside_the_graph_maps_to_504(search, post):
+    def slow_search(*args, **kwargs):
+        time.sleep(1.0)
+        return _hits()
+
+    search(slow_search)
+    status, _, body = post({"question": QUESTION, "deadline_ms": 200})
+
+    assert status == 504
+    assert "deadline" in body["error"]
+
+
+def test_node_failure_maps_to_500(search, post):
+    def broken_search(*args, **kwargs):
+        raise ConnectionError("milvus unavailable")
+
+    search(broken_search)
+    status, _, body = post({"question": QUESTION})
+
+    assert status == 500
+    assert "milvus unavailable" in body["error"]
@@ -0,0 +1,36 @@
+"""Context packing (tools/context_packer.py)."""
+import pytest
+from langchain_core.documents import Document
+
+from My_RAG_Project.tools.context_packer import count_tokens, pack_documents, truncate_tokens
+
+pytestmark = pytest.mark.usefixtures("fake_embeddings")
+
+
+def test_unpunctuated_top_document_is_truncated_not_dropped():
+    table = " ".join(f"cell{i} value{i}" for i in range(3000))  # one huge "sentence"
+    top = Document(page_content=table, metadata={"_score": 0.9, "page_number": 1})
+    other = Document(page_content="A short supporting passage.", metadata={"_score": 0.5, "page_number": 2})
+
+    context = pack_documents([other, top], "cell42", budget=400, doc_budget=200, header=None)
+
+    first, second = context.split("\n\n---\n\n")
+    assert first.startswith("cell0 value0")
+    assert count_tokens(first) <= 200
+    assert second == "A short supporting passage."
+
+
+def test_sentences_that_fit_are_kept_whole():
+    text = "First sentence here. Second sentence here. Third sentence here."
+    doc = Document(page_content=text, metadata={"_score": 1.0})
+
+    context = pack_documents([doc], "", budget=1000, doc_budget=1000, header=None)
+
+    assert context == text
+
+
+def test_truncate_tokens_respects_budget():
+    text = "word " * 500
+    assert count_tokens(truncate_tokens(text, 50)) <= 50
+    assert truncate_tokens(text, 0) == ""
+    assert truncate_tokens("short", 50) == "short"
@@ -0,0 +1,221 @@
+"""
+Token-budgeted context packing for generation and grading prompts.
+
+Retrieved chunks go into prompts whole (k=5 chunks of up to ~10k characters, twice per
+request counting the hallucination check). pack_documents() builds the context instead:
+    1. documents in score order (metadata["_score"]), duplicates dropped
+    2. each document gets at most `doc_budget` tokens; a longer one is trimmed to the
+       sentences most similar to the query (kept in original order). When even the best
+       sentence is over the budget (unpunctuated PDF / table text), it is cut to size
+       rather than the document being dropped
+    3. documents are added until `budget` tokens (model tokenizer) are used
+Sentences already included from an earlier document are skipped, so overlapping chunks
+do not repeat passages. Sentence embeddings are cached per process, so the generator,
+the graders and retry rounds reuse them; the packing is deterministic, so every node
+that packs the same docs for the same query sees the same context.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from My_RAG_Project.utils.env_utils import CONTEXT_TOKEN_BUDGET, CONTEXT_DOC_TOKEN_BUDGET
+from My_RAG_Project.utils.log_utils import log
+from My_RAG_Project.utils.tracing import traced
+
+LLM_MODEL_NAME = "gpt-4o-mini"
+_SENTENCE_SPLIT = re.compile(r"(?<=[。！？!?；;])|(?<=[.])\s+|\n+")
+# CJK sentences are joined without a space
+_CJK_END = re.compile(r"[\u4e00-\u9fff\u3000-\u303f\uff00-\uffef]$")
+_EMBED_CACHE_SIZE = 20000
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+    except ImportError:
+        log.warning("tiktoken is not installed; estimating tokens from character counts")
+        return None
+    try:
+        return tiktoken.encoding_for_model(LLM_MODEL_NAME)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _encoder()
+    if enc is None:
+        # ~1 token per CJK character, ~4 characters per token otherwise
+        cjk = sum(1 for ch in text if "一" <= ch <= "鿿")
+        return cjk + (len(text) - cjk) // 4 + 1
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of `text` that fits in `max_tokens` tokens."""
+    if max_tokens <= 0:
+        return ""
+    enc = _encoder()
+    if enc is None:
+        lo, hi = 0, len(text)  # binary search over the character-based estimate
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if count_tokens(text[:mid]) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo]
+    ids = enc.encode(text, disallowed_special=())
+    n = max_tokens
+    while n > 0:
+        # a cut inside a multi-byte character decodes to U+FFFD; drop it
+        out = enc.decode(ids[:n]).rstrip("\ufffd")
+        if count_tokens(out) <= max_tokens:
+            return out
+        n -= 1
+    return ""
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT.split(text) if s and s.strip()]
+
+
+def _fingerprint(text: str) -> str:
+    return hashlib.md5("".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class _EmbeddingCache:
+    """Process-wide LRU of normalized bge vectors keyed by text fingerprint."""
+
+    def __init__(self, size: int = _EMBED_CACHE_SIZE):
+        self.size = size
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()  # the parallel graders pack concurrently
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        from My_RAG_Project.llm_models.embeddings_model import get_bge_embedding
+
+        keys = [_fingerprint(t) for t in texts]
+        with self._lock:
+            found = {k: self._vectors[k] for k in keys if k in self._vectors}
+        missing = list(dict.fromkeys(k for k in keys if k not in found))
+        if missing:
+            by_key = {k: t for k, t in zip(keys, texts)}
+            vecs = np.asarray(get_bge_embedding().embed_documents([by_key[k] for k in missing]), dtype=np.float32)
+            vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+            found.update(zip(missing, vecs))
+        with self._lock:
+            for k in keys:
+                self._vectors[k] = found[k]
+                self._vectors.move_to_end(k)
+            while len(self._vectors) > self.size:
+                self._vectors.popitem(last=False)
+        return np.stack([found[k] for k in keys])
+
+
+_embeddings = _EmbeddingCache()
+
+
+@traced("embed_sentences", "embedding")
+def embed_cached(texts: Sequence[str]) -> np.ndarray:
+    """Normalized bge vectors for `texts` [n, dim], served from the shared sentence cache."""
+    return _embeddings.embed(texts)
+
+
+def _trim_to_query(sentences: List[str], tokens: List[int], query: str, budget: int) -> List[str]:
+    """
+    The sentences most similar to `query` that fit in `budget` tokens (original order).
+    If the best-ranked sentence alone exceeds the budget it is truncated to the budget,
+    so an oversized document is never reduced to nothing.
+    """
+    if not query.strip():
+        ranked = range(len(sentences))
+    else:
+        vecs = embed_cached([query] + sentences)
+        ranked = np.argsort(-(vecs[1:] @ vecs[0]), kind="stable")
+    keep, used = {}, 0
+    for i in ranked:
+        i = int(i)
+        if used + tokens[i] <= budget:
+            keep[i] = sentences[i]
+            used += tokens[i]
+        elif not keep:
+            keep[i] = truncate_tokens(sentences[i], budget)
+            break
+    return [keep[i] for i in sorted(keep) if keep[i]]
+
+
+def default_header(doc: Document) -> str:
+    meta = doc.metadata or {}
+    return (f"[p{meta.get('page_number', '')} | score={meta.get('_score', '')} | "
+            f"kw={meta.get('keywords', '')} | src={meta.get('source', '')}]")
+
+
+def pack_documents(docs: Sequence[Document], query: str, budget: int = CONTEXT_TOKEN_BUDGET,
+                   doc_budget: int = CONTEXT_DOC_TOKEN_BUDGET,
+                   header: Optional[Callable[[Document], str]] = default_header,
+                   separator: str = "\n\n---\n\n") -> str:
+    """Context string for `query` from `docs` within `budget` tokens (see module docstring)."""
+    ordered = sorted(docs, key=lambda d: float((d.metadata or {}).get("_score", 0.0) or 0.0), reverse=True)
+    sep_tokens = count_tokens(separator)
+    seen_docs, seen_sentences = set(), set()
+    parts: List[str] = []
+    used = 0
+    dropped = 0
+
+    for doc in ordered:
+        content = doc.page_content or ""
+        fp = _fingerprint(content)
+        if not content.strip() or fp in seen_docs:
+            dropped += 1
+            continue
+        seen_docs.add(fp)
+
+        head = header(doc) if header else ""
+        head_tokens = (count_tokens(head) if head else 0) + (sep_tokens if parts else 0)
+        room = min(doc_budget, budget - used - head_tokens)
+        if room <= 0:
+            dropped += 1
+            break
+
+        sentences, tokens, local = [], [], set()
+        for s in split_sentences(content):
+            sfp = _fingerprint(s)
+            if sfp in seen_sentences or sfp in local:
+                continue  # passage already in the context (higher-ranked chunk or repeated)
+            local.add(sfp)
+            sentences.append(s)
+            tokens.append(count_tokens(s))
+        if not sentences:
+            dropped += 1
+            continue
+        if sum(tokens) > room:
+            sentences = _trim_to_query(sentences, tokens, query, room)
+            if not sentences:
+                dropped += 1
+                continue
+        seen_sentences.update(_fingerprint(s) for s in sentences)
+
+        body = "".join(s if _CJK_END.search(s) else s + " " for s in sentences).strip()
+        parts.append(f"{head}\n{body}" if head else body)
+        used += head_tokens + count_tokens(body)
+
+    if dropped:
+        log.debug(f"Context packing: {len(parts)} docs in {used}/{budget} tokens, {dropped} dropped")
+    return separator.join(parts)
+
+
+def pack_text(text: str, query: str, budget: int = CONTEXT_TOKEN_BUDGET,
+              doc_budget: int = CONTEXT_DOC_TOKEN_BUDGET, separator: str = "\n\n---\n\n") -> str:
+    """Same packing for an already-joined context (e.g. retriever tool output): passages in given order."""
+    passages = [p for p in re.split(r"\n\s*\n", text or "") if p.strip() not in ("", "---")]
+    docs = [Document(page_content=p, metadata={"_score": -i}) for i, p in enumerate(passages)]
+    return pack_documents(docs, query, budget, doc_budget, header=None, separator=separator)
@@ -0,0 +1,47 @@
+"""
+Concurrent fan-out of per-shard work with a per-shard deadline.
+
+All shards start at once on a shared thread pool; whatever finished within the
+timeout is returned and the stragglers are left out (logged), so one slow or failing
+collection cannot hold back the merged result. A straggler that is already running
+cannot be interrupted from here: callers bound the work itself (search_tools gives
+every Milvus call only the rest of the shard's budget), so it ends soon after.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Callable, Dict, Optional, TypeVar
+
+from My_RAG_Project.utils.env_utils import SEARCH_FANOUT_WORKERS
+from My_RAG_Project.utils.log_utils import log
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=1)
+def _get_pool() -> ThreadPoolExecutor:
+    """Shared pool (threads are reused across requests; Milvus calls release the GIL)."""
+    return ThreadPoolExecutor(max_workers=SEARCH_FANOUT_WORKERS, thread_name_prefix="shard-search")
+
+
+def fan_out(tasks: Dict[str, Callable[[], T]], timeout: Optional[float] = None) -> Dict[str, T]:
+    """
+    Run `tasks` ({shard label: zero-arg callable}) concurrently and return
+    {shard label: result} for the ones that succeeded within `timeout` seconds.
+    """
+    # each shard runs in a copy of the caller's context (request trace, cache scope)
+    futures = {_get_pool().submit(contextvars.copy_context().run, fn): label for label, fn in tasks.items()}
+    done, not_done = wait(futures, timeout=timeout)
+
+    for fut in not_done:
+        fut.cancel()  # only shards still queued behind a busy pool; running ones finish on their own
+        log.warning(f"Shard '{futures[fut]}' timed out after {timeout}s; merging without it")
+
+    results: Dict[str, T] = {}
+    for fut in done:
+        label = futures[fut]
+        try:
+            results[label] = fut.result()
+        except Exception as e:
+            log.error(f"Shard '{label}' failed: {e}")
+    return results
@@ -0,0 +1,270 @@
+"""
+Vectorized fusion of ranked result lists.
+
+A ResultSet holds the hits of a *batch* of queries as padded 2-D arrays:
+    ids    (Q, K) int64    primary keys, -1 = empty slot
+    scores (Q, K) float32  raw scores (higher is better), NaN = empty slot
+    slots  (Q, K) int32    index into a shared PayloadStore, -1 = no payload
+Fusion works on N such sets at once (same Q) with NumPy, so fusing more lists or
+more queries costs array ops instead of per-hit Python dicts.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+class PayloadStore:
+    """Slot-based holder for hit payloads (text/metadata); result sets only keep slot indices."""
+    __slots__ = ("_items",)
+
+    def __init__(self):
+        self._items: List[Dict[str, Any]] = []
+
+    def add(self, payload: Dict[str, Any]) -> int:
+        self._items.append(payload)
+        return len(self._items) - 1
+
+    def get(self, slot: int) -> Dict[str, Any]:
+        return self._items[slot] if slot >= 0 else {}
+
+    def extend(self, other: "PayloadStore") -> int:
+        """Append all payloads of `other`; returns the slot offset they were moved to."""
+        offset = len(self._items)
+        self._items.extend(other._items)
+        return offset
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ResultSet:
+    """Array-backed ranked hits for a batch of queries (see module docstring)."""
+    __slots__ = ("ids", "scores", "slots", "store")
+
+    def __init__(self, ids: np.ndarray, scores: np.ndarray, slots: np.ndarray, store: PayloadStore):
+        self.ids = ids
+        self.scores = scores
+        self.slots = slots
+        self.store = store
+
+    @property
+    def n_queries(self) -> int:
+        return self.ids.shape[0]
+
+    @classmethod
+    def empty(cls, n_queries: int, k: int, store: PayloadStore) -> "ResultSet":
+        return cls(np.full((n_queries, k), -1, dtype=np.int64),
+                   np.full((n_queries, k), np.nan, dtype=np.float32),
+                   np.full((n_queries, k), -1, dtype=np.int32),
+                   store)
+
+    @classmethod
+    def from_milvus(cls, res: Sequence[Sequence[Any]], store: PayloadStore,
+                    fields: Sequence[str] = ()) -> "ResultSet":
+        """Build from a pymilvus search result (one hit list per query); payload = requested fields."""
+        k = max((len(hits) for hits in res), default=0)
+        rs = cls.empty(len(res), k, store)
+        for qi, hits in enumerate(res):
+            for rank, hit in enumerate(hits):
+                rs.ids[qi, rank] = hit["id"]
+                rs.scores[qi, rank] = float(hit["distance"])
+                rs.slots[qi, rank] = store.add({f: hit.get(f) for f in fields})
+        return rs
+
+    @classmethod
+    def concat(cls, sets: Sequence["ResultSet"], store: PayloadStore) -> "ResultSet":
+        """Stack per-query result sets (sharing `store`) into one batch, padding to the widest K."""
+        k = max((s.ids.shape[1] for s in sets), default=0)
+        out = cls.empty(sum(s.n_queries for s in sets), k, store)
+        row = 0
+        for s in sets:
+            n, w = s.ids.shape
+            out.ids[row:row + n, :w] = s.ids
+            out.scores[row:row + n, :w] = s.scores
+            out.slots[row:row + n, :w] = s.slots
+            row += n
+        return out
+
+    def valid(self) -> np.ndarray:
+        return self.ids >= 0
+
+    def rows(self, q: int = 0) -> List[Dict[str, Any]]:
+        """Materialize query `q` as row dicts: payload + 'id' + '_score'."""
+        out = []
+        for pk, score, slot in zip(self.ids[q], self.scores[q], self.slots[q]):
+            if pk < 0:
+                break
+            row = dict(self.store.get(int(slot)))
+            row["id"] = int(pk)
+            row["_score"] = float(score)
+            out.append(row)
+        return out
+
+    def documents(self, q: int = 0) -> List[Tuple[Document, float]]:
+        """Materialize query `q` as (Document, score); metadata carries 'pk' and '_score'."""
+        docs = []
+        for row in self.rows(q):
+            text = row.pop("text", "") or ""
+            row["pk"] = row.pop("id")
+            docs.append((Document(page_content=text, metadata=row), row["_score"]))
+        return docs
+
+
+def rebase(sets: Sequence[ResultSet], store: PayloadStore) -> List[ResultSet]:
+    """
+    Re-point result sets built on separate stores (e.g. one per shard, filled in
+    parallel) at `store`; each distinct source store is appended once.
+    """
+    offsets: Dict[int, int] = {}
+    out = []
+    for rs in sets:
+        if rs.store is store:
+            out.append(rs)
+            continue
+        key = id(rs.store)
+        if key not in offsets:
+            offsets[key] = store.extend(rs.store)
+        slots = np.where(rs.slots >= 0, rs.slots + offsets[key], -1).astype(np.int32)
+        out.append(ResultSet(rs.ids, rs.scores, slots, store))
+    return out
+
+
+# ---------- Per-list contributions ----------
+
+def _rrf_contrib(rs: ResultSet, rrf_k: int) -> np.ndarray:
+    ranks = np.arange(rs.ids.shape[1], dtype=np.float32)
+    return np.broadcast_to(1.0 / (rrf_k + ranks + 1.0), rs.ids.shape)
+
+
+def _minmax_contrib(rs: ResultSet) -> np.ndarray:
+    valid = rs.valid()
+    if valid.size == 0:
+        return np.zeros(rs.ids.shape, dtype=np.float32)
+    s = rs.scores.astype(np.float32)
+    lo = np.where(valid, s, np.inf).min(axis=1, keepdims=True)
+    hi = np.where(valid, s, -np.inf).max(axis=1, keepdims=True)
+    span = hi - lo
+    with np.errstate(invalid="ignore"):
+        norm = np.where(span > 0, (s - lo) / np.where(span > 0, span, 1.0), 1.0)
+    return np.where(valid, norm, 0.0)
+
+
+# ---------- Core fusion ----------
+
+def _fuse(sets: Sequence[ResultSet], contribs: Sequence[np.ndarray], k: int) -> ResultSet:
+    """Sum contributions per (query, id) across lists and keep the top-k per query."""
+    if not sets:
+        raise ValueError("Nothing to fuse")
+    store = sets[0].store
+    if any(s.store is not store or s.n_queries != sets[0].n_queries for s in sets):
+        raise ValueError("All result sets must share one PayloadStore and the same query batch")
+    n_q = sets[0].n_queries
+    out = ResultSet.empty(n_q, k, store)
+    if n_q == 0:
+        return out
+
+    ids = np.concatenate([s.ids for s in sets], axis=1)
+    slots = np.concatenate([s.slots for s in sets], axis=1)
+    score = np.concatenate([np.asarray(c, dtype=np.float64) for c in contribs], axis=1)
+    qidx = np.broadcast_to(np.arange(n_q)[:, None], ids.shape)
+
+    mask = ids >= 0
+    ids, slots, score, qidx = ids[mask], slots[mask], score[mask], qidx[mask]
+    if ids.size == 0:
+        return out
+
+    # group identical (query, id); stable sort keeps the first list's payload slot
+    order = np.lexsort((ids, qidx))
+    ids, slots, score, qidx = ids[order], slots[order], score[order], qidx[order]
+    starts = np.flatnonzero(np.r_[True, (ids[1:] != ids[:-1]) | (qidx[1:] != qidx[:-1])])
+    g_score = np.add.reduceat(score, starts)
+    g_ids, g_slots, g_q = ids[starts], slots[starts], qidx[starts]
+
+    # rank inside each query by fused score
+    order = np.lexsort((-g_score, g_q))
+    g_score, g_ids, g_slots, g_q = g_score[order], g_ids[order], g_slots[order], g_q[order]
+    first = np.r_[0, np.cumsum(np.bincount(g_q, minlength=n_q))[:-1]]
+    rank = np.arange(g_q.size) - first[g_q]
+    keep = rank < k
+
+    out.ids[g_q[keep], rank[keep]] = g_ids[keep]
+    out.scores[g_q[keep], rank[keep]] = g_score[keep]
+    out.slots[g_q[keep], rank[keep]] = g_slots[keep]
+    return out
+
+
+def _weights(sets: Sequence[ResultSet], weights: Optional[Sequence[float]]) -> List[float]:
+    if weights is None:
+        return [1.0] * len(sets)
+    if len(weights) != len(sets):
+        raise ValueError(f"Expected {len(sets)} weights, got {len(weights)}")
+    return list(weights)
+
+
+def rrf_fusion(sets: Sequence[ResultSet], k: int, rrf_k: int = 60,
+               weights: Optional[Sequence[float]] = None) -> ResultSet:
+    """Reciprocal Rank Fusion: sum_i w_i / (rrf_k + rank_i)."""
+    w = _weights(sets, weights)
+    return _fuse(sets, [wi * _rrf_contrib(s, rrf_k) for s, wi in zip(sets, w)], k)
+
+
+def weighted_fusion(sets: Sequence[ResultSet], k: int, weights: Optional[Sequence[float]] = None) -> ResultSet:
+    """Weighted sum of raw scores (only meaningful when the lists share a score scale)."""
+    w = _weights(sets, weights)
+    return _fuse(sets, [wi * np.nan_to_num(s.scores, nan=0.0) for s, wi in zip(sets, w)], k)
+
+
+def minmax_fusion(sets: Sequence[ResultSet], k: int, weights: Optional[Sequence[float]] = None) -> ResultSet:
+    """Per-query min-max normalize each list to [0, 1], then weighted sum."""
+    w = _weights(sets, weights)
+    return _fuse(sets, [wi * _minmax_contrib(s) for s, wi in zip(sets, w)], k)
+
+
+def merge_topk(sets: Sequence[ResultSet], k: int) -> ResultSet:
+    """
+    Concatenate lists that share one score scale (the same leg searched on several
+    collections) and keep the top-k raw scores per query. Ids are not de-duplicated.
+    """
+    if not sets:
+        raise ValueError("Nothing to merge")
+    store = sets[0].store
+    if any(s.store is not store or s.n_queries != sets[0].n_queries for s in sets):
+        raise ValueError("All result sets must share one PayloadStore and the same query batch")
+    if len(sets) == 1 and sets[0].ids.shape[1] <= k:
+        return sets[0]
+
+    ids = np.concatenate([s.ids for s in sets], axis=1)
+    scores = np.concatenate([s.scores for s in sets], axis=1)
+    slots = np.concatenate([s.slots for s in sets], axis=1)
+    order = np.argsort(-np.where(ids >= 0, scores, -np.inf), axis=1, kind="stable")[:, :k]
+    return ResultSet(np.take_along_axis(ids, order, axis=1),
+                     np.take_along_axis(scores, order, axis=1),
+                     np.take_along_axis(slots, order, axis=1),
+                     store)
+
+
+def fuse_batch(rs: ResultSet, k: int, method: str = "rrf", weights: Optional[Sequence[float]] = None,
+               **kwargs) -> ResultSet:
+    """
+    Fuse the Q rows of one batch (sub-queries / paraphrases of one question) into a
+    single ranked list (a 1-query ResultSet): each row is treated as one input list.
+    """
+    rows = [ResultSet(rs.ids[i:i + 1], rs.scores[i:i + 1], rs.slots[i:i + 1], rs.store)
+            for i in range(rs.n_queries)]
+    if len(rows) == 1:
+        return merge_topk(rows, k)
+    return fuse(rows, k, method=method, weights=weights, **kwargs)
+
+
+FUSION_METHODS = {"rrf": rrf_fusion, "weighted": weighted_fusion, "minmax": minmax_fusion}
+
+
+def fuse(sets: Sequence[ResultSet], k: int, method: str = "rrf", **kwargs) -> ResultSet:
+    """Dispatch to a fusion method by name ('rrf' | 'weighted' | 'minmax')."""
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method '{method}'. Available: {sorted(FUSION_METHODS)}")
+    return FUSION_METHODS[method](sets, k, **kwargs)
@@ -1,66 +1,470 @@
-from typing import List, Optional, Dict, Any
-from My_RAG_Project.documents.milvus_db_pdf import MilvusPDFWriter
-from My_RAG_Project.utils.env_utils import COLLECTION_NAME, MILVUS_URI
+import json
+import time
+from functools import lru_cache, partial
+from typing import List, Optional, Dict, Any, Mapping, Sequence, Tuple, Union
+from My_RAG_Project.utils.env_utils import COLLECTION_NAME, MILVUS_URI, PAYLOAD_MODE, SHARD_TIMEOUT_SECONDS, \
+    RETRIEVAL_EXCLUDE_MAX
 from My_RAG_Project.utils.log_utils import log
-from My_RAG_Project.llm_models.embeddings_model import bge_embedding
+from My_RAG_Project.utils.tracing import traced
+from My_RAG_Project.llm_models.embeddings_model import get_bge_embedding
+from My_RAG_Project.documents.index_profiles import dense_search_params, sparse_search_params, search_oversample
+from My_RAG_Project.tools.fusion import PayloadStore, ResultSet, fuse, fuse_batch, merge_topk, rebase, rrf_fusion
+from My_RAG_Project.tools.fanout import fan_out
+from My_RAG_Project.documents.chunk_store import open_current_store
+from My_RAG_Project.documents.collection_versions import summary_name
+from My_RAG_Project.documents.summary_vectors import summary_search_params
 
-# PyMilvus low-level imports for sparse/rrf/hybrid
-from pymilvus import (
-    MilvusClient,
-    RRFRanker,
-    AnnSearchRequest,
-)
+# PyMilvus low-level client for dense/sparse/hybrid
+from pymilvus import MilvusClient
+
+DEFAULT_FIELDS = ["text", "page_number", "keywords", "source", "char_count"]
+# In "external" payload mode text/keywords are filled in from the chunk store after fusion,
+# so Milvus responses only carry the small scalar fields.
+EXTERNAL_FIELDS = ["text", "keywords"]
+
+# A collection name, a list of names, or a shard map {shard label: collection}
+Collections = Union[None, str, Sequence[str], Mapping[str, str]]
+
+
+def _deadline(timeout: Optional[float]) -> Optional[float]:
+    return time.monotonic() + timeout if timeout else None
+
+
+def _time_left(deadline: Optional[float]) -> Optional[float]:
+    """
+    Timeout for the next Milvus call so that sequential calls share one budget
+    (None: unbounded). Raises TimeoutError once the budget is spent.
+    """
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise TimeoutError("search time budget exhausted")
+    return left
 
 
 # ---------- Common connections ----------
 
-def _get_vectorstore_and_client():
-    """Return (vector_store, pymilvus_client) sharing the same collection."""
-    mv = MilvusPDFWriter()
-    mv.create_connection()  # langchain-milvus vector store
-    py_client = MilvusClient(uri=MILVUS_URI)  # low-level client
-    return mv.vector_store, py_client
+@lru_cache(maxsize=1)
+def _get_client() -> MilvusClient:
+    """Shared low-level client (one connection per process, safe to use from the fan-out threads)."""
+    return MilvusClient(uri=MILVUS_URI)
+
+
+def _milvus_fields(output_fields: Optional[List[str]]) -> List[str]:
+    fields = output_fields or DEFAULT_FIELDS
+    if PAYLOAD_MODE == "external":
+        fields = [f for f in fields if f not in EXTERNAL_FIELDS]
+    return fields
+
+
+def _external_payloads(pks: List[int], collection_name: str = COLLECTION_NAME) -> Dict[int, Dict[str, Any]]:
+    store = open_current_store(collection_name)
+    if store is None:
+        log.warning(f"PAYLOAD_MODE=external but no chunk store is published for '{collection_name}'; "
+                    f"returning hits without text")
+        return {}
+    return store.get_many(pks)
+
+
+@traced("hydrate", "search")
+def hydrate(rs: ResultSet, collection_name: str = COLLECTION_NAME) -> ResultSet:
+    """
+    Fill text/keywords of the (final, already fused) hits from the external chunk store.
+    Fan-out hits carry their collection in the payload ('_collection'); others use `collection_name`.
+    """
+    if PAYLOAD_MODE != "external":
+        return rs
+    mask = rs.valid()
+    by_collection: Dict[str, List[Tuple[int, int]]] = {}
+    for pk, slot in zip(rs.ids[mask].tolist(), rs.slots[mask].tolist()):
+        if slot >= 0:
+            name = rs.store.get(slot).get("_collection", collection_name)
+            by_collection.setdefault(name, []).append((pk, slot))
+    for name, hits in by_collection.items():
+        payloads = _external_payloads([pk for pk, _ in hits], name)
+        for pk, slot in hits:
+            rs.store.get(slot).update(payloads.get(pk, {}))
+    return rs
+
+
+@traced("embed_queries", "embedding")
+def _embed_queries(queries: List[str]) -> List[List[float]]:
+    embedding = get_bge_embedding()
+    vectors = [embedding.embed_query(queries[0])] if len(queries) == 1 else embedding.embed_documents(queries)
+    if not vectors or not vectors[0]:
+        raise ValueError("Dense embedding result is empty.")
+    return vectors
+
+
+def resolve_shards(collections: Collections = None) -> Dict[str, str]:
+    """Normalize a collection name / list of names / shard map into {shard label: collection}."""
+    if collections is None:
+        return {COLLECTION_NAME: COLLECTION_NAME}
+    if isinstance(collections, str):
+        return {collections: collections}
+    if isinstance(collections, Mapping):
+        shards = dict(collections)
+    else:
+        shards = {name: name for name in collections}
+    if not shards:
+        raise ValueError("No collections to search")
+    return shards
+
+
+# ---------- Array-backed search legs (batch of queries -> ResultSet) ----------
+
+@traced("dense", "search")
+def dense_resultset(
+    queries: List[str],
+    k: int,
+    expr: Optional[str],
+    store: PayloadStore,
+    output_fields: Optional[List[str]] = None,
+    index_profile: Optional[str] = None,
+    vectors: Optional[List[List[float]]] = None,
+    collection_name: str = COLLECTION_NAME,
+    timeout: Optional[float] = None,
+) -> ResultSet:
+    """
+    Dense ANN on 'dense' for a batch of queries (one embedding call, one search call).
+    Pass precomputed query `vectors` to skip the embedding call.
+    """
+    fields = _milvus_fields(output_fields)
+    vectors = vectors or _embed_queries(queries)
+
+    params = dense_search_params(index_profile)
+    if "ef" in params["params"]:
+        # HNSW requires ef >= limit
+        params["params"]["ef"] = max(params["params"]["ef"], k)
+
+    res = _get_client().search(
+        collection_name=collection_name,
+        data=vectors,
+        anns_field="dense",
+        limit=k,
+        search_params=params,
+        filter=expr or "",
+        output_fields=fields,
+        timeout=timeout,
+    )
+    return ResultSet.from_milvus(res, store, fields)
+
+
+@traced("sparse", "search")
+def sparse_resultset(
+    queries: List[str],
+    k: int,
+    expr: Optional[str],
+    store: PayloadStore,
+    output_fields: Optional[List[str]] = None,
+    search_params: Optional[Dict[str, Any]] = None,
+    collection_name: str = COLLECTION_NAME,
+    timeout: Optional[float] = None,
+) -> ResultSet:
+    """BM25 on 'sparse' for a batch of raw-text queries (server computes the sparse vectors)."""
+    fields = _milvus_fields(output_fields)
+    res = _get_client().search(
+        collection_name=collection_name,
+        data=queries,
+        anns_field="sparse",
+        limit=k,
+        search_params=search_params or sparse_search_params(),
+        filter=expr or "",
+        output_fields=fields,
+        timeout=timeout,
+    )
+    return ResultSet.from_milvus(res, store, fields)
+
+
+def hybrid_resultset(
+    queries: List[str],
+    k: int,
+    expr: Optional[str],
+    store: PayloadStore,
+    rrf_k: int = 60,
+    index_profile: Optional[str] = None,
+    fusion: str = "rrf",
+    vectors: Optional[List[List[float]]] = None,
+    collection_name: str = COLLECTION_NAME,
+    timeout: Optional[float] = None,
+) -> ResultSet:
+    """Dense + BM25 legs (each over-fetching k * oversample), fused per query; `timeout` covers both legs."""
+    leg_limit = k * search_oversample()
+    deadline = _deadline(timeout)
+    dense = dense_resultset(queries, leg_limit, expr, store, index_profile=index_profile, vectors=vectors,
+                            collection_name=collection_name, timeout=_time_left(deadline))
+    sparse = sparse_resultset(queries, leg_limit, expr, store, collection_name=collection_name,
+                              timeout=_time_left(deadline))
+    kwargs = {"rrf_k": rrf_k} if fusion == "rrf" else {}
+    return fuse([dense, sparse], k, method=fusion, **kwargs)
+
+
+@traced("coarse", "search")
+def coarse_targets(vectors: List[List[float]], level: str = "page", coarse_k: int = 20,
+                   collection_name: str = COLLECTION_NAME,
+                   timeout: Optional[float] = None) -> List[List[Tuple[str, int]]]:
+    """Top `coarse_k` pages (or documents) per query vector from the summary collection."""
+    res = _get_client().search(
+        collection_name=summary_name(collection_name),
+        data=vectors,
+        anns_field="dense",
+        limit=coarse_k,
+        search_params=summary_search_params(),
+        filter=f'level == "{level}"',
+        output_fields=["source", "page_number"],
+        timeout=timeout,
+    )
+    return [[(hit.get("source"), int(hit.get("page_number") or 0)) for hit in hits] for hits in res]
+
 
+def restrict_expr(targets: List[Tuple[str, int]], level: str = "page") -> str:
+    """Milvus filter matching only the chunks of the given pages / documents."""
+    if level == "doc":
+        return f"source in {json.dumps(sorted({src for src, _ in targets}), ensure_ascii=False)}"
+    pages: Dict[str, set] = {}
+    for src, page in targets:
+        pages.setdefault(src, set()).add(page)
+    return " or ".join(f"(source == {json.dumps(src, ensure_ascii=False)} and page_number in {sorted(p)})"
+                       for src, p in pages.items())
 
-# ---------- 1) Dense similarity with LangChain ----------
+
+def exclude_expr(expr: Optional[str], ids: Sequence[int], max_ids: int = RETRIEVAL_EXCLUDE_MAX) -> Optional[str]:
+    """
+    `expr` narrowed to chunks whose primary key is not in `ids` (hits already seen).
+    Only the newest `max_ids` ids go into the filter (Milvus expressions have a size
+    limit); callers drop any older ones from the results themselves.
+    """
+    ids = [int(i) for i in ids][-max_ids:] if max_ids > 0 else []
+    if not ids:
+        return expr
+    exclusion = f"id not in {ids}"
+    return f"({expr}) and ({exclusion})" if expr else exclusion
+
+
+def two_stage_resultset(
+    queries: List[str],
+    k: int,
+    expr: Optional[str],
+    store: PayloadStore,
+    level: str = "page",
+    coarse_k: int = 20,
+    fine: str = "hybrid",
+    rrf_k: int = 60,
+    index_profile: Optional[str] = None,
+    vectors: Optional[List[List[float]]] = None,
+    collection_name: str = COLLECTION_NAME,
+    timeout: Optional[float] = None,
+) -> ResultSet:
+    """
+    Coarse-to-fine: find the top `coarse_k` pages/documents on the summary collection,
+    then run the `fine` chunk search ("dense" | "bm25" | "hybrid") restricted to them.
+    Queries are embedded once for both stages. Without a summary collection (or when
+    the coarse stage finds nothing) the query falls back to the unrestricted search.
+    `timeout` covers all Milvus calls of the batch together.
+    """
+    vectors = vectors or _embed_queries(queries)
+    deadline = _deadline(timeout)
+    try:
+        targets = coarse_targets(vectors, level, coarse_k, collection_name, _time_left(deadline))
+    except Exception as e:
+        log.warning(f"Coarse stage unavailable ({e}); running the unrestricted {fine} search")
+        targets = [[] for _ in queries]
+
+    per_query = []
+    for query, vec, hits in zip(queries, vectors, targets):
+        sub_expr = expr
+        if hits:
+            restriction = restrict_expr(hits, level)
+            sub_expr = f"({expr}) and ({restriction})" if expr else restriction
+        if fine == "dense":
+            rs = dense_resultset([query], k, sub_expr, store, index_profile=index_profile, vectors=[vec],
+                                 collection_name=collection_name, timeout=_time_left(deadline))
+        elif fine == "bm25":
+            rs = sparse_resultset([query], k, sub_expr, store, collection_name=collection_name,
+                                  timeout=_time_left(deadline))
+        else:
+            rs = hybrid_resultset([query], k, sub_expr, store, rrf_k=rrf_k, index_profile=index_profile,
+                                  vectors=[vec], collection_name=collection_name, timeout=_time_left(deadline))
+        per_query.append(rs)
+    return ResultSet.concat(per_query, store)
+
+
+# ---------- Per-shard legs + global merge ----------
+
+def _shard_legs(
+    collection_name: str,
+    queries: List[str],
+    strategy: str,
+    k: int,
+    expr: Optional[str],
+    vectors: Optional[List[List[float]]],
+    rrf_k: int,
+    index_profile: Optional[str],
+    coarse_level: str,
+    coarse_k: int,
+    fine: str,
+    output_fields: Optional[List[str]],
+    search_params: Optional[Dict[str, Any]],
+    timeout: Optional[float],
+) -> List[ResultSet]:
+    """
+    Search one collection and return its *unmerged* legs on a private PayloadStore:
+    [dense] | [sparse] | [two_stage] | [dense, sparse] (hybrid, each over-fetching k * oversample).
+    `timeout` is the shard's whole budget: every Milvus call gets only what is left of it,
+    so a shard dropped by fan_out stops within its deadline instead of running on.
+    """
+    store = PayloadStore()
+    if strategy == "dense":
+        return [dense_resultset(queries, k, expr, store, output_fields, index_profile, vectors,
+                                collection_name, timeout)]
+    if strategy == "bm25":
+        return [sparse_resultset(queries, k, expr, store, output_fields, search_params, collection_name, timeout)]
+    if strategy == "two_stage":
+        return [two_stage_resultset(queries, k, expr, store, coarse_level, coarse_k, fine, rrf_k, index_profile,
+                                    vectors, collection_name, timeout)]
+    leg_limit = k * search_oversample()
+    deadline = _deadline(timeout)
+    return [
+        dense_resultset(queries, leg_limit, expr, store, output_fields, index_profile, vectors,
+                        collection_name, _time_left(deadline)),
+        sparse_resultset(queries, leg_limit, expr, store, output_fields, search_params, collection_name,
+                         _time_left(deadline)),
+    ]
+
+
+def _merge_shards(legs: Dict[str, List[ResultSet]], shards: Dict[str, str], strategy: str,
+                  k: int, rrf_k: int) -> ResultSet:
+    """
+    Global merge of per-shard legs.
+    - dense: IP scores of one embedding model are comparable across collections, so the
+      shards are merged on their raw scale (merge_topk).
+    - BM25: IDF and average document length are per collection, so raw scores are not
+      comparable; each shard's ranked list is RRF-fused instead.
+    - hybrid: RRF of the global dense list and the fused sparse list.
+    - two_stage: scores are already rank-fused per shard, so shards are merged by RRF.
+    Milvus auto ids come from one cluster-wide allocator, so pks do not collide across shards.
+    """
+    store = PayloadStore()
+    per_leg: List[List[ResultSet]] = []
+    for label, sets in legs.items():
+        if len(shards) > 1:
+            for payload in sets[0].store:
+                payload["_shard"] = label
+                payload["_collection"] = shards[label]
+        for i, rs in enumerate(rebase(sets, store)):
+            if i == len(per_leg):
+                per_leg.append([])
+            per_leg[i].append(rs)
+
+    def shard_rrf(sets: List[ResultSet], limit: int) -> ResultSet:
+        return rrf_fusion(sets, limit, rrf_k=rrf_k) if len(sets) > 1 else merge_topk(sets, limit)
+
+    if strategy == "hybrid":
+        leg_limit = k * search_oversample()
+        dense, sparse = per_leg
+        return rrf_fusion([merge_topk(dense, leg_limit), shard_rrf(sparse, leg_limit)], k, rrf_k=rrf_k)
+    if strategy in ("bm25", "two_stage"):
+        return shard_rrf(per_leg[0], k)
+    return merge_topk(per_leg[0], k)
+
+
+@traced("search_resultset", "search")
+def search_resultset(
+    queries: List[str],
+    strategy: str = "hybrid",
+    k: int = 5,
+    expr: Optional[str] = "page_number >= 1",
+    rrf_k: int = 60,
+    index_profile: Optional[str] = None,
+    coarse_level: str = "page",
+    coarse_k: int = 20,
+    collections: Collections = None,
+    shard_timeout: Optional[float] = None,
+    fine: str = "hybrid",
+    output_fields: Optional[List[str]] = None,
+    search_params: Optional[Dict[str, Any]] = None,
+) -> ResultSet:
+    """
+    Dispatch by strategy ("dense" | "bm25" | "hybrid" | "two_stage") for a batch of queries
+    (payloads hydrated). "two_stage" runs a `fine` chunk search restricted to the top
+    `coarse_k` pages/documents (`coarse_level`).
+
+    `collections` (name, list of names or {shard label: collection}) fans the search out
+    concurrently; queries are embedded once, each shard gets `shard_timeout` seconds
+    (default SHARD_TIMEOUT_SECONDS) and shards that time out or fail are left out of the
+    merge. Fan-out hits carry '_shard' and '_collection' in their payload.
+    """
+    shards = resolve_shards(collections)
+    vectors = None if strategy == "bm25" else _embed_queries(queries)
+    run = partial(_shard_legs, queries=queries, strategy=strategy, k=k, expr=expr, vectors=vectors, rrf_k=rrf_k,
+                  index_profile=index_profile, coarse_level=coarse_level, coarse_k=coarse_k, fine=fine,
+                  output_fields=output_fields, search_params=search_params)
+
+    if len(shards) == 1:
+        (label, collection), = shards.items()
+        legs = {label: run(collection, timeout=shard_timeout)}
+    else:
+        timeout = shard_timeout or SHARD_TIMEOUT_SECONDS
+        legs = fan_out({label: partial(run, name, timeout=timeout) for label, name in shards.items()}, timeout)
+        if not legs:
+            raise RuntimeError(f"All shards failed or timed out: {sorted(shards)}")
+        if len(legs) < len(shards):
+            log.warning(f"Partial fan-out result: {sorted(legs)} of {sorted(shards)}")
+
+    rs = _merge_shards(legs, shards, strategy, k, rrf_k)
+    return hydrate(rs, next(iter(shards.values())))
+
+
+def multi_query_resultset(
+    queries: List[str],
+    k: int = 5,
+    fusion: str = "rrf",
+    rrf_k: int = 60,
+    weights: Optional[Sequence[float]] = None,
+    **search_kwargs,
+) -> ResultSet:
+    """
+    Search several phrasings of one question as one batch (one embedding call, one
+    search call per leg/shard) and fuse their hit lists into a single top-k list
+    (a 1-query ResultSet). `search_kwargs` are passed to search_resultset.
+    """
+    rs = search_resultset(queries, k=k, rrf_k=rrf_k, **search_kwargs)
+    kwargs = {"rrf_k": rrf_k} if fusion == "rrf" else {}
+    return fuse_batch(rs, k, method=fusion, weights=weights, **kwargs)
+
+
+# ---------- 1) Dense similarity ----------
 
 def dense_similarity_search(
     query: str,
     k: int = 5,
     expr: Optional[str] = "page_number >= 1",
     output_fields: Optional[List[str]] = None,
+    index_profile: Optional[str] = None,
+    with_score: bool = False,
+    collections: Collections = None,
+    shard_timeout: Optional[float] = None,
 ):
     """
-    Dense vector similarity via LangChain Milvus vector store.
+    Dense vector similarity on the 'dense' field.
     - query: text query
     - k: top-N
     - expr: Milvus scalar filter (e.g., "page_number >= 1")
-    - output_fields: fields to return in metadatas
+    - output_fields: fields to return in rows
+    - index_profile: dense index profile; picks matching search params (ef/nprobe/...)
+    - with_score: return [(Document, score)] instead of row dicts
+    - collections / shard_timeout: fan out over several collections (see search_resultset)
     """
-    vector_store, _ = _get_vectorstore_and_client()
     log.info(f"Dense similarity search: k={k}, expr={expr}")
-
-    # LangChain API: similarity_search returns Documents with .page_content/.metadata
-    # We can pass expr through search kwargs via as_retriever (or use similarity_search with filtering if supported).
-    # For a quick path, use similarity_search and filter post-hoc if expr is simple; here we rely on retriever for expr.
-    retriever = vector_store.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": k, "expr": expr} if expr else {"k": k},
-    )
-    docs = retriever.get_relevant_documents(query)
-
-    rows = []
-    for d in docs:
-        row = {
-            "text": d.page_content,
-            "page_number": d.metadata.get("page_number"),
-            "keywords": d.metadata.get("keywords"),
-            "source": d.metadata.get("source"),
-            "char_count": d.metadata.get("char_count"),
-        }
-        if output_fields:
-            row = {k: v for k, v in row.items() if k in output_fields}
-        rows.append(row)
+    rs = search_resultset([query], "dense", k, expr, index_profile=index_profile,
+                          collections=collections, shard_timeout=shard_timeout)
+    if with_score:
+        return rs.documents(0)
+
+    rows = rs.rows(0)
+    if output_fields:
+        rows = [{f: v for f, v in row.items() if f in output_fields} for row in rows]
     return rows
 
 
@@ -72,131 +476,67 @@ def sparse_bm25_search(
     expr: Optional[str] = "page_number >= 1",
     output_fields: Optional[List[str]] = None,
     search_params: Optional[Dict[str, Any]] = None,
+    with_score: bool = False,
+    collections: Collections = None,
+    shard_timeout: Optional[float] = None,
 ):
     """
     Full-text search (BM25) on 'sparse' field with PyMilvus.
     - query: raw text query; server computes sparse embedding via BM25 function
     - expr: Milvus scalar filter (e.g., "page_number >= 1")
-    - search_params: advanced params; defaults are reasonable
+    - search_params: advanced params; defaults come from the index profile / retrieval config
+    - with_score: return [(Document, score)] instead of row dicts
+    - collections / shard_timeout: fan out over several collections (see search_resultset)
     """
-    _, client = _get_vectorstore_and_client()
-    params = search_params or {
-        # You can tune BM25 search params; drop_ratio_search helps skip tiny weights for speed
-        "metric_type": "BM25",
-        "params": {"drop_ratio_search": 0.2},
-    }
-    log.info(f"Sparse BM25 search: k={k}, expr={expr}, params={params}")
-
-    res = client.search(
-        collection_name=COLLECTION_NAME,
-        data=[query],               # raw text; server creates sparse vector via BM25 function
-        anns_field="sparse",
-        limit=k,
-        output_fields=output_fields or ["text", "page_number", "keywords", "source", "char_count"],
-        filter=expr or "",
-        search_params=params,
-    )
-    # PyMilvus returns a list of hits per query; we used single query so take res[0]
-    hits = res[0] if res else []
-    rows = []
-    for h in hits:
-        row = {
-            "text": h.get("text"),
-            "page_number": h.get("page_number"),
-            "keywords": h.get("keywords"),
-            "source": h.get("source"),
-            "char_count": h.get("char_count"),
-            "_score": h.get("distance"),  # for BM25 higher is better
-        }
-        rows.append(row)
-    return rows
+    log.info(f"Sparse BM25 search: k={k}, expr={expr}, params={search_params or sparse_search_params()}")
+    rs = search_resultset([query], "bm25", k, expr, collections=collections, shard_timeout=shard_timeout,
+                          output_fields=output_fields, search_params=search_params)
+    # for BM25 higher is better
+    return rs.documents(0) if with_score else rs.rows(0)
 
 
-# ---------- 3) Hybrid search (dense + sparse) with RRFRanker ----------
+# ---------- 3) Hybrid search (dense + sparse) with RRF ----------
 
-def hybrid_rrf_search(query: str, k: int = 5, rrf_k: int = 60, expr: str = "page_number >= 1"):
+def hybrid_rrf_search(query: str, k: int = 5, rrf_k: int = 60, expr: str = "page_number >= 1",
+                      index_profile: Optional[str] = None, with_score: bool = False,
+                      collections: Collections = None, shard_timeout: Optional[float] = None):
     """
-    Hybrid search: dense ANN on 'dense' + BM25 on 'sparse', then RRF fuse.
+    Hybrid search: dense ANN on 'dense' + BM25 on 'sparse', then RRF fuse (tools/fusion.py).
     - query: 用户查询（字符串）
     - k: 返回条数
     - rrf_k: RRF 的平滑参数
     - expr: 过滤表达式
+    - index_profile: dense 索引配置名，用于选择匹配的搜索参数
+    - with_score: 返回 [(Document, score)] 而不是行字典
+    - collections / shard_timeout: 多集合并发检索 + 全局融合（见 search_resultset）
     """
-    mv = MilvusPDFWriter()
-    mv.create_connection()  # Only establish a connection (do not rebuild the collection)
+    rs = search_resultset([query], "hybrid", k, expr, rrf_k=rrf_k, index_profile=index_profile,
+                          collections=collections, shard_timeout=shard_timeout)
+    log.info(f"Hybrid RRF search done. k={k}, rrf_k={rrf_k}, expr={expr}.")
+    return rs.documents(0) if with_score else rs.rows(0)
 
-    # 1) Compute Dense Vector
-    dense_vec = bge_embedding.embed_query(query)
-    if not isinstance(dense_vec, list) or len(dense_vec) == 0:
-        raise ValueError("Dense embedding result is empty.")
 
-    # 2) Dense ANN Search
-    dense_res = mv.vector_store.client.search(
-        collection_name=COLLECTION_NAME,
-        data=[dense_vec],
-        anns_field="dense",
-        limit=k,
-        search_params={"metric_type": "IP", "params": {"ef": 64}},
-        filter=expr,
-        output_fields=["text", "page_number", "keywords", "source"]
-    )
+# ---------- 4) Two-stage coarse-to-fine search ----------
 
-    # 3) Sparse BM25
-    sparse_res = mv.vector_store.client.search(
-        collection_name=COLLECTION_NAME,
-        data=[query],
-        anns_field="sparse",
-        limit=k,
-        search_params={"metric_type": "BM25", "params": {"drop_ratio_search": 0.2}},
-        filter=expr,
-        output_fields=["text", "page_number", "keywords", "source"]
-    )
-
-    # 4) RRF
-    def _collect(res_list, key):
-        items = []
-        for hits in res_list:
-            for rank, hit in enumerate(hits):
-                doc_id = f"{hit.get('id', '')}_{hit.get('page_number', '')}_{hit.get('source', '')}"
-                items.append({
-                    "doc_id": doc_id,
-                    "rank": rank + 1,
-                    "score": float(hit["distance"]) if key == "dense" else float(hit["distance"]),
-                    "text": hit.get("text", ""),
-                    "page_number": hit.get("page_number", -1),
-                    "keywords": hit.get("keywords", ""),
-                    "source": hit.get("source", "")
-                })
-        return items
-
-    dense_items = _collect(dense_res, "dense")
-    sparse_items = _collect(sparse_res, "sparse")
-
-    # RRF Compute
-    from collections import defaultdict
-    fused = defaultdict(lambda: {"score": 0.0, "payload": None})
-
-    def _rrf_score(rank, k=rrf_k):
-        return 1.0 / (k + rank)
-
-    for it in dense_items:
-        fused[it["doc_id"]]["score"] += _rrf_score(it["rank"], rrf_k)
-        fused[it["doc_id"]]["payload"] = it
-
-    for it in sparse_items:
-        fused[it["doc_id"]]["score"] += _rrf_score(it["rank"], rrf_k)
-        if fused[it["doc_id"]]["payload"] is None:
-            fused[it["doc_id"]]["payload"] = it
-
-    # 排序取前 k
-    rows = sorted(fused.values(), key=lambda x: x["score"], reverse=True)[:k]
-    rows = [r["payload"] for r in rows if r["payload"]]
-
-    log.info(f"Hybrid RRF search done. k={k}, rrf_k={rrf_k}, expr={expr}.")
-    return rows
+def two_stage_search(query: str, k: int = 5, expr: Optional[str] = "page_number >= 1", level: str = "page",
+                     coarse_k: int = 20, fine: str = "hybrid", index_profile: Optional[str] = None,
+                     with_score: bool = False, collections: Collections = None,
+                     shard_timeout: Optional[float] = None):
+    """
+    Page/doc summary search first, then chunk search restricted to the top hits.
+    - level: "page" | "doc" granularity of the coarse stage
+    - coarse_k: number of pages/documents kept by the coarse stage
+    - fine: chunk search strategy inside them ("dense" | "bm25" | "hybrid")
+    - with_score: return [(Document, score)] instead of row dicts
+    - collections / shard_timeout: fan out over several collections (see search_resultset)
+    """
+    rs = search_resultset([query], "two_stage", k, expr, index_profile=index_profile, coarse_level=level,
+                          coarse_k=coarse_k, fine=fine, collections=collections, shard_timeout=shard_timeout)
+    log.info(f"Two-stage search done. k={k}, level={level}, coarse_k={coarse_k}, fine={fine}, expr={expr}.")
+    return rs.documents(0) if with_score else rs.rows(0)
 
 
-# ---------- 4) Simple scalar query (no vectors) ----------
+# ---------- 5) Simple scalar query (no vectors) ----------
 
 def scalar_query(
     expr: str,
@@ -206,13 +546,16 @@ def scalar_query(
     """
     Scalar-only query via PyMilvus (no vector computation).
     """
-    _, client = _get_vectorstore_and_client()
-    rows = client.query(
+    rows = _get_client().query(
         collection_name=COLLECTION_NAME,
         filter=expr,  # e.g., "page_number == 1 and char_count > 500"
-        output_fields=output_fields or ["text", "page_number", "keywords", "source", "char_count"],
+        output_fields=_milvus_fields(output_fields),
         limit=limit,
     )
+    if PAYLOAD_MODE == "external":
+        payloads = _external_payloads([r["id"] for r in rows])
+        for r in rows:
+            r.update(payloads.get(r["id"], {}))
     return rows
 
 
@@ -236,6 +579,11 @@ if __name__ == "__main__":
     for i, r in enumerate(rows):
         print(f"[{i}] p{r.get('page_number')} | kw={r.get('keywords')} | {r.get('text','')[:80]}...")
 
+    print("\n=== Two-stage (pages -> chunks) ===")
+    rows = two_stage_search(q, k=5)
+    for i, r in enumerate(rows):
+        print(f"[{i}] p{r.get('page_number')} | kw={r.get('keywords')} | {r.get('text','')[:80]}...")
+
     print("\n=== Scalar query (page 1) ===")
     rows = scalar_query("page_number == 1", limit=5)
     for i, r in enumerate(rows):
@@ -0,0 +1,51 @@
+"""
+Async execution helpers for the graphs.
+
+The async graphs (get_async_graph() in adaptive_rag/graph_2.py and corrective_rag/graph1.py)
+await LLM calls directly (ainvoke) and push the remaining blocking work — Milvus search,
+embedding, context packing — onto a bounded thread pool, so one worker process serves
+many sessions on one event loop. Per-process limits:
+    MAX_CONCURRENT_SESSIONS   graph runs in flight (session_slot)
+    LLM_MAX_CONCURRENCY       LLM requests in flight (llm_slot)
+    BLOCKING_IO_WORKERS       threads for run_blocking (Milvus / embeddings)
+"""
+import asyncio
+import contextvars
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from My_RAG_Project.utils.env_utils import MAX_CONCURRENT_SESSIONS, LLM_MAX_CONCURRENCY, BLOCKING_IO_WORKERS
+
+# asyncio primitives belong to one event loop: keep one set of semaphores per loop
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+@functools.lru_cache(maxsize=1)
+def _blocking_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="rag-io")
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call on the shared I/O pool (context variables, e.g. callbacks, carried over)."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_blocking_executor(), functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+def _semaphore(name: str, limit: int) -> asyncio.Semaphore:
+    per_loop = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    if name not in per_loop:
+        per_loop[name] = asyncio.Semaphore(limit)
+    return per_loop[name]
+
+
+def session_slot() -> asyncio.Semaphore:
+    """`async with session_slot():` around a whole graph run."""
+    return _semaphore("sessions", MAX_CONCURRENT_SESSIONS)
+
+
+def llm_slot() -> asyncio.Semaphore:
+    """`async with llm_slot():` around an LLM request (keeps provider rate limits in check)."""
+    return _semaphore("llm", LLM_MAX_CONCURRENCY)
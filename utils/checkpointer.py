@@ -0,0 +1,495 @@
+"""
+Bounded, persistent LangGraph checkpointer (SQLite).
+
+MemorySaver keeps every thread's full state (Document lists included) in process memory
+for the life of the process, and loses all sessions on restart. BoundedSQLiteSaver
+stores checkpoints in one SQLite file per graph and keeps the store bounded:
+
+Compact state: every langchain Document inside a checkpoint, its metadata or a pending
+write is replaced by a reference (hash of content + metadata) and stored once per thread
+in a `documents` table, so the same retrieved chunks are not re-serialized into each
+step's checkpoint. References are resolved again on load; documents no longer referenced
+by any kept checkpoint are deleted with it.
+Compact messages: the corrective graph keeps its retrieved chunks as ToolMessage strings in
+an ever-growing `messages` list. Tool outputs of earlier turns (before the last HumanMessage)
+are stored as a short stub; nothing reads them again (the agent and the grader only look at
+the current turn).
+Per-thread caps: only the newest CHECKPOINT_MAX_PER_THREAD checkpoints of a thread are kept,
+and older ones are dropped while the thread holds more than CHECKPOINT_MAX_THREAD_MB.
+A newest checkpoint that alone exceeds the cap is stored with its oldest conversation turns
+removed (whole turns, cut at HumanMessages) until it fits; if the current turn alone is still
+too large, its tool outputs are stubbed too (the running graph keeps them in memory). Only a
+state that is over the cap without any tool output is kept as is, with a warning.
+Eviction: threads unused for CHECKPOINT_TTL_SECONDS expire; beyond CHECKPOINT_MAX_THREADS
+the least recently used threads are deleted.
+
+CHECKPOINT_BACKEND=memory restores the old in-process MemorySaver.
+
+Usage:
+    python -m My_RAG_Project.utils.checkpointer                  # size per graph
+    python -m My_RAG_Project.utils.checkpointer --purge-expired
+    python -m My_RAG_Project.utils.checkpointer --clear
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from My_RAG_Project.utils.env_utils import (
+    CHECKPOINT_BACKEND,
+    CHECKPOINT_DIR,
+    CHECKPOINT_TTL_SECONDS,
+    CHECKPOINT_MAX_THREADS,
+    CHECKPOINT_MAX_PER_THREAD,
+    CHECKPOINT_MAX_THREAD_MB,
+)
+from My_RAG_Project.utils.async_utils import run_blocking
+from My_RAG_Project.utils.log_utils import log
+
+GRAPHS = ("adaptive", "corrective")
+_DOC_REF = "__doc_ref__"
+_TOOL_STUB = "[tool output of an earlier turn, {n} chars; not kept in the checkpoint]"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id   TEXT PRIMARY KEY,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_last_access ON threads (last_access);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id     TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_id     TEXT,
+    type          TEXT NOT NULL,
+    checkpoint    BLOB NOT NULL,
+    meta_type     TEXT NOT NULL,
+    metadata      BLOB NOT NULL,
+    doc_ids       TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id     TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id       TEXT NOT NULL,
+    idx           INTEGER NOT NULL,
+    channel       TEXT NOT NULL,
+    type          TEXT NOT NULL,
+    value         BLOB NOT NULL,
+    doc_ids       TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS documents (
+    thread_id TEXT NOT NULL,
+    doc_id    TEXT NOT NULL,
+    type      TEXT NOT NULL,
+    payload   BLOB NOT NULL,
+    size      INTEGER NOT NULL,
+    PRIMARY KEY (thread_id, doc_id)
+);
+"""
+
+
+def _doc_id(doc: Document) -> str:
+    meta = json.dumps(doc.metadata, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(f"{doc.page_content}\x00{meta}".encode("utf-8")).hexdigest()
+
+
+def _strip_docs(obj: Any, found: Dict[str, Document]) -> Any:
+    """Copy of `obj` with every Document replaced by {_DOC_REF: id}; the documents are collected in `found`."""
+    if isinstance(obj, Document):
+        did = _doc_id(obj)
+        found[did] = obj
+        return {_DOC_REF: did}
+    if isinstance(obj, dict):
+        return {k: _strip_docs(v, found) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_strip_docs(v, found) for v in obj]
+    if isinstance(obj, tuple):
+        return tuple(_strip_docs(v, found) for v in obj)
+    return obj
+
+
+def _restore_docs(obj: Any, docs: Dict[str, Document]) -> Any:
+    if isinstance(obj, dict):
+        if len(obj) == 1 and _DOC_REF in obj:
+            doc = docs.get(obj[_DOC_REF])
+            if doc is None:
+                log.warning(f"Checkpoint references a missing document {obj[_DOC_REF]}")
+                return Document(page_content="", metadata={"missing": True})
+            return doc
+        return {k: _restore_docs(v, docs) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_restore_docs(v, docs) for v in obj]
+    if isinstance(obj, tuple):
+        return tuple(_restore_docs(v, docs) for v in obj)
+    return obj
+
+
+def _stub_tool_outputs(messages: List[BaseMessage], upto: int) -> List[BaseMessage]:
+    """Copy of `messages` with the content of every ToolMessage before index `upto` replaced by a stub."""
+    out = []
+    for i, m in enumerate(messages):
+        if i < upto and isinstance(m, ToolMessage) and not str(m.content).startswith("[tool output of"):
+            m = m.model_copy(update={"content": _TOOL_STUB.format(n=len(str(m.content)))})
+        out.append(m)
+    return out
+
+
+def _with_messages(checkpoint: Checkpoint, messages: List[BaseMessage]) -> Checkpoint:
+    return {**checkpoint, "channel_values": {**checkpoint["channel_values"], "messages": messages}}
+
+
+class BoundedSQLiteSaver(BaseCheckpointSaver):
+    """LangGraph checkpointer on SQLite with document de-duplication, per-thread caps, TTL and LRU eviction."""
+
+    # Thread-level TTL / LRU sweep every N checkpoint writes
+    _EVICT_CHECK_EVERY = 50
+
+    def __init__(self, path: str, ttl_seconds: float = CHECKPOINT_TTL_SECONDS,
+                 max_threads: int = CHECKPOINT_MAX_THREADS, max_per_thread: int = CHECKPOINT_MAX_PER_THREAD,
+                 max_thread_mb: float = CHECKPOINT_MAX_THREAD_MB):
+        super().__init__()
+        self.path = path
+        self.ttl = ttl_seconds
+        self.max_threads = max_threads
+        self.max_per_thread = max(max_per_thread, 1)
+        self.max_thread_bytes = int(max_thread_mb * 1024 * 1024)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._oversize_warned: Set[str] = set()
+
+    @contextlib.contextmanager
+    def _tx(self):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # ---------- (de)serialization ----------
+
+    def _dump(self, conn: sqlite3.Connection, thread_id: str, obj: Any) -> Tuple[str, bytes, List[str]]:
+        """Serialize `obj` with its Documents moved to the documents table (only new ones are serialized)."""
+        found: Dict[str, Document] = {}
+        type_, blob = self.serde.dumps_typed(_strip_docs(obj, found))
+        if found:
+            ids = list(found)
+            known = {r[0] for r in conn.execute(
+                f"SELECT doc_id FROM documents WHERE thread_id = ? AND doc_id IN ({','.join('?' * len(ids))})",
+                (thread_id, *ids))}
+            rows = []
+            for did in ids:
+                if did not in known:
+                    dtype, payload = self.serde.dumps_typed(found[did])
+                    rows.append((thread_id, did, dtype, payload, len(payload)))
+            conn.executemany("INSERT OR IGNORE INTO documents VALUES (?, ?, ?, ?, ?)", rows)
+        return type_, blob, sorted(found)
+
+    def _dump_checkpoint(self, conn: sqlite3.Connection, thread_id: str,
+                         checkpoint: Checkpoint) -> Tuple[str, bytes, List[str]]:
+        """_dump() of a checkpoint with its message history compacted and cut to the size cap."""
+        messages = (checkpoint.get("channel_values") or {}).get("messages")
+        if not isinstance(messages, list) or not any(isinstance(m, ToolMessage) for m in messages):
+            return self._dump(conn, thread_id, checkpoint)
+        turns = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage) and i > 0]
+        current = turns[-1] if turns else 0
+        messages = _stub_tool_outputs(messages, current)
+        for start in [0] + turns:
+            dumped = self._dump(conn, thread_id, _with_messages(checkpoint, messages[start:]))
+            if len(dumped[1]) <= self.max_thread_bytes:
+                if start:
+                    log.info(f"Checkpoint thread {thread_id}: dropped {start} messages of earlier turns (size cap)")
+                return dumped
+        # the current turn alone is over the cap: store it without its tool output
+        last = messages[current:]
+        return self._dump(conn, thread_id, _with_messages(checkpoint, _stub_tool_outputs(last, len(last))))
+
+    def _load_docs(self, conn: sqlite3.Connection, thread_id: str, ids: Set[str]) -> Dict[str, Document]:
+        if not ids:
+            return {}
+        ids_ = list(ids)
+        rows = conn.execute(
+            f"SELECT doc_id, type, payload FROM documents WHERE thread_id = ? AND doc_id IN ({','.join('?' * len(ids_))})",
+            (thread_id, *ids_)).fetchall()
+        return {did: self.serde.loads_typed((t, p)) for did, t, p in rows}
+
+    def _tuple(self, conn: sqlite3.Connection, row: Sequence[Any]) -> CheckpointTuple:
+        thread_id, ns, cid, parent_id, type_, blob, meta_type, meta, doc_ids = row
+        writes = conn.execute(
+            "SELECT task_id, channel, type, value, doc_ids FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, ns, cid)).fetchall()
+        ids = set(json.loads(doc_ids))
+        for w in writes:
+            ids.update(json.loads(w[4]))
+        docs = self._load_docs(conn, thread_id, ids)
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": cid}},
+            checkpoint=_restore_docs(self.serde.loads_typed((type_, blob)), docs),
+            metadata=_restore_docs(self.serde.loads_typed((meta_type, meta)), docs),
+            parent_config=({"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": parent_id}}
+                           if parent_id else None),
+            pending_writes=[(task_id, channel, _restore_docs(self.serde.loads_typed((t, v)), docs))
+                            for task_id, channel, t, v, _ in writes],
+        )
+
+    # ---------- BaseCheckpointSaver ----------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        conf = config["configurable"]
+        thread_id, ns = conf["thread_id"], conf.get("checkpoint_ns", "")
+        cols = "thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, meta_type, metadata, doc_ids"
+        with self._lock:
+            if conf.get("checkpoint_id"):
+                row = self._conn.execute(
+                    f"SELECT {cols} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, ns, conf["checkpoint_id"])).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"SELECT {cols} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, ns)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE threads SET last_access = ? WHERE thread_id = ?", (time.time(), thread_id))
+            return self._tuple(self._conn, row)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+        if config is not None:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if "checkpoint_ns" in config["configurable"]:
+                where.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+        if before is not None and before["configurable"].get("checkpoint_id"):
+            where.append("checkpoint_id < ?")
+            params.append(before["configurable"]["checkpoint_id"])
+        sql = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, meta_type, metadata, "
+               "doc_ids FROM checkpoints" + (f" WHERE {' AND '.join(where)}" if where else "")
+               + " ORDER BY checkpoint_id DESC")
+        if limit is not None and not filter:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            tuples = [self._tuple(self._conn, row) for row in self._conn.execute(sql, params).fetchall()]
+        n = 0
+        for t in tuples:
+            if filter and not all(t.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            yield t
+            n += 1
+            if limit is not None and n >= limit:
+                return
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        conf = config["configurable"]
+        thread_id, ns = conf["thread_id"], conf.get("checkpoint_ns", "")
+        with self._tx() as conn:
+            type_, blob, ids = self._dump_checkpoint(conn, thread_id, checkpoint)
+            meta_type, meta, meta_ids = self._dump(conn, thread_id, metadata)
+            doc_ids = sorted(set(ids) | set(meta_ids))
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, ns, checkpoint["id"], conf.get("checkpoint_id"), type_, blob, meta_type, meta,
+                 json.dumps(doc_ids), len(blob) + len(meta)),
+            )
+            conn.execute("INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, time.time()))
+            self._trim_thread(conn, thread_id)
+            self._puts += 1
+            if self._puts % self._EVICT_CHECK_EVERY == 0:
+                self._evict(conn)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        conf = config["configurable"]
+        thread_id, ns, cid = conf["thread_id"], conf.get("checkpoint_ns", ""), conf["checkpoint_id"]
+        # special channels (errors, interrupts) overwrite; regular writes keep the first value
+        verb = "INSERT OR REPLACE" if all(c in WRITES_IDX_MAP for c, _ in writes) else "INSERT OR IGNORE"
+        with self._tx() as conn:
+            rows = []
+            for idx, (channel, value) in enumerate(writes):
+                type_, blob, ids = self._dump(conn, thread_id, value)
+                rows.append((thread_id, ns, cid, task_id, WRITES_IDX_MAP.get(channel, idx), channel, type_, blob,
+                             json.dumps(ids), len(blob)))
+            conn.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._tx() as conn:
+            self._delete_threads(conn, [thread_id])
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await run_blocking(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None
+                    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await run_blocking(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for t in tuples:
+            yield t
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await run_blocking(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await run_blocking(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await run_blocking(self.delete_thread, thread_id)
+
+    # ---------- Bounds (called inside a transaction) ----------
+
+    def _trim_thread(self, conn: sqlite3.Connection, thread_id: str):
+        """Drop the thread's oldest checkpoints beyond the count / size caps (the newest one is already cut to fit)."""
+        rows = conn.execute(
+            "SELECT c.checkpoint_ns, c.checkpoint_id, c.size + COALESCE(SUM(w.size), 0) FROM checkpoints c "
+            "LEFT JOIN writes w ON w.thread_id = c.thread_id AND w.checkpoint_ns = c.checkpoint_ns "
+            "AND w.checkpoint_id = c.checkpoint_id WHERE c.thread_id = ? "
+            "GROUP BY c.checkpoint_ns, c.checkpoint_id ORDER BY c.checkpoint_id DESC", (thread_id,)).fetchall()
+        doc_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM documents WHERE thread_id = ?",
+                                 (thread_id,)).fetchone()[0]
+        total = sum(r[2] for r in rows) + doc_bytes
+        drop = rows[self.max_per_thread:]
+        kept = rows[:self.max_per_thread]
+        while len(kept) > 1 and total - sum(r[2] for r in drop) > self.max_thread_bytes:
+            drop.insert(0, kept.pop())
+        remaining = total - sum(r[2] for r in drop)
+        if remaining > self.max_thread_bytes and thread_id not in self._oversize_warned:
+            if len(self._oversize_warned) >= self.max_threads:
+                self._oversize_warned.clear()
+            self._oversize_warned.add(thread_id)
+            log.warning(f"Checkpoint thread {thread_id}: newest state alone is {remaining / 1024 / 1024:.1f} MB "
+                        f"without tool outputs, over the {self.max_thread_bytes / 1024 / 1024:.1f} MB "
+                        "per-thread cap (kept anyway)")
+        if not drop:
+            return
+        keys = [(thread_id, ns, cid) for ns, cid, _ in drop]
+        conn.executemany("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", keys)
+        conn.executemany("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", keys)
+        self._collect_docs(conn, thread_id)
+
+    def _collect_docs(self, conn: sqlite3.Connection, thread_id: str):
+        """Delete the thread's documents no kept checkpoint or write refers to."""
+        referenced: Set[str] = set()
+        for table in ("checkpoints", "writes"):
+            for (ids,) in conn.execute(f"SELECT doc_ids FROM {table} WHERE thread_id = ?", (thread_id,)):
+                referenced.update(json.loads(ids))
+        stored = [r[0] for r in conn.execute("SELECT doc_id FROM documents WHERE thread_id = ?", (thread_id,))]
+        conn.executemany("DELETE FROM documents WHERE thread_id = ? AND doc_id = ?",
+                         [(thread_id, d) for d in stored if d not in referenced])
+
+    def _delete_threads(self, conn: sqlite3.Connection, thread_ids: Sequence[str]):
+        keys = [(t,) for t in thread_ids]
+        for table in ("checkpoints", "writes", "documents", "threads"):
+            conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", keys)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Delete expired threads, then least recently used ones down to 90% of CHECKPOINT_MAX_THREADS."""
+        stale: List[str] = []
+        if self.ttl > 0:
+            stale = [r[0] for r in conn.execute("SELECT thread_id FROM threads WHERE last_access < ?",
+                                                (time.time() - self.ttl,))]
+        excess = conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0] - len(stale) - self.max_threads
+        if excess > 0:
+            excess += int(self.max_threads * 0.1)
+            stale += [r[0] for r in conn.execute(
+                "SELECT thread_id FROM threads WHERE last_access >= ? ORDER BY last_access LIMIT ?",
+                (time.time() - self.ttl if self.ttl > 0 else 0, excess))]
+        if stale:
+            self._delete_threads(conn, stale)
+            log.info(f"🧹 Checkpointer evicted {len(stale)} threads ({os.path.basename(self.path)})")
+
+    # ---------- Maintenance ----------
+
+    def purge_expired(self) -> int:
+        with self._tx() as conn:
+            before = conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+            self._evict(conn)
+            return before - conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+
+    def clear(self):
+        with self._tx() as conn:
+            for table in ("checkpoints", "writes", "documents", "threads"):
+                conn.execute(f"DELETE FROM {table}")
+        with self._lock:
+            self._conn.execute("VACUUM")
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            threads = self._conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+            checkpoints, ckpt_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM checkpoints").fetchone()
+            docs, doc_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents").fetchone()
+            write_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM writes").fetchone()[0]
+        return {"path": self.path, "threads": threads, "checkpoints": checkpoints, "documents": docs,
+                "mb": (ckpt_bytes + doc_bytes + write_bytes) / 1024 / 1024}
+
+
+@lru_cache(maxsize=None)
+def get_checkpointer(graph_name: str) -> BaseCheckpointSaver:
+    """
+    Checkpointer for one graph ("adaptive" | "corrective"), shared by its sync and async builds.
+    Each graph has its own file, so a session id reused across graphs never mixes state schemas.
+    """
+    if CHECKPOINT_BACKEND == "memory":
+        return MemorySaver()
+    if CHECKPOINT_BACKEND != "sqlite":
+        raise ValueError(f"Unknown CHECKPOINT_BACKEND '{CHECKPOINT_BACKEND}' (sqlite | memory)")
+    return BoundedSQLiteSaver(os.path.join(CHECKPOINT_DIR, f"{graph_name}.sqlite"))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect / maintain the graph checkpoint stores")
+    ap.add_argument("--purge-expired", action="store_true")
+    ap.add_argument("--clear", action="store_true")
+    args = ap.parse_args()
+
+    for name in GRAPHS:
+        saver = BoundedSQLiteSaver(os.path.join(CHECKPOINT_DIR, f"{name}.sqlite"))
+        if args.clear:
+            saver.clear()
+            print(f"🧹 {name}: checkpoints cleared")
+        if args.purge_expired:
+            print(f"🧹 {name}: removed {saver.purge_expired()} threads")
+        info = saver.info()
+        print(f"{name}: {info['threads']} threads, {info['checkpoints']} checkpoints, "
+              f"{info['documents']} documents, {info['mb']:.1f} MB ({info['path']})")
+
+
+if __name__ == "__main__":
+    main()
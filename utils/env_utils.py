@@ -3,8 +3,113 @@ from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
 MILVUS_URI = 'http://172.25.112.1:19530'
 
+# Readers resolve this name through a Milvus alias; ingestion builds versioned
+# collections ("<alias>__v<timestamp>") behind it and switches the alias when ready.
 COLLECTION_NAME = 'wanda_commerce'
+
+# Retired versions older than this (counted from their successor's build) are dropped.
+VERSION_GC_GRACE_SECONDS = int(os.getenv('VERSION_GC_GRACE_SECONDS', 3600))
+# Number of retired versions always kept for rollback.
+VERSIONS_TO_KEEP = int(os.getenv('VERSIONS_TO_KEEP', 1))
+
+# Dense index profile used at ingestion and for matching search params
+# (see documents/index_profiles.py: hnsw_m16 | hnsw_m32 | ivf_flat | ivf_pq | diskann).
+INDEX_PROFILE = os.getenv('INDEX_PROFILE', 'hnsw_m16')
+
+# "inline": text/keywords stored and returned by Milvus.
+# "external": text/keywords served from a local compressed chunk store keyed by pk
+# (documents/chunk_store.py); Milvus keeps vectors, keys and filter fields.
+PAYLOAD_MODE = os.getenv('PAYLOAD_MODE', 'inline')
+CHUNK_STORE_DIR = os.getenv('CHUNK_STORE_DIR', os.path.join(root_dir, 'datas', 'chunk_store'))
+
+# Fan-out search over several collections/shards (tools/fanout.py): each shard gets this
+# long before the merge goes ahead without it; size of the shared search thread pool.
+SHARD_TIMEOUT_SECONDS = float(os.getenv('SHARD_TIMEOUT_SECONDS', 5.0))
+SEARCH_FANOUT_WORKERS = int(os.getenv('SEARCH_FANOUT_WORKERS', 16))
+
+# bge embedding runtime (llm_models/embedding_runtime.py): device auto-detection,
+# CPU backend ("onnx" | "int8"; "hf" forces sentence-transformers) and CPU threads (0 = auto).
+EMBEDDING_DEVICE = os.getenv('EMBEDDING_DEVICE', 'auto')
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'auto')
+EMBEDDING_THREADS = int(os.getenv('EMBEDDING_THREADS', 0))
+
+# Shared embedding server (llm_models/embedding_server.py). When it is running, every
+# process embeds through it instead of loading its own model copy.
+EMBEDDING_SOCKET = os.getenv('EMBEDDING_SOCKET', os.path.join(root_dir, 'datas', 'embedding.sock'))
+EMBEDDING_BATCH_MAX = int(os.getenv('EMBEDDING_BATCH_MAX', 64))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_WAIT_MS', 5))
+
+# Persistent exact-match LLM response cache (llm_models/llm_cache.py); max size 0 disables it.
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join(root_dir, 'datas', 'llm_cache.sqlite'))
+LLM_CACHE_TTL_SECONDS = float(os.getenv('LLM_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+LLM_CACHE_MAX_MB = float(os.getenv('LLM_CACHE_MAX_MB', 256))
+
+# Semantic answer cache in front of the adaptive graph (adaptive_rag/answer_cache.py):
+# minimum bge cosine similarity for a reuse; max entries 0 disables it.
+ANSWER_CACHE_PATH = os.getenv('ANSWER_CACHE_PATH', os.path.join(root_dir, 'datas', 'answer_cache.sqlite'))
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', 0.92))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 5000))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv('ANSWER_CACHE_TTL_SECONDS', 24 * 3600))
+
+# Prompt context packing (tools/context_packer.py): total and per-document token budgets.
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 3000))
+CONTEXT_DOC_TOKEN_BUDGET = int(os.getenv('CONTEXT_DOC_TOKEN_BUDGET', 800))
+
+# Tiered relevance grader (corrective_rag/local_grader.py): bge cosine above RELEVANT is
+# "yes", below IRRELEVANT (with little lexical overlap) is "no", the band between goes to
+# the LLM. SHADOW_RATE: share of local decisions re-checked by the LLM for agreement stats.
+GRADER_RELEVANT_THRESHOLD = float(os.getenv('GRADER_RELEVANT_THRESHOLD', 0.75))
+GRADER_IRRELEVANT_THRESHOLD = float(os.getenv('GRADER_IRRELEVANT_THRESHOLD', 0.45))
+GRADER_SHADOW_RATE = float(os.getenv('GRADER_SHADOW_RATE', 0.05))
+
+# Async graph execution (utils/async_utils.py): per-process bounds on concurrent graph
+# runs and LLM requests, and the thread pool size for blocking Milvus/embedding calls.
+MAX_CONCURRENT_SESSIONS = int(os.getenv('MAX_CONCURRENT_SESSIONS', 32))
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 16))
+BLOCKING_IO_WORKERS = int(os.getenv('BLOCKING_IO_WORKERS', 32))
+
+# HTTP service (api/server.py): worker coroutines, bounded request queue (full -> 503)
+# and the maximum time a request may take, queueing included (exceeded -> 504).
+API_WORKERS = int(os.getenv('API_WORKERS', 8))
+API_QUEUE_SIZE = int(os.getenv('API_QUEUE_SIZE', 64))
+REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', 60))
+
+# Graph checkpointer (utils/checkpointer.py): "sqlite" (bounded, persistent) or "memory".
+# Threads idle for TTL expire; beyond MAX_THREADS the least recently used are dropped;
+# each thread keeps its newest MAX_PER_THREAD checkpoints within MAX_THREAD_MB (a newest state
+# over the cap is stored with its oldest turns, then its tool outputs, removed).
+CHECKPOINT_BACKEND = os.getenv('CHECKPOINT_BACKEND', 'sqlite')
+CHECKPOINT_DIR = os.getenv('CHECKPOINT_DIR', os.path.join(root_dir, 'datas', 'checkpoints'))
+CHECKPOINT_TTL_SECONDS = float(os.getenv('CHECKPOINT_TTL_SECONDS', 24 * 3600))
+CHECKPOINT_MAX_THREADS = int(os.getenv('CHECKPOINT_MAX_THREADS', 10000))
+CHECKPOINT_MAX_PER_THREAD = int(os.getenv('CHECKPOINT_MAX_PER_THREAD', 20))
+CHECKPOINT_MAX_THREAD_MB = float(os.getenv('CHECKPOINT_MAX_THREAD_MB', 4))
+
+# Agent chat memory (agent/session_memory.py): "memory" or "file" (JSON per session in
+# SESSION_DIR). LRU over MAX_SESSIONS / MAX_MB; each prompt carries a running summary plus
+# the newest turns within HISTORY_TOKEN_BUDGET; the summary is kept to SUMMARY_TOKENS.
+SESSION_STORE = os.getenv('SESSION_STORE', 'memory')
+SESSION_DIR = os.getenv('SESSION_DIR', os.path.join(root_dir, 'datas', 'sessions'))
+SESSION_MAX_SESSIONS = int(os.getenv('SESSION_MAX_SESSIONS', 1000))
+SESSION_MAX_MB = float(os.getenv('SESSION_MAX_MB', 64))
+SESSION_HISTORY_TOKEN_BUDGET = int(os.getenv('SESSION_HISTORY_TOKEN_BUDGET', 1500))
+SESSION_SUMMARY_TOKENS = int(os.getenv('SESSION_SUMMARY_TOKENS', 300))
+
+# Multi-query retrieval (adaptive graph): number of sub-queries / paraphrases written by
+# one LLM call in transform_query and searched as one batch; 0 keeps single-query mode.
+MULTI_QUERY_COUNT = int(os.getenv('MULTI_QUERY_COUNT', 0))
+
+# Incremental retrieval (adaptive graph): at most this many already-seen primary keys go
+# into the Milvus exclusion filter of a retry; older ones are dropped client-side.
+RETRIEVAL_EXCLUDE_MAX = int(os.getenv('RETRIEVAL_EXCLUDE_MAX', 1000))
+
+# Per-request tracing (utils/tracing.py): spans for graph nodes, search legs, embeddings and
+# LLM calls, grouped by request id; finished traces are appended as JSON lines to TRACE_PATH.
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', '1').lower() not in ('0', 'false', 'no', 'off')
+TRACE_PATH = os.getenv('TRACE_PATH', os.path.join(root_dir, 'datas', 'traces.jsonl'))
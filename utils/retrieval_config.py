@@ -0,0 +1,48 @@
+import json
+import os
+from typing import Any, Dict
+
+from My_RAG_Project.utils.log_utils import log
+
+# Tuned retrieval operating point, written by evaluation/ann_autotune.py and read by
+# documents/index_profiles.py + tools/search_tools.py. Missing file = profile defaults.
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RETRIEVAL_CONFIG_PATH = os.getenv("RETRIEVAL_CONFIG_PATH", os.path.join(root_dir, "configs", "retrieval.json"))
+
+# Example:
+# {
+#   "dense_search_params": {"hnsw_m16": {"ef": 48}},
+#   "sparse_search_params": {"drop_ratio_search": 0.1},
+#   "oversample": 2
+# }
+
+_cache: Dict[str, Any] = {"mtime": None, "config": {}}
+
+
+def load_retrieval_config() -> Dict[str, Any]:
+    """Load the retrieval config (re-read only when the file changes)."""
+    try:
+        mtime = os.path.getmtime(RETRIEVAL_CONFIG_PATH)
+    except OSError:
+        return {}
+    if _cache["mtime"] != mtime:
+        with open(RETRIEVAL_CONFIG_PATH, "r", encoding="utf-8") as f:
+            _cache["config"] = json.load(f)
+        _cache["mtime"] = mtime
+    return _cache["config"]
+
+
+def save_retrieval_config(updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge `updates` (one level deep for dict values) into the config file and return the result."""
+    config = dict(load_retrieval_config())
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            config[key] = {**config[key], **value}
+        else:
+            config[key] = value
+
+    os.makedirs(os.path.dirname(RETRIEVAL_CONFIG_PATH), exist_ok=True)
+    with open(RETRIEVAL_CONFIG_PATH, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    log.info(f"Retrieval config saved to {RETRIEVAL_CONFIG_PATH}: {config}")
+    return config
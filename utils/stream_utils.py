@@ -0,0 +1,59 @@
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+# Chains whose LLM tokens are streamed to the user carry this tag
+# (the generate nodes); grader / router / rewrite calls are not streamed.
+ANSWER_STREAM_TAG = "answer_stream"
+_STREAM_MODES = ["messages", "values"]
+
+
+class _TokenFilter:
+    """Turns raw (mode, chunk) stream items into ("token" | "reset" | "values", payload)."""
+
+    def __init__(self):
+        self.current_step = None
+
+    def feed(self, mode: str, chunk: Any) -> List[Tuple[str, Any]]:
+        if mode == "values":
+            return [("values", chunk)]
+
+        message, metadata = chunk
+        if ANSWER_STREAM_TAG not in (metadata.get("tags") or []):
+            return []
+        text = message.content if isinstance(message.content, str) else ""
+        if not text:
+            return []
+        out = []
+        step = metadata.get("langgraph_step")
+        if self.current_step is not None and step != self.current_step:
+            out.append(("reset", step))
+        self.current_step = step
+        out.append(("token", text))
+        return out
+
+
+def stream_answer_tokens(graph, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None
+                         ) -> Iterator[Tuple[str, Any]]:
+    """
+    Run a compiled LangGraph and yield answer tokens as they are generated.
+
+    Uses stream_mode=["messages", "values"]: token chunks of tagged chains arrive while
+    the generate node is still running, so the caller can print before grading starts.
+
+    Yields:
+        ("token", str)   a piece of the answer
+        ("reset", int)   a new generation started (graph retry loop); text streamed
+                         so far belongs to a discarded answer
+        ("values", dict) full graph state after each step (the last one is final)
+    """
+    tf = _TokenFilter()
+    for mode, chunk in graph.stream(inputs, config=config, stream_mode=_STREAM_MODES):
+        yield from tf.feed(mode, chunk)
+
+
+async def astream_answer_tokens(graph, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None
+                                ) -> AsyncIterator[Tuple[str, Any]]:
+    """Async stream_answer_tokens (graph.astream); same items."""
+    tf = _TokenFilter()
+    async for mode, chunk in graph.astream(inputs, config=config, stream_mode=_STREAM_MODES):
+        for item in tf.feed(mode, chunk):
+            yield item
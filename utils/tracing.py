@@ -0,0 +1,454 @@
+"""
+Per-request tracing and latency metrics.
+
+A trace groups every span of one request under a request id:
+    node        graph nodes and routing functions (wrapped at graph build, traced_node)
+    search      Milvus legs (dense / sparse / coarse / full search_resultset) and the
+                corrective graph's retriever tool
+    embedding   query / sentence embedding calls
+    llm         chat model calls (TracingCallbackHandler on get_llm()); named after the
+                llm_cache_scope of the calling chain, with prompt / completion tokens
+Spans record start offset, duration, parent span, attempt (nth run of the same node in
+the request: retry loops show up as attempt > 1) and errors. LLM cache hits / misses
+are counted on the trace.
+
+The active trace lives in a context variable, so spans from the I/O pool (run_blocking)
+and the shard fan-out threads land in the request that started them. Outside a trace,
+spans only feed the metrics.
+
+Export:
+    TRACE_PATH         one JSON object per finished request (JSON lines); "" disables
+    /metrics           Prometheus text (api/server.py): per-span latency histograms,
+                       LLM token and cache counters, request latency per route
+
+Usage:
+    python -m My_RAG_Project.utils.tracing                    # latency breakdown of TRACE_PATH
+    python -m My_RAG_Project.utils.tracing --last 20 --request <id>
+"""
+import argparse
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from My_RAG_Project.utils.env_utils import TRACING_ENABLED, TRACE_PATH
+from My_RAG_Project.utils.log_utils import log
+
+# Prometheus histogram buckets (seconds)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Trace:
+    """Spans and counters of one request."""
+
+    def __init__(self, request_id: Optional[str] = None, **attrs: Any):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self.counters: Dict[str, int] = defaultdict(int)
+        self._runs: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _next_attempt(self, kind: str, name: str) -> int:
+        with self._lock:
+            self._runs[(kind, name)] += 1
+            n = self._runs[(kind, name)]
+            if kind == "node" and n > 1:
+                self.counters["retries"] += 1
+            return n
+
+    def add(self, span: Dict[str, Any]):
+        with self._lock:
+            self.spans.append(span)
+
+    def count(self, key: str, n: int = 1):
+        with self._lock:
+            self.counters[key] += n
+
+    def breakdown(self) -> Dict[str, float]:
+        """Total ms per kind/name (nested spans are counted in their own and their parent's bucket)."""
+        out: Dict[str, float] = defaultdict(float)
+        with self._lock:
+            for s in self.spans:
+                out[f"{s['kind']}/{s['name']}"] += s["duration_ms"]
+        return dict(sorted(out.items(), key=lambda kv: -kv[1]))
+
+    def to_dict(self, status: str = "ok") -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+            counters = dict(self.counters)
+        return {"request_id": self.request_id, "started_at": self.started_at, "status": status,
+                "duration_ms": (time.perf_counter() - self.start) * 1000, **self.attrs,
+                "counters": counters, "spans": spans}
+
+
+_TRACE: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("rag_trace", default=None)
+_PARENT: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("rag_span", default=None)
+
+
+def _reset(var: contextvars.ContextVar, token: contextvars.Token):
+    try:
+        var.reset(token)
+    except ValueError:
+        # an async generator finalized from another context; that context never saw the value
+        pass
+
+
+def current_trace() -> Optional[Trace]:
+    return _TRACE.get()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _TRACE.get()
+    return trace.request_id if trace is not None else None
+
+
+# ---------- Metrics ----------
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "n")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.n = 0
+
+    def observe(self, seconds: float):
+        for i, b in enumerate(BUCKETS):
+            if seconds <= b:
+                self.counts[i] += 1
+        self.sum += seconds
+        self.n += 1
+
+
+class Metrics:
+    """Process-wide histograms and counters, rendered as Prometheus text."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hist: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], _Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = defaultdict(float)
+
+    def observe(self, metric: str, seconds: float, **labels: str):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._hist.get(key)
+            if hist is None:
+                hist = self._hist[key] = _Histogram()
+            hist.observe(seconds)
+
+    def inc(self, metric: str, n: float = 1, **labels: str):
+        with self._lock:
+            self._counters[(metric, tuple(sorted(labels.items())))] += n
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        def fmt(labels, extra=()) -> str:
+            items = list(labels) + list(extra)
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in items) + "}"
+
+        lines: List[str] = []
+        with self._lock:
+            for metric in sorted({m for m, _ in self._hist}):
+                lines.append(f"# TYPE {metric} histogram")
+                for (m, labels), h in sorted(self._hist.items()):
+                    if m != metric:
+                        continue
+                    for b, c in zip(BUCKETS, h.counts):
+                        lines.append(f"{metric}_bucket{fmt(labels, [('le', b)])} {c}")
+                    lines.append(f"{metric}_bucket{fmt(labels, [('le', '+Inf')])} {h.n}")
+                    lines.append(f"{metric}_sum{fmt(labels)} {h.sum:.6f}")
+                    lines.append(f"{metric}_count{fmt(labels)} {h.n}")
+            for metric in sorted({m for m, _ in self._counters}):
+                lines.append(f"# TYPE {metric} counter")
+                for (m, labels), v in sorted(self._counters.items()):
+                    if m == metric:
+                        lines.append(f"{metric}{fmt(labels)} {v:g}")
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# ---------- Export ----------
+
+class JsonTraceExporter:
+    """Appends finished traces to a JSON lines file."""
+
+    def __init__(self, path: str = TRACE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, trace: Dict[str, Any]):
+        if not self.path:
+            return
+        line = json.dumps(trace, ensure_ascii=False, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+@functools.lru_cache(maxsize=1)
+def get_exporter() -> JsonTraceExporter:
+    return JsonTraceExporter()
+
+
+# ---------- Traces and spans ----------
+
+@contextlib.contextmanager
+def start_trace(request_id: Optional[str] = None, **attrs: Any) -> Iterator[Optional[Trace]]:
+    """
+    Group everything inside under one request. Nested calls (e.g. the HTTP dispatcher
+    around answer_question) join the outer trace instead of starting a new one.
+    """
+    outer = _TRACE.get()
+    if outer is not None or not TRACING_ENABLED:
+        yield outer
+        return
+    trace = Trace(request_id, **attrs)
+    token = _TRACE.set(trace)
+    status = "ok"
+    try:
+        yield trace
+    except BaseException as e:
+        status = type(e).__name__
+        raise
+    finally:
+        _reset(_TRACE, token)
+        _finish(trace, status)
+
+
+def _finish(trace: Trace, status: str):
+    data = trace.to_dict(status)
+    route = str(trace.attrs.get("route", "unknown"))
+    metrics.observe("rag_request_duration_seconds", data["duration_ms"] / 1000, route=route)
+    metrics.inc("rag_requests_total", route=route, status=status)
+    top = ", ".join(f"{k}={v:.0f}ms" for k, v in list(trace.breakdown().items())[:6])
+    log.info(f"⏱️ request {trace.request_id} {data['duration_ms']:.0f}ms [{status}] {top} {data['counters']}")
+    try:
+        get_exporter().export(data)
+    except Exception as e:
+        log.warning(f"Trace export failed: {e}")
+
+
+def _record(trace: Optional[Trace], kind: str, name: str, span_id: str, parent: Optional[str],
+            t0: float, attempt: int, attrs: Dict[str, Any], error: Optional[str]):
+    duration = time.perf_counter() - t0
+    metrics.observe("rag_span_duration_seconds", duration, kind=kind, name=name)
+    if error:
+        metrics.inc("rag_span_errors_total", kind=kind, name=name)
+    if trace is not None:
+        span = {"id": span_id, "parent": parent, "kind": kind, "name": name,
+                "start_ms": (t0 - trace.start) * 1000, "duration_ms": duration * 1000, "attempt": attempt}
+        if attrs:
+            span["attrs"] = attrs
+        if error:
+            span["error"] = error
+        trace.add(span)
+
+
+@contextlib.contextmanager
+def span(name: str, kind: str = "node", **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """Time the block as one span; the yielded dict takes extra attributes (e.g. token counts)."""
+    if not TRACING_ENABLED:
+        yield attrs
+        return
+    trace = _TRACE.get()
+    span_id = uuid.uuid4().hex[:16]
+    parent = _PARENT.get()
+    attempt = trace._next_attempt(kind, name) if trace is not None else 1
+    token = _PARENT.set(span_id)
+    t0 = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _reset(_PARENT, token)
+        _record(trace, kind, name, span_id, parent, t0, attempt, attrs, error)
+
+
+def traced(name: str, kind: str = "node") -> Callable:
+    """Decorator form of span() for sync and async functions."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, kind):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_node(name: str, fn: Callable) -> Callable:
+    """Wrap a graph node / routing function at build time: g.add_node(name, traced_node(name, fn))."""
+    return traced(name, "node")(fn)
+
+
+def count(key: str, n: int = 1, **labels: str):
+    """Count an event on the current trace (if any) and in the metrics (rag_<key>_total)."""
+    trace = _TRACE.get()
+    if trace is not None:
+        trace.count(key, n)
+    metrics.inc(f"rag_{key}_total", n, **labels)
+
+
+# ---------- LLM calls ----------
+
+def _usage(response) -> Tuple[int, int]:
+    """(prompt, completion) tokens from an LLMResult (llm_output or message usage_metadata)."""
+    usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+    prompt, completion = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    if prompt or completion:
+        return prompt, completion
+    for generations in getattr(response, "generations", None) or []:
+        for g in generations:
+            meta = getattr(getattr(g, "message", None), "usage_metadata", None) or {}
+            prompt += meta.get("input_tokens", 0)
+            completion += meta.get("output_tokens", 0)
+    return prompt, completion
+
+
+@functools.lru_cache(maxsize=1)
+def tracing_callback():
+    """LangChain callback handler: chat model calls become "llm" spans, tool calls "search" spans."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TracingCallbackHandler(BaseCallbackHandler):
+        run_inline = True  # run in the caller's context (the active trace)
+
+        def __init__(self):
+            self._open: Dict[Any, Tuple] = {}
+            self._lock = threading.Lock()
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._start(run_id, "llm")
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._start(run_id, "llm")
+
+        def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+            self._start(run_id, "search", (serialized or {}).get("name") or "tool")
+
+        def _start(self, run_id, kind: str, name: Optional[str] = None):
+            if not TRACING_ENABLED:
+                return
+            from My_RAG_Project.llm_models.llm_cache import current_scope
+
+            trace = _TRACE.get()
+            name = name or current_scope()
+            attempt = trace._next_attempt(kind, name) if trace is not None else 1
+            with self._lock:
+                self._open[run_id] = (trace, kind, name, _PARENT.get(), time.perf_counter(), attempt)
+
+        def _end(self, run_id, response=None, error: Optional[str] = None):
+            with self._lock:
+                opened = self._open.pop(run_id, None)
+            if opened is None:
+                return
+            trace, kind, name, parent, t0, attempt = opened
+            attrs: Dict[str, Any] = {}
+            if response is not None and kind == "llm":
+                prompt, completion = _usage(response)
+                attrs = {"prompt_tokens": prompt, "completion_tokens": completion}
+                metrics.inc("rag_llm_tokens_total", prompt, name=name, type="prompt")
+                metrics.inc("rag_llm_tokens_total", completion, name=name, type="completion")
+                if trace is not None:
+                    trace.count("prompt_tokens", prompt)
+                    trace.count("completion_tokens", completion)
+            _record(trace, kind, name, uuid.uuid4().hex[:16], parent, t0, attempt, attrs, error)
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            self._end(run_id, response)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error=f"{type(error).__name__}: {error}")
+
+        def on_tool_end(self, output, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_tool_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error=f"{type(error).__name__}: {error}")
+
+    return TracingCallbackHandler()
+
+
+# ---------- Trace file report ----------
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Latency breakdown of exported request traces")
+    ap.add_argument("--path", default=TRACE_PATH)
+    ap.add_argument("--last", type=int, default=0, help="only the last N requests")
+    ap.add_argument("--request", help="print the span tree of one request id")
+    args = ap.parse_args()
+
+    with open(args.path, "r", encoding="utf-8") as f:
+        traces = [json.loads(line) for line in f if line.strip()]
+    if args.last:
+        traces = traces[-args.last:]
+
+    if args.request:
+        trace = next((t for t in traces if t["request_id"] == args.request), None)
+        if trace is None:
+            raise SystemExit(f"request {args.request} not found in {args.path}")
+        parents = {s["id"]: s["parent"] for s in trace["spans"]}
+
+        def depth(span_id: str) -> int:  # children finish (and are exported) before their parent
+            d = 0
+            while parents.get(span_id) in parents:
+                span_id, d = parents[span_id], d + 1
+            return d
+
+        for s in sorted(trace["spans"], key=lambda s: s["start_ms"]):
+            extra = f" attempt={s['attempt']}" if s["attempt"] > 1 else ""
+            extra += f" {s['attrs']}" if s.get("attrs") else ""
+            extra += f" ERROR {s['error']}" if s.get("error") else ""
+            print(f"{s['start_ms']:8.0f}ms {'  ' * depth(s['id'])}{s['kind']}/{s['name']} "
+                  f"{s['duration_ms']:.0f}ms{extra}")
+        print(f"total {trace['duration_ms']:.0f}ms {trace['counters']}")
+        return
+
+    per_span: Dict[str, List[float]] = defaultdict(list)
+    for t in traces:
+        totals: Dict[str, float] = defaultdict(float)
+        for s in t["spans"]:
+            totals[f"{s['kind']}/{s['name']}"] += s["duration_ms"]
+        for key, ms in totals.items():
+            per_span[key].append(ms)
+    durations = [t["duration_ms"] for t in traces]
+    print(f"{len(traces)} requests: p50={_percentile(durations, 0.5):.0f}ms p95={_percentile(durations, 0.95):.0f}ms")
+    print(f"{'span':40s} {'requests':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'mean ms':>9s}")
+    for key, values in sorted(per_span.items(), key=lambda kv: -sum(kv[1])):
+        print(f"{key:40s} {len(values):8d} {_percentile(values, 0.5):9.0f} {_percentile(values, 0.95):9.0f} "
+              f"{sum(values) / len(values):9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Explicit warm-up of the lazily built components.
+
+Imports are side-effect free; the first request would otherwise pay for loading the
+embedding model, connecting to Milvus and compiling graphs. Long-running processes
+(API workers, the CLI chat loops) call warm_up() once at startup instead.
+
+Usage:
+    python -m My_RAG_Project.utils.warmup --components embedding,milvus,adaptive_graph
+"""
+import argparse
+import time
+from typing import Callable, Dict, Iterable
+
+from My_RAG_Project.utils.log_utils import log
+
+
+def _embedding():
+    from My_RAG_Project.llm_models.embeddings_model import get_bge_embedding
+
+    get_bge_embedding().embed_query("warm up")  # first forward pass (kernels / ONNX session)
+
+
+def _llm():
+    from My_RAG_Project.llm_models.embeddings_model import get_llm
+
+    get_llm()
+
+
+def _milvus():
+    from My_RAG_Project.tools.search_tools import _get_client
+    from My_RAG_Project.utils.env_utils import COLLECTION_NAME
+
+    _get_client().describe_collection(COLLECTION_NAME)
+
+
+def _adaptive_graph():
+    from My_RAG_Project.adaptive_rag.graph_2 import get_graph
+
+    get_graph()
+
+
+def _corrective_graph():
+    from My_RAG_Project.corrective_rag.graph1 import get_graph
+
+    get_graph()
+
+
+WARMUPS: Dict[str, Callable[[], None]] = {
+    "embedding": _embedding,
+    "llm": _llm,
+    "milvus": _milvus,
+    "adaptive_graph": _adaptive_graph,
+    "corrective_graph": _corrective_graph,
+}
+DEFAULT_COMPONENTS = ("embedding", "llm", "milvus", "adaptive_graph")
+
+
+def warm_up(components: Iterable[str] = DEFAULT_COMPONENTS) -> Dict[str, float]:
+    """Build the given components now; returns seconds spent per component."""
+    timings = {}
+    for name in components:
+        if name not in WARMUPS:
+            raise ValueError(f"Unknown component '{name}'. Available: {sorted(WARMUPS)}")
+        t0 = time.perf_counter()
+        WARMUPS[name]()
+        timings[name] = time.perf_counter() - t0
+        log.info(f"🔥 Warmed up {name} in {timings[name]:.2f}s")
+    return timings
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Warm up models, connections and graphs")
+    ap.add_argument("--components", default=",".join(DEFAULT_COMPONENTS))
+    args = ap.parse_args()
+    warm_up([c.strip() for c in args.components.split(",") if c.strip()])